@@ -11,21 +11,16 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 from pathlib import Path
-from rdflib import Graph, Literal, Namespace
-from rdflib.namespace import RDFS, RDF
 import pandas as pd
 import plotly.graph_objects as go
 import sys
+import os
 
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
 st.set_page_config(page_title="Qoyllur Rit'i", page_icon="🏔️", layout="wide")
 
-# Namespaces
-GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
-FESTIVIDAD = Namespace("http://example.org/festividades#")
-
 # ============================================================================
 # CSS
 # ============================================================================
@@ -81,187 +76,44 @@ TOP_10_PREGUNTAS = [
 # FUNCIÓN PARA CARGAR DATOS COMPLETOS DEL TTL
 # ============================================================================
 @st.cache_resource
-def cargar_datos_ttl():
+def cargar_base():
     """
-    Extrae:
-    1. Lugares con coordenadas
-    2. Eventos ordenados por marco temporal y orden de evento
-    3. Relaciones entre eventos y lugares
+    Parsea el TTL y lo vigila: cuando cambia, se reconstruye en segundo plano
+    y el mapa y el motor de preguntas pasan juntos a la versión nueva
     """
     ttl_path = "qoyllurity.ttl"
     if not Path(ttl_path).exists():
         st.error(f"❌ No se encontró el archivo TTL en: {ttl_path}")
-        return {}, [], {}
+        return None
     
-    g = Graph()
     try:
-        g.parse(ttl_path, format='turtle')
+        from graphrag_v2 import BaseConocimientoVigente
+        vigente = BaseConocimientoVigente(
+            ttl_path,
+            motor_kwargs={'persistir_consultas': True, 'materializar': True},
+            # Las preguntas frecuentes quedan respondidas en caché sin bloquear la UI
+            al_preparar_motor=lambda motor: motor.precalcular_respuestas(
+                TOP_10_PREGUNTAS, en_segundo_plano=True
+            ),
+        )
+        vigente.iniciar()
+        return vigente
     except Exception as e:
         st.error(f"❌ Error al parsear TTL: {e}")
+        return None
+
+
+def cargar_datos_ttl(base):
+    """
+    Extrae (una vez por versión del TTL; la base los memoriza):
+    1. Lugares con coordenadas
+    2. Eventos ordenados por marco temporal y orden de evento
+    3. Relaciones entre eventos y lugares
+    """
+    if base is None:
         return {}, [], {}
     
-    lugares = {}
-    eventos = []
-    marcos_temporales = {}
-    
-    # ===== PASO 1: Extraer lugares con coordenadas =====
-    for s in g.subjects():
-        lat = None
-        lon = None
-        nombre = None
-        descripcion = None
-        tipos = []
-        
-        # Coordenadas
-        for lat_val in g.objects(s, GEO.lat):
-            try:
-                lat = float(lat_val)
-            except:
-                pass
-        
-        for lon_val in g.objects(s, GEO.long):
-            try:
-                lon = float(lon_val)
-            except:
-                pass
-        
-        if lat and lon:
-            # Nombre
-            for label in g.objects(s, RDFS.label):
-                if isinstance(label, Literal):
-                    if label.language == 'es' or not label.language:
-                        nombre = str(label)
-                        break
-            
-            if not nombre:
-                nombre = str(s).split('#')[-1].replace('_', ' ')
-            
-            # Descripción
-            for comment in g.objects(s, RDFS.comment):
-                if isinstance(comment, Literal):
-                    if comment.language == 'es' or not comment.language:
-                        descripcion = str(comment)
-                        break
-            
-            # Tipos
-            for tipo in g.objects(s, RDF.type):
-                tipo_str = str(tipo).split('#')[-1]
-                if tipo_str not in ['NamedIndividual']:
-                    tipos.append(tipo_str)
-            
-            uri = str(s).split('#')[-1] if '#' in str(s) else str(s)
-            
-            lugares[uri] = {
-                "uri": uri,
-                "lat": lat,
-                "lon": lon,
-                "nombre": nombre,
-                "descripcion": descripcion or "Sin descripción disponible",
-                "tipos": tipos
-            }
-    
-    # ===== PASO 2: Extraer marcos temporales (días) =====
-    for s, p, o in g.triples((None, FESTIVIDAD.defineMarcoTemporal, None)):
-        marco_uri = str(s).split('#')[-1] if '#' in str(s) else str(s)
-        
-        # Obtener orden del marco
-        orden = None
-        for orden_val in g.objects(s, FESTIVIDAD.tieneOrden):
-            try:
-                orden = int(orden_val)
-            except:
-                pass
-        
-        # Obtener nombre del marco
-        nombre_marco = None
-        for label in g.objects(s, RDFS.label):
-            if isinstance(label, Literal):
-                nombre_marco = str(label)
-                break
-        
-        if not nombre_marco:
-            nombre_marco = marco_uri
-        
-        if marco_uri not in marcos_temporales:
-            marcos_temporales[marco_uri] = {
-                "uri": marco_uri,
-                "nombre": nombre_marco,
-                "orden": orden or 999,
-                "eventos": []
-            }
-    
-    # ===== PASO 3: Extraer eventos y asociarlos a marcos temporales =====
-    for s in g.subjects(RDF.type, FESTIVIDAD.EventoRitual):
-        evento_uri = str(s).split('#')[-1] if '#' in str(s) else str(s)
-        
-        # Nombre del evento
-        nombre_evento = None
-        for label in g.objects(s, RDFS.label):
-            if isinstance(label, Literal):
-                nombre_evento = str(label)
-                break
-        
-        if not nombre_evento:
-            nombre_evento = evento_uri
-        
-        # Descripción
-        descripcion_evento = None
-        for comment in g.objects(s, RDFS.comment):
-            if isinstance(comment, Literal):
-                descripcion_evento = str(comment)
-                break
-        
-        # Orden del evento
-        orden_evento = None
-        for orden_val in g.objects(s, FESTIVIDAD.tieneOrdenEvento):
-            try:
-                orden_evento = int(orden_val)
-            except:
-                pass
-        
-        # Lugar donde ocurre
-        lugares_evento = []
-        for lugar_obj in g.objects(s, FESTIVIDAD.ocurreEnLugar):
-            lugar_uri = str(lugar_obj).split('#')[-1] if '#' in str(lugar_obj) else str(lugar_obj)
-            if lugar_uri in lugares:
-                lugares_evento.append(lugar_uri)
-        
-        # Marco temporal al que pertenece
-        marco_del_evento = None
-        for marco_s in g.subjects(FESTIVIDAD.defineMarcoTemporal, s):
-            marco_del_evento = str(marco_s).split('#')[-1] if '#' in str(marco_s) else str(marco_s)
-            break
-        
-        evento_data = {
-            "uri": evento_uri,
-            "nombre": nombre_evento,
-            "descripcion": descripcion_evento or "Sin descripción",
-            "orden_evento": orden_evento or 999,
-            "lugares": lugares_evento,
-            "marco": marco_del_evento
-        }
-        
-        eventos.append(evento_data)
-        
-        # Agregar a su marco temporal
-        if marco_del_evento and marco_del_evento in marcos_temporales:
-            marcos_temporales[marco_del_evento]["eventos"].append(evento_data)
-    
-    # ===== PASO 4: Ordenar eventos por marco temporal y orden de evento =====
-    # Ordenar marcos temporales por orden
-    marcos_ordenados = sorted(marcos_temporales.values(), key=lambda x: x["orden"])
-    
-    # Ordenar eventos dentro de cada marco
-    for marco in marcos_ordenados:
-        marco["eventos"].sort(key=lambda x: x["orden_evento"])
-    
-    # Crear lista plana de eventos ordenados
-    eventos_ordenados = []
-    for marco in marcos_ordenados:
-        for evento in marco["eventos"]:
-            eventos_ordenados.append(evento)
-    
-    return lugares, eventos_ordenados, marcos_temporales
+    return base.datos_mapa()
 
 # ============================================================================
 # FUNCIÓN PARA DETERMINAR COLOR E ICONO
@@ -442,40 +294,56 @@ def crear_mapa_folium(lugares, eventos_ordenados, mostrar_ruta=True):
 # ============================================================================
 # CARGAR MOTOR DE CONOCIMIENTO
 # ============================================================================
+@st.cache_resource(ttl=60, show_spinner=False)
+def conectar_servidor(url):
+    """
+    Cliente del servidor compartido (servidor_qoyllur.py): un solo modelo para varias apps
+    
+    health() se comprueba al conectar y, como mucho, una vez por minuto; si
+    falla, la excepción no se guarda en caché y se reintenta en la siguiente
+    ejecución
+    """
+    from servidor_qoyllur import ClienteQoyllur
+    cliente = ClienteQoyllur(url)
+    cliente.health()
+    return cliente
+
+def cargar_conocimiento(base):
+    """
+    Motor de preguntas para esta versión del TTL: (motor, aviso)
+    
+    Se llama una vez por ejecución; el motor local ya es uno por versión
+    (vigente.motor) y los mensajes los muestra quien llama
+    """
+    # Con QOYLLUR_SERVIDOR=http://host:puerto las preguntas van al servidor compartido
+    url = os.environ.get("QOYLLUR_SERVIDOR")
+    aviso = None
+    if url:
+        try:
+            return conectar_servidor(url), None
+        except (OSError, RuntimeError) as e:
+            aviso = f"⚠️ Servidor {url} no disponible ({e}), se usa el motor local"
+    
+    vigente = cargar_base()
+    if vigente is None or base is None:
+        return cargar_v15(), "⚠️ No se encontró graphrag_v2. Intentando con v1.5..."
+    
+    try:
+        # Mismo grafo ya parseado para el mapa
+        return vigente.motor(base), aviso
+    except Exception as e:
+        return None, f"⚠️ Error al cargar GraphRAG v2.0: {e}"
+
 @st.cache_resource
-def cargar_conocimiento():
-    """Carga el motor GraphRAG v2.0 con embeddings semánticos"""
+def cargar_v15():
+    """Fallback a v1.5 (solo léxico)"""
     try:
-        # Importar GraphRAG v2.0
-        sys.path.insert(0, 'outputs')
-        from graphrag_v2 import GraphRAG_v2
-        
-        # Cargar con la ruta correcta
+        sys.path.insert(0, 'uploads')
+        from ultralite_qoyllur_v15 import UltraLiteQoyllurV15
         ttl_path = "qoyllurity.ttl"
-        if not Path(ttl_path).exists():
-            st.warning(f"⚠️ No se encontró el archivo TTL en: {ttl_path}")
-            return None
-        
-        with st.spinner("🔄 Cargando GraphRAG v2.0 (embeddings + búsqueda semántica)..."):
-            motor = GraphRAG_v2(ttl_path)
-        
-        st.success("✅ GraphRAG v2.0 cargado - Búsqueda semántica activa")
-        return motor
-        
-    except ImportError as e:
-        st.warning(f"⚠️ No se encontró graphrag_v2. Intentando con v1.5...")
-        # Fallback a v1.5
-        try:
-            sys.path.insert(0, 'uploads')
-            from ultralite_qoyllur_v15 import UltraLiteQoyllurV15
-            ttl_path = "qoyllurity.ttl"
-            return UltraLiteQoyllurV15(ttl_path)
-        except:
-            st.error("❌ No se pudo cargar ningún motor de conocimiento")
-            return None
-            
-    except Exception as e:
-        st.warning(f"⚠️ Error al cargar GraphRAG v2.0: {e}")
+        return UltraLiteQoyllurV15(ttl_path)
+    except:
+        st.error("❌ No se pudo cargar ningún motor de conocimiento")
         return None
 
 # ============================================================================
@@ -677,8 +545,13 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Versión vigente de la base, tomada una vez: si el TTL se recarga durante
+    # esta ejecución, mapa, cronología y preguntas siguen usando la misma
+    vigente = cargar_base()
+    base = vigente.actual() if vigente else None
+    
     # Cargar datos del TTL
-    lugares, eventos_ordenados, marcos_temporales = cargar_datos_ttl()
+    lugares, eventos_ordenados, marcos_temporales = cargar_datos_ttl(base)
     
     if not lugares:
         st.error("❌ No se pudieron cargar los datos del archivo TTL")
@@ -702,10 +575,17 @@ def main():
         st.markdown("---")
         st.markdown("### 🤖 Sistema de IA")
         
+        # Motor de preguntas, una vez por ejecución (también lo usa la pestaña de preguntas)
+        with st.spinner("🔄 Cargando GraphRAG v2.0 (embeddings + búsqueda semántica)..."):
+            motor, aviso = cargar_conocimiento(base)
+        if aviso:
+            st.warning(aviso)
+        
         # Detectar qué versión está cargada
-        motor_test = cargar_conocimiento()
-        if motor_test:
-            version = "v2.0 🚀" if "GraphRAG_v2" in str(type(motor_test)) else "v1.5"
+        if motor:
+            version = "v2.0 🚀" if type(motor).__name__ in ("GraphRAG_v2", "ClienteQoyllur") else "v1.5"
+            if "v2.0" in version:
+                st.success("✅ GraphRAG v2.0 cargado - Búsqueda semántica activa")
             capacidades = "Semántico + Léxico" if "v2.0" in version else "Solo Léxico"
             st.markdown(f"""
             **GraphRAG {version}**  
@@ -713,6 +593,8 @@ def main():
             📊 Precisión: {'85-100%' if 'v2.0' in version else '50-75%'}  
             ⚡ Latencia: {'~40ms' if 'v2.0' in version else '<1ms'}
             """)
+        if vigente is not None and vigente.recargas:
+            st.caption(f"🔄 TTL recargado ({vigente.recargas}×) · versión {base.version_grafo[:8]}")
         
         st.markdown("---")
         st.markdown("### 🗺️ Ruta Cronológica")
@@ -858,8 +740,6 @@ def main():
     
     # ===== TAB 4: PREGUNTAS =====
     with tab4:
-        motor = cargar_conocimiento()
-        
         if motor:
             st.markdown("### ❓ Sistema de Preguntas y Respuestas")
             
@@ -926,6 +806,9 @@ def main():
                     - ¿Cuántas naciones participan?
                     """)
             
+            if hasattr(motor, 'modelo_listo') and not motor.modelo_listo():
+                st.caption("⏳ El modelo semántico se está cargando; mientras tanto las respuestas usan búsqueda léxica.")
+            
             if responder and pregunta:
                 with st.spinner("🔍 Buscando con GraphRAG v2.0 (semántico + léxico)..."):
                     # Usar modo híbrido de v2.0 (mejor precisión)
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local de GraphRAG v2.0 (asyncio, sin dependencias extra)
+
+Un solo proceso carga el motor (y el modelo) una vez y lo comparte entre
+varios front-ends de Streamlit u otros clientes:
+
+    GET/POST /responder   {"pregunta": "...", "modo": "hibrido"}
+    GET/POST /buscar      {"consulta": "...", "modo": "hibrido", "top_k": 10}
+    GET      /health      estado del motor, versión y cola
+    GET      /metrics     métricas en formato de texto de Prometheus
+
+Las peticiones que llegan con pocos milisegundos de diferencia se agrupan
+en un micro-lote: una sola llamada a model.encode y un único producto
+matriz-matriz para todas. La cola está acotada (503 si se llena) y cada
+petición tiene un tiempo máximo de espera (504 si se agota).
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import urllib.request
+import urllib.error
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import BaseConocimientoVigente, GraphRAG_v2
+
+
+MODOS = ("semantico", "lexico", "hibrido")
+
+ESTADOS_HTTP = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+class ErrorPeticion(Exception):
+    """Petición inválida: se responde con `codigo` y el mensaje en JSON"""
+
+    def __init__(self, codigo: int, mensaje: str):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+class HistogramaPrometheus:
+    """Histograma acumulativo con buckets fijos (una serie por etiqueta)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.conteos = defaultdict(lambda: [0] * len(buckets))
+        self.sumas = defaultdict(float)
+        self.totales = defaultdict(int)
+
+    def observar(self, etiqueta: str, valor: float):
+        conteos = self.conteos[etiqueta]
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                conteos[i] += 1
+        self.sumas[etiqueta] += valor
+        self.totales[etiqueta] += 1
+
+    def lineas(self, nombre: str, clave: Optional[str]) -> List[str]:
+        lineas = []
+        for etiqueta in sorted(self.totales):
+            base = f'{clave}="{etiqueta}",' if clave else ''
+            for limite, n in zip(self.buckets, self.conteos[etiqueta]):
+                lineas.append(f'{nombre}_bucket{{{base}le="{limite:g}"}} {n}')
+            lineas.append(f'{nombre}_bucket{{{base}le="+Inf"}} {self.totales[etiqueta]}')
+            sufijo = f'{{{base[:-1]}}}' if clave else ''
+            lineas.append(f'{nombre}_sum{sufijo} {self.sumas[etiqueta]:.6f}')
+            lineas.append(f'{nombre}_count{sufijo} {self.totales[etiqueta]}')
+        return lineas
+
+
+class MetricasServidor:
+    """
+    Contadores del servidor, expuestos en /metrics
+
+    Solo se modifican desde el bucle de eventos, así que no necesitan lock.
+    """
+
+    BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    BUCKETS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128)
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.peticiones = defaultdict(int)  # (ruta, codigo) -> n
+        self.latencia = HistogramaPrometheus(self.BUCKETS_LATENCIA)
+        self.lotes = HistogramaPrometheus(self.BUCKETS_LOTE)
+
+    def registrar(self, ruta: str, codigo: int, segundos: float):
+        self.peticiones[(ruta, codigo)] += 1
+        self.latencia.observar(ruta, segundos)
+
+    def texto(self, agrupador: 'AgrupadorLotes', vigente: BaseConocimientoVigente, motor: GraphRAG_v2) -> str:
+        """Exposición en formato de texto de Prometheus (versión 0.0.4)"""
+        lineas = [
+            "# HELP qoyllur_peticiones_total Peticiones HTTP atendidas por ruta y código",
+            "# TYPE qoyllur_peticiones_total counter",
+        ]
+        for (ruta, codigo), n in sorted(self.peticiones.items()):
+            lineas.append(f'qoyllur_peticiones_total{{ruta="{ruta}",codigo="{codigo}"}} {n}')
+
+        lineas += ["# HELP qoyllur_latencia_segundos Latencia de extremo a extremo por ruta",
+                   "# TYPE qoyllur_latencia_segundos histogram"]
+        lineas += self.latencia.lineas("qoyllur_latencia_segundos", "ruta")
+
+        lineas += ["# HELP qoyllur_lote_tamano Preguntas por micro-lote enviado al motor",
+                   "# TYPE qoyllur_lote_tamano histogram"]
+        lineas += self.lotes.lineas("qoyllur_lote_tamano", None)
+
+        lineas += [
+            "# HELP qoyllur_cola_pendientes Peticiones esperando micro-lote",
+            "# TYPE qoyllur_cola_pendientes gauge",
+            f"qoyllur_cola_pendientes {agrupador.pendientes()}",
+            "# HELP qoyllur_cola_capacidad Tamaño máximo de la cola (503 al superarlo)",
+            "# TYPE qoyllur_cola_capacidad gauge",
+            f"qoyllur_cola_capacidad {agrupador.max_cola}",
+            "# HELP qoyllur_modelo_listo 1 si el modelo semántico está cargado",
+            "# TYPE qoyllur_modelo_listo gauge",
+            f"qoyllur_modelo_listo {int(motor.modelo_listo())}",
+            "# HELP qoyllur_entidades Entidades indexadas en la versión vigente",
+            "# TYPE qoyllur_entidades gauge",
+            f"qoyllur_entidades {len(motor.entidades)}",
+            "# HELP qoyllur_recargas_total Versiones del TTL publicadas desde el arranque",
+            "# TYPE qoyllur_recargas_total counter",
+            f"qoyllur_recargas_total {vigente.recargas}",
+            "# HELP qoyllur_activo_segundos Segundos desde el arranque",
+            "# TYPE qoyllur_activo_segundos gauge",
+            f"qoyllur_activo_segundos {time.time() - self.inicio:.1f}",
+        ]
+
+        for campo, tipo in [('aciertos', 'counter'), ('fallos', 'counter'),
+                            ('desalojos', 'counter'), ('entradas', 'gauge')]:
+            lineas += [f"# HELP qoyllur_cache_{campo} Cachés del motor ({campo})",
+                       f"# TYPE qoyllur_cache_{campo} {tipo}"]
+            for cache, stats in motor.estadisticas_cache().items():
+                lineas.append(f'qoyllur_cache_{campo}{{cache="{cache}"}} {stats[campo]}')
+
+        return "\n".join(lineas) + "\n"
+
+
+class AgrupadorLotes:
+    """
+    Micro-lotes: agrupa las peticiones que llegan dentro de una ventana corta
+
+    Un único consumidor toma la primera petición de la cola, espera hasta
+    `ventana` segundos (o hasta max_lote) a que lleguen más y las resuelve
+    juntas en el hilo del motor. Mientras el motor trabaja la cola sigue
+    llenándose, así que bajo carga los lotes crecen solos.
+
+    Las preguntas de un lote se agrupan por (tipo, modo, top_k); si hay
+    varios grupos que usan el modelo, se codifican antes todas juntas y
+    cada grupo las encuentra en la caché de consultas del motor.
+    """
+
+    def __init__(self, vigente: BaseConocimientoVigente, metricas: MetricasServidor,
+                 ventana: float = 0.005, max_lote: int = 32, max_cola: int = 256):
+        self.vigente = vigente
+        self.metricas = metricas
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self.max_cola = max_cola
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+        # Un solo hilo: el motor procesa un lote cada vez
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="motor-lotes")
+
+    def pendientes(self) -> int:
+        return self._cola.qsize() if self._cola is not None else 0
+
+    def iniciar(self):
+        self._cola = asyncio.Queue(maxsize=self.max_cola)
+        self._tarea = asyncio.get_running_loop().create_task(self._consumir())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._ejecutor.shutdown(wait=True)
+
+    def enviar(self, tipo: str, pregunta: str, modo: str, top_k: int) -> asyncio.Future:
+        """
+        Encola una pregunta y devuelve el futuro con su resultado
+
+        Raises:
+            ErrorPeticion: 503 si la cola está llena (contrapresión)
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self._cola.put_nowait((tipo, pregunta, modo, top_k, futuro))
+        except asyncio.QueueFull:
+            raise ErrorPeticion(503, "Servidor saturado, reintenta en unos instantes")
+        return futuro
+
+    async def _consumir(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            limite = bucle.time() + self.ventana
+            while len(lote) < self.max_lote:
+                restante = limite - bucle.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            # Las que ya agotaron su tiempo (futuro cancelado) no se calculan
+            lote = [item for item in lote if not item[-1].done()]
+            if not lote:
+                continue
+            self.metricas.lotes.observar("", len(lote))
+
+            try:
+                resultados = await bucle.run_in_executor(self._ejecutor, self._resolver, lote)
+            except Exception as e:
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            for (*_, futuro), resultado in zip(lote, resultados):
+                if futuro.done():
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+    def _resolver(self, lote: List[tuple]) -> list:
+        """Calcula un lote en el hilo del motor (una versión del motor para todo el lote)"""
+        motor = self.vigente.motor()
+        grupos = defaultdict(list)
+        for i, (tipo, pregunta, modo, top_k, _) in enumerate(lote):
+            grupos[(tipo, modo, top_k)].append(i)
+
+        # Una sola codificación para todos los grupos que necesitan el modelo
+        semanticos = [clave for clave in grupos if clave[1] != "lexico"]
+        if len(semanticos) > 1 and motor.modelo_listo():
+            preguntas = list(dict.fromkeys(lote[i][1] for clave in semanticos for i in grupos[clave]))
+            motor.codificar_consultas(preguntas)
+
+        resultados: list = [None] * len(lote)
+        for (tipo, modo, top_k), indices in grupos.items():
+            preguntas = [lote[i][1] for i in indices]
+            try:
+                if tipo == "responder":
+                    salida = motor.responder_batch(preguntas, modo=modo)
+                else:
+                    salida = [
+                        [{'id': ent_id, 'nombre': self._nombre(motor, ent_id), 'score': round(score, 6)}
+                         for ent_id, score in fila]
+                        for fila in motor.buscar_batch(preguntas, modo=modo, top_k=top_k)
+                    ]
+            except Exception as e:
+                salida = [e] * len(indices)
+            for i, valor in zip(indices, salida):
+                resultados[i] = valor
+        return resultados
+
+    @staticmethod
+    def _nombre(motor: GraphRAG_v2, ent_id: str) -> str:
+        labels = motor.entidades[ent_id]['labels']
+        return labels[0] if labels else ent_id
+
+
+class ServidorQoyllur:
+    """
+    HTTP/1.1 mínimo sobre asyncio.start_server (keep-alive, JSON, GET y POST)
+    """
+
+    MAX_CUERPO = 64 * 1024
+    TIEMPO_INACTIVO = 30.0
+
+    def __init__(self, vigente: BaseConocimientoVigente, ventana: float = 0.005,
+                 max_lote: int = 32, max_cola: int = 256, timeout: float = 10.0):
+        """
+        Args:
+            vigente: Base de conocimiento (el motor se toma por lote, así las
+                     recargas del TTL se publican sin reiniciar el servidor)
+            ventana: Segundos que se espera a otras peticiones antes de lanzar un lote
+            max_lote: Máximo de preguntas por lote
+            max_cola: Peticiones en espera admitidas antes de responder 503
+            timeout: Segundos máximos por petición antes de responder 504
+        """
+        self.vigente = vigente
+        self.timeout = timeout
+        self.metricas = MetricasServidor()
+        self.agrupador = AgrupadorLotes(vigente, self.metricas, ventana, max_lote, max_cola)
+        self._servidor: Optional[asyncio.AbstractServer] = None
+        self.rutas = {
+            '/responder': self._ruta_responder,
+            '/buscar': self._ruta_buscar,
+            '/health': self._ruta_health,
+            '/metrics': self._ruta_metrics,
+        }
+
+    async def iniciar(self, host: str = "127.0.0.1", puerto: int = 8765):
+        self.agrupador.iniciar()
+        self._servidor = await asyncio.start_server(self._atender, host, puerto)
+        return self._servidor
+
+    async def detener(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        await self.agrupador.detener()
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.TIEMPO_INACTIVO)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._enviar(writer, 413, {'error': "Cabeceras demasiado grandes"}, False)
+                    break
+
+                start = time.perf_counter()
+                ruta = "desconocida"
+                mantener = False
+                try:
+                    metodo, objetivo, version, cabeceras = self._parsear_cabecera(cabecera)
+                    conexion = cabeceras.get('connection', '').lower()
+                    mantener = conexion == 'keep-alive' if version == 'HTTP/1.0' else conexion != 'close'
+
+                    longitud = int(cabeceras.get('content-length', 0) or 0)
+                    if longitud > self.MAX_CUERPO:
+                        mantener = False
+                        raise ErrorPeticion(413, f"Cuerpo mayor de {self.MAX_CUERPO} bytes")
+                    cuerpo = await reader.readexactly(longitud) if longitud else b""
+
+                    partes = urlsplit(objetivo)
+                    manejador = self.rutas.get(partes.path)
+                    if manejador is None:
+                        raise ErrorPeticion(404, f"Ruta desconocida: {partes.path}")
+                    ruta = partes.path
+                    if metodo not in ('GET', 'POST'):
+                        raise ErrorPeticion(405, f"Método no admitido: {metodo}")
+
+                    params = dict(parse_qsl(partes.query))
+                    if cuerpo:
+                        try:
+                            datos = json.loads(cuerpo)
+                        except ValueError:
+                            raise ErrorPeticion(400, "El cuerpo no es JSON válido")
+                        if not isinstance(datos, dict):
+                            raise ErrorPeticion(400, "El cuerpo debe ser un objeto JSON")
+                        params.update(datos)
+
+                    codigo, contenido = await manejador(params)
+                except ErrorPeticion as e:
+                    codigo, contenido = e.codigo, {'error': str(e)}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    codigo, contenido = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                await self._enviar(writer, codigo, contenido, mantener)
+                self.metricas.registrar(ruta, codigo, time.perf_counter() - start)
+                if not mantener:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    @staticmethod
+    def _parsear_cabecera(cabecera: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+        try:
+            lineas = cabecera.decode('latin-1').split("\r\n")
+            metodo, objetivo, version = lineas[0].split(" ", 2)
+        except ValueError:
+            raise ErrorPeticion(400, "Línea de petición inválida")
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if ':' in linea:
+                nombre, valor = linea.split(':', 1)
+                cabeceras[nombre.strip().lower()] = valor.strip()
+        return metodo.upper(), objetivo, version, cabeceras
+
+    @staticmethod
+    async def _enviar(writer: asyncio.StreamWriter, codigo: int, contenido, mantener: bool):
+        if isinstance(contenido, str):
+            cuerpo = contenido.encode('utf-8')
+            tipo = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            cuerpo = json.dumps(contenido, ensure_ascii=False).encode('utf-8')
+            tipo = "application/json; charset=utf-8"
+        cabeceras = [
+            f"HTTP/1.1 {codigo} {ESTADOS_HTTP.get(codigo, '')}",
+            f"Content-Type: {tipo}",
+            f"Content-Length: {len(cuerpo)}",
+            f"Connection: {'keep-alive' if mantener else 'close'}",
+        ]
+        if codigo == 503:
+            cabeceras.append("Retry-After: 1")
+        writer.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode('latin-1') + cuerpo)
+        await writer.drain()
+
+    # ----------------------------------------------------------------- Rutas
+
+    @staticmethod
+    def _validar(params: Dict, campos: Tuple[str, ...]) -> Tuple[str, str]:
+        texto = next((params[c] for c in campos if params.get(c)), None)
+        if not isinstance(texto, str) or not texto.strip():
+            raise ErrorPeticion(400, f"Falta el campo '{campos[0]}'")
+        modo = params.get('modo', 'hibrido')
+        if modo not in MODOS:
+            raise ErrorPeticion(400, f"modo debe ser uno de {', '.join(MODOS)}")
+        return texto.strip(), modo
+
+    async def _esperar(self, futuro: asyncio.Future):
+        try:
+            return await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            raise ErrorPeticion(504, f"Sin respuesta en {self.timeout:g}s")
+
+    async def _ruta_responder(self, params: Dict):
+        pregunta, modo = self._validar(params, ('pregunta', 'q'))
+        respuesta = await self._esperar(self.agrupador.enviar("responder", pregunta, modo, 10))
+        return 200, {'pregunta': pregunta, 'modo': modo, 'respuesta': respuesta}
+
+    async def _ruta_buscar(self, params: Dict):
+        consulta, modo = self._validar(params, ('consulta', 'pregunta', 'q'))
+        try:
+            top_k = int(params.get('top_k', 10))
+        except (TypeError, ValueError):
+            raise ErrorPeticion(400, "top_k debe ser un entero")
+        if not 1 <= top_k <= 100:
+            raise ErrorPeticion(400, "top_k debe estar entre 1 y 100")
+        resultados = await self._esperar(self.agrupador.enviar("buscar", consulta, modo, top_k))
+        return 200, {'consulta': consulta, 'modo': modo, 'resultados': resultados}
+
+    async def _motor(self) -> GraphRAG_v2:
+        """Motor vigente, pedido en un hilo: vigente.motor() puede construirlo y cargar el modelo"""
+        bucle = asyncio.get_running_loop()
+        return await self._esperar(bucle.run_in_executor(None, self.vigente.motor))
+
+    async def _ruta_health(self, params: Dict):
+        motor = await self._motor()
+        return 200, {
+            'estado': "ok" if motor.modelo_listo() else "cargando",
+            'modelo_listo': motor.modelo_listo(),
+            'version': motor.version_grafo,
+            'entidades': len(motor.entidades),
+            'recargas': self.vigente.recargas,
+            'cola': self.agrupador.pendientes(),
+        }
+
+    async def _ruta_metrics(self, params: Dict):
+        motor = await self._motor()
+        return 200, self.metricas.texto(self.agrupador, self.vigente, motor)
+
+
+class ClienteQoyllur:
+    """
+    Cliente síncrono del servidor con la interfaz que usa la app
+    (responder, buscar, modelo_listo), para usarlo en lugar del motor local
+    """
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 15.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _pedir(self, ruta: str, datos: Optional[Dict] = None) -> Dict:
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+        peticion = urllib.request.Request(self.url + ruta, data=cuerpo,
+                                          headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(peticion, timeout=self.timeout) as r:
+                return json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            try:
+                mensaje = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                mensaje = e.reason
+            raise RuntimeError(f"Servidor {e.code}: {mensaje}") from None
+
+    def responder(self, pregunta: str, modo: str = "hibrido", verbose: bool = False) -> str:
+        return self._pedir('/responder', {'pregunta': pregunta, 'modo': modo})['respuesta']
+
+    def buscar(self, consulta: str, modo: str = "hibrido", top_k: int = 10) -> List[Tuple[str, float]]:
+        resultados = self._pedir('/buscar', {'consulta': consulta, 'modo': modo, 'top_k': top_k})['resultados']
+        return [(r['id'], r['score']) for r in resultados]
+
+    def health(self) -> Dict:
+        return self._pedir('/health')
+
+    def modelo_listo(self) -> bool:
+        try:
+            return self.health()['modelo_listo']
+        except (OSError, RuntimeError):
+            return False
+
+
+async def servir(args):
+    vigente = BaseConocimientoVigente(
+        args.ttl,
+        cache_dir=args.cache_dir,
+        motor_kwargs={'model_name': args.modelo, 'persistir_consultas': True, 'materializar': True},
+    )
+    motor = vigente.motor()
+    motor.iniciar_carga_modelo()
+    if not args.sin_vigilar:
+        vigente.iniciar()
+
+    servidor = ServidorQoyllur(vigente, ventana=args.ventana_ms / 1000, max_lote=args.max_lote,
+                               max_cola=args.max_cola, timeout=args.timeout)
+    await servidor.iniciar(args.host, args.puerto)
+    print(f"🌐 Servidor en http://{args.host}:{args.puerto} "
+          f"(ventana {args.ventana_ms:g}ms, lote ≤{args.max_lote}, cola ≤{args.max_cola}, "
+          f"timeout {args.timeout:g}s)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.detener()
+        vigente.detener()
+        vigente.motor().guardar_cache_consultas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    parser.add_argument('--ventana-ms', type=float, default=5.0,
+                        help="Espera máxima para agrupar peticiones en un lote")
+    parser.add_argument('--max-lote', type=int, default=32)
+    parser.add_argument('--max-cola', type=int, default=256,
+                        help="Peticiones en espera antes de responder 503")
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help="Segundos por petición antes de responder 504")
+    parser.add_argument('--sin-vigilar', action='store_true', help="No recargar al cambiar el TTL")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(servir(args))
+    except KeyboardInterrupt:
+        print("\n👋 Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()
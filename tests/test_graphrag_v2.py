@@ -0,0 +1,742 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de GraphRAG v2.0 que no necesitan sentence-transformers
+
+Cada prueba escribe su propio TTL pequeño en tmp_path. Las léxicas usan
+carga_modelo="perezosa"; las semánticas, el backend 'estatico' con una tabla
+destilada de CodificadorPalabras (un vector fijo por palabra), de modo que
+recorren el mismo camino que con el modelo real.
+"""
+
+import sys
+import json
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from graphrag_v2 import (GraphRAG_v2, BaseConocimientoVigente, AlmacenEmbeddings, CacheLRU, CacheEmbeddingsConsulta, IndiceTemporal,
+                         IndiceBM25, IndiceExacto, IndiceFloat16, IndiceInt8, IndiceHNSW, IndiceIVFPQ, SnapshotGrafo,
+                         cargar_grafo,
+                         destilar_estatico, ruta_estatico, _bytes_en_memoria, _normalizar_filas)
+
+PREFIJOS = """\
+@prefix : <http://example.org/festividades#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+"""
+
+
+def escribir_ttl(ruta: Path, cuerpo: str) -> str:
+    ruta.write_text(PREFIJOS + cuerpo, encoding='utf-8')
+    return str(ruta)
+
+
+def crear_motor(ttl: str, cache_dir: Path) -> GraphRAG_v2:
+    return GraphRAG_v2(ttl, cache_dir=str(cache_dir), carga_modelo="perezosa")
+
+
+class CodificadorPalabras:
+    """Codificador determinista para destilar_estatico: un vector pseudoaleatorio por palabra"""
+    
+    dim = 32
+    
+    def encode(self, textos, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        return np.stack([
+            np.random.RandomState(zlib.crc32(t.encode('utf-8'))).randn(self.dim) for t in textos
+        ]).astype(np.float32)
+
+
+def crear_motor_semantico(ttl: str, cache_dir: Path, **kwargs) -> GraphRAG_v2:
+    """Motor con el modelo cargado (backend estático sobre el vocabulario del TTL)"""
+    ruta = ruta_estatico(str(cache_dir), "modelo-prueba")
+    if not ruta.exists():
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        destilar_estatico(CodificadorPalabras(), [Path(ttl).read_text(encoding='utf-8')], ruta)
+    return GraphRAG_v2(ttl, model_name="modelo-prueba", cache_dir=str(cache_dir), backend="estatico",
+                       carga_modelo="inmediata", **kwargs)
+
+
+def test_almacen_embeddings_ida_y_vuelta(tmp_path):
+    almacen = AlmacenEmbeddings(str(tmp_path), "modelo-prueba")
+    hashes = [AlmacenEmbeddings.hash_texto(t) for t in ("Santuario", "Ukukus", "Lomada")]
+    vectores = _normalizar_filas(np.random.RandomState(0).randn(3, 8).astype(np.float32))
+    almacen.guardar(hashes, vectores)
+
+    leidos, matriz = AlmacenEmbeddings(str(tmp_path), "modelo-prueba").cargar()
+    assert leidos == hashes
+    assert matriz.dtype == np.float32
+    np.testing.assert_array_equal(matriz, vectores)
+    assert not matriz.flags.writeable  # mmap de solo lectura
+
+    # Otro modelo no reutiliza los vectores
+    assert AlmacenEmbeddings(str(tmp_path), "otro-modelo").cargar() == ([], None)
+
+
+def test_tipo_de_dominio_con_named_individual(tmp_path):
+    ttl = escribir_ttl(tmp_path / "tipos.ttl", """
+:Lomada_2025 a owl:NamedIndividual, :EventoRitual ;
+    rdfs:label "Lomada (2025)"@es .
+:Sinakara a :Lugar, owl:NamedIndividual ;
+    rdfs:label "Sinakara"@es .
+:SoloIndividuo a owl:NamedIndividual ;
+    rdfs:label "Solo individuo"@es .
+""")
+    motor = crear_motor(ttl, tmp_path / "cache")
+    assert motor.entidades['Lomada_2025']['type'] == 'EventoRitual'
+    assert motor.entidades['Sinakara']['type'] == 'Lugar'
+    assert motor.entidades['SoloIndividuo']['type'] == 'NamedIndividual'
+
+    # Los índices cargados desde la instantánea conservan el tipo
+    desde_snapshot = crear_motor(ttl, tmp_path / "cache")
+    assert desde_snapshot.entidades['Lomada_2025']['type'] == 'EventoRitual'
+
+
+def test_snapshot_deja_de_estar_vigente_al_reescribir_el_ttl(tmp_path):
+    ttl = escribir_ttl(tmp_path / "a.ttl", ':Sinakara rdfs:label "Sinakara"@es .\n')
+    snapshot = SnapshotGrafo(ttl, tmp_path / "snapshot_a")
+    assert len(cargar_grafo(ttl, snapshot)) == 1
+    assert snapshot.vigente()
+    sha = snapshot.sha_ttl
+
+    # El mismo objeto de larga vida detecta el cambio del TTL
+    escribir_ttl(tmp_path / "a.ttl", ':Sinakara rdfs:label "Sinakara"@es, "Santuario"@es .\n')
+    assert not snapshot.vigente()
+    assert snapshot.cargar_seccion('graphrag_v2', GraphRAG_v2.FORMATO_INDICES) is None
+
+    assert len(cargar_grafo(ttl, snapshot)) == 2
+    assert snapshot.vigente() and snapshot.sha_ttl != sha
+
+
+DOCUMENTOS_BM25 = {
+    'Ukuku': {'label': ['ukuku'], 'comment': ['danzante', 'andino'], 'id': ['ukuku']},
+    'Comparsa': {'label': ['comparsa', 'paucartambo'], 'comment': ['ukuku', 'danza', 'ukuku'], 'id': ['comparsa']},
+    'Glaciar': {'label': ['glaciar', 'colque', 'punku', 'nevado', 'andino'], 'comment': ['ukuku'], 'id': ['glaciar']},
+    'Misa': {'label': ['misa', 'santuario'], 'comment': ['misa', 'campal'], 'id': ['misa']},
+}
+
+
+def indice_bm25(documentos=DOCUMENTOS_BM25) -> IndiceBM25:
+    indice = IndiceBM25()
+    for doc_id, campos in documentos.items():
+        indice.agregar(doc_id, campos, [' '.join(campos['label'])])
+    indice.congelar()
+    return indice
+
+
+def bm25f_por_recorrido(indice: IndiceBM25, documentos, terminos) -> dict:
+    """BM25F recorriendo todos los documentos, sin postings (referencia)"""
+    n = len(documentos)
+    medias = {c: sum(len(d.get(c, [])) for d in documentos.values()) / n for c in indice.pesos}
+    scores = {}
+    for termino in dict.fromkeys(terminos):
+        df = sum(any(termino in d.get(c, []) for c in indice.pesos) for d in documentos.values())
+        if not df:
+            continue
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for doc_id, d in documentos.items():
+            tf = sum(indice.pesos[c] * d.get(c, []).count(termino)
+                     / (1.0 - indice.b[c] + indice.b[c] * len(d.get(c, [])) / medias[c]) for c in indice.pesos)
+            if tf:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf / (indice.k1 + tf)
+    frase = ' '.join(terminos)
+    return {doc_id: score * (1.0 + indice.bonus_frase if frase in ' '.join(documentos[doc_id]['label']) else 1.0)
+            for doc_id, score in scores.items()}
+
+
+def test_bm25f_por_postings_coincide_con_recorrido_completo():
+    indice = indice_bm25()
+    for terminos in (['ukuku'], ['andino', 'danza'], ['misa', 'campal'], ['nevado', 'paucartambo', 'santuario']):
+        esperado = bm25f_por_recorrido(indice, DOCUMENTOS_BM25, terminos)
+        obtenido = dict(indice.buscar(terminos, top_k=10))
+        assert obtenido.keys() == esperado.keys()  # solo candidatos de las listas de postings
+        for doc_id, score in esperado.items():
+            assert obtenido[doc_id] == pytest.approx(score, rel=1e-5)
+    assert indice.buscar(['inexistente']) == []
+
+
+def test_bm25f_pondera_campos_y_longitud():
+    documentos = {
+        'EnLabel': {'label': ['ukuku', 'danzante'], 'comment': ['comparsa', 'nacion'], 'id': ['a']},
+        'EnComment': {'label': ['comparsa', 'nacion'], 'comment': ['ukuku', 'danzante'], 'id': ['b']},
+        'CommentLargo': {'label': ['comparsa', 'nacion'],
+                         'comment': ['ukuku', 'danzante', 'de', 'la', 'nacion', 'paucartambo'], 'id': ['c']},
+        'Otro': {'label': ['misa', 'campal'], 'comment': ['santuario'], 'id': ['d']},
+    }
+    scores = dict(indice_bm25(documentos).buscar(['ukuku']))
+    # Mismo tf: el label pesa más que el comment, y un comment corto más que uno largo
+    assert scores['EnLabel'] > scores['EnComment'] > scores['CommentLargo']
+    assert 'Otro' not in scores
+
+
+def test_bm25f_bonus_de_frase_en_label():
+    documentos = {
+        'Frase': {'label': ['senor', 'qoyllur', 'riti'], 'comment': [], 'id': ['frase']},
+        'Sueltas': {'label': ['qoyllur', 'riti', 'senor'], 'comment': [], 'id': ['sueltas']},
+    }
+    indice = indice_bm25(documentos)
+    scores = dict(indice.buscar(['senor', 'qoyllur']))
+    assert scores['Frase'] == pytest.approx(scores['Sueltas'] * (1.0 + indice.bonus_frase))
+
+
+def test_bm25f_exportar_importar_conserva_resultados():
+    indice = indice_bm25()
+    copia = IndiceBM25.importar(*indice.exportar())
+    for terminos in (['ukuku'], ['misa', 'andino'], ['glaciar', 'danza']):
+        assert copia.buscar(terminos) == indice.buscar(terminos)
+
+
+def test_buscar_lexico_normaliza_y_filtra_interrogativos(tmp_path):
+    motor = crear_motor(escribir_ttl(tmp_path / "a.ttl", """\
+:MisaUkukus a :EventoRitual ; rdfs:label "Misa de los ukukus"@es ;
+    rdfs:comment "Celebración en el santuario"@es .
+:Santuario a :Lugar ; rdfs:label "Santuario del Señor de Qoyllur Rit'i"@es ;
+    rdfs:comment "Dónde se celebra la misa de los ukukus"@es .
+:Glaciar a :Lugar ; rdfs:label "Glaciar Colque Punku"@es .
+"""), tmp_path / "cache")
+    resultados = motor.buscar_lexico("¿Dónde es la MISA de los Ukukus?", top_k=5)
+    assert resultados[0] == ('MisaUkukus', 1.0)
+    assert [e for e, _ in resultados] == ['MisaUkukus', 'Santuario']
+    assert all(0.0 < score <= 1.0 for _, score in resultados)
+    # "dónde" está en el comment del santuario, pero el interrogativo no puntúa
+    assert resultados == motor.buscar_lexico("misa ukukus", top_k=5)
+    assert motor.buscar_lexico("palabra_que_no_aparece") == []
+
+
+def test_indice_temporal_ordena_dias_y_eventos(tmp_path):
+    # Marcos y eventos declarados en desorden; un evento sin tieneOrdenEvento
+    ttl = escribir_ttl(tmp_path / "dias.ttl", """
+:Dia2_Domingo rdfs:label "Día 2: Partida"@es ;
+    :tieneOrden "2"^^xsd:integer ;
+    :defineMarcoTemporal :Misa, :Partida .
+:Dia1_Sabado rdfs:label "Sábado de preparación"@es ;
+    :tieneOrden "1"^^xsd:integer ;
+    :defineMarcoTemporal :SinOrden, :Tercero, :Primero, :Segundo .
+:Primero rdfs:label "Primero"@es ; :tieneOrdenEvento "1"^^xsd:integer .
+:Segundo rdfs:label "Segundo"@es ; :tieneOrdenEvento "2"^^xsd:integer .
+:Tercero rdfs:label "Tercero"@es ; :tieneOrdenEvento "3"^^xsd:integer .
+:SinOrden rdfs:label "Sin orden"@es .
+:Misa rdfs:label "Misa"@es ; :tieneOrdenEvento "2"^^xsd:integer .
+:Partida rdfs:label "Partida"@es ; :tieneOrdenEvento "1"^^xsd:integer .
+""")
+    indice = crear_motor(ttl, tmp_path / "cache").indice_temporal()
+    assert isinstance(indice, IndiceTemporal)
+
+    assert indice.marcos == ['Dia1_Sabado', 'Dia2_Domingo']
+    assert [ev for _, ev, _ in indice.eventos['Dia1_Sabado']] == ['Primero', 'Segundo', 'Tercero', 'SinOrden']
+    assert [nombre for _, _, nombre in indice.eventos['Dia2_Domingo']] == ['Partida', 'Misa']
+
+    # Día 2 sale del label; día 1, del ID
+    assert indice.dias == {1: 'Dia1_Sabado', 2: 'Dia2_Domingo'}
+    assert indice.marco_de_pregunta("¿Qué eventos hay el día 2?") == (2, 'Dia2_Domingo')
+    assert indice.marco_de_pregunta("¿Qué pasa el dia 7?") == (7, None)
+
+
+def ttl_peregrinacion(etiqueta: str) -> str:
+    lineas = []
+    for i in range(30):
+        lineas.append(f':Evento{i} a :EventoRitual ;\n'
+                      f'    rdfs:label "Danza de los ukukus {i}{etiqueta}"@es ;\n'
+                      f'    rdfs:comment "Ritual en el glaciar con la comparsa {i % 5}"@es ;\n'
+                      f'    :realizadoEn :Lugar{i % 4} .')
+    for j in range(4):
+        lineas.append(f':Lugar{j} a :Lugar ; rdfs:label "Santuario de Sinakara {j}{etiqueta}"@es .')
+    return '\n'.join(lineas) + '\n'
+
+
+def test_recarga_incremental_coincide_con_arranque_en_frio(tmp_path):
+    # Un sujeto en blanco: rdflib lo ordena antes que las URIs (por URI iría al final)
+    anonimo = ':Evento0 :tieneParticipante [ rdfs:label "Comparsa anónima"@es ] .\n'
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_peregrinacion(" nocturna") + anonimo)
+    motor = crear_motor(ttl_a, tmp_path / "cache")
+    resumen = motor.recargar(ttl_b)
+    assert resumen['entidades_nuevas'] == 1
+
+    frio = crear_motor(ttl_b, tmp_path / "cache_frio")
+    assert motor.entity_texts == frio.entity_texts
+    assert motor._hashes == frio._hashes  # mismas filas en AlmacenEmbeddings
+    assert [motor.entidades[e]['labels'] for e in motor.entity_ids] == \
+        [frio.entidades[e]['labels'] for e in frio.entity_ids]
+    assert motor.version_grafo == frio.version_grafo
+    # Los IDs de los nodos en blanco cambian en cada parseo; los scores no
+    assert [s for _, s in motor.buscar_lexico("comparsa anónima")] == \
+        [s for _, s in frio.buscar_lexico("comparsa anónima")]
+
+
+def test_recarga_nunca_deja_estado_mezclado(tmp_path):
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_peregrinacion(" nocturna"))
+    motor = crear_motor(ttl_a, tmp_path / "cache")
+    consultas = ["danza de los ukukus 3", "santuario sinakara", "ritual en el glaciar", "ukukus nocturna"]
+
+    def resultado():
+        # Cada llamada pública fija un estado; entre llamadas puede publicarse otro
+        return ([motor.buscar_batch(consultas, modo="lexico", top_k=5)]
+                + [motor.responder(c, modo="lexico", usar_cache=False) for c in consultas])
+
+    ref_a = resultado()
+    motor.recargar(ttl_b)
+    ref_b = resultado()
+    motor.recargar(ttl_a)
+    assert ref_a != ref_b
+    assert resultado() == ref_a
+
+    mezclas, errores = [], []
+    fin = threading.Event()
+
+    def consultar():
+        while not fin.is_set():
+            try:
+                obtenido = resultado()
+            except Exception as e:  # pragma: no cover - se informa abajo
+                errores.append(repr(e))
+                return
+            mezclas.extend(r for r, a, b in zip(obtenido, ref_a, ref_b) if r != a and r != b)
+
+    hilos = [threading.Thread(target=consultar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        for i in range(6):
+            motor.recargar(ttl_b if i % 2 == 0 else ttl_a)
+    finally:
+        fin.set()
+        for hilo in hilos:
+            hilo.join()
+
+    assert errores == []
+    assert mezclas == []
+    assert resultado() == ref_a
+
+
+def test_estado_publicado_no_se_modifica_en_sitio(tmp_path):
+    motor = crear_motor(escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion("")), tmp_path / "cache")
+    with pytest.raises(AttributeError):
+        motor.entidades = None
+    with pytest.raises(AttributeError):
+        motor.indice = None
+    assert len(motor.entidades) > 0
+
+
+def test_recarga_publica_el_grafo_con_el_estado(tmp_path):
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_peregrinacion(" nocturna"))
+    motor = crear_motor(ttl_a, tmp_path / "cache")
+    anterior = motor._estado
+    motor.recargar(ttl_b)
+
+    # El estado anterior conserva su grafo y su versión: una consulta fijada a él no ve el nuevo
+    assert anterior.g is not motor.g
+    assert anterior.version_grafo != motor.version_grafo
+    assert not any('nocturna' in str(o) for o in anterior.g.objects())
+    assert any('nocturna' in str(o) for o in motor.g.objects())
+
+
+def test_base_vigente_publica_motor_y_mapa_juntos(tmp_path, monkeypatch):
+    ruta = tmp_path / "vigilado.ttl"
+    escribir_ttl(ruta, ttl_peregrinacion(""))
+    vigente = BaseConocimientoVigente(str(ruta), cache_dir=str(tmp_path / "cache"),
+                                      motor_kwargs={'carga_modelo': "perezosa"})
+    motor = vigente.motor()
+    anterior = vigente.actual()
+    escribir_ttl(ruta, ttl_peregrinacion(" nocturna"))
+
+    # Si el mapa no se puede construir, el motor tampoco publica el grafo nuevo
+    def fallar(g):
+        raise RuntimeError("mapa roto")
+    monkeypatch.setattr("graphrag_v2.extraer_datos_mapa", fallar)
+    assert not vigente.recargar()
+    assert isinstance(vigente.ultimo_error, RuntimeError)
+    assert vigente.actual() is anterior
+    assert motor.version_grafo == anterior.version_grafo
+    assert motor.entidades['Evento0']['labels'] == ['Danza de los ukukus 0']
+
+    monkeypatch.undo()
+    assert vigente.recargar()
+    base = vigente.actual()
+    assert base is not anterior and vigente.motor(base) is motor
+    assert motor.version_grafo == base.version_grafo != anterior.version_grafo
+    assert motor.entidades['Evento0']['labels'] == ['Danza de los ukukus 0 nocturna']
+    assert base._datos_mapa is not None  # calculado antes de publicar
+
+
+def test_materializar_no_deshace_una_recarga(tmp_path):
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_peregrinacion(" nocturna"))
+    motor = GraphRAG_v2(ttl_a, cache_dir=str(tmp_path / "cache"), carga_modelo="perezosa", materializar=True)
+    fin = threading.Event()
+
+    def materializar():
+        while not fin.is_set():
+            motor.materializar_fragmentos()
+
+    hilo = threading.Thread(target=materializar)
+    hilo.start()
+    try:
+        for i in range(6):
+            motor.recargar(ttl_b if i % 2 == 0 else ttl_a)
+        motor.recargar(ttl_b)
+    finally:
+        fin.set()
+        hilo.join()
+
+    assert motor.entidades['Evento0']['labels'] == ['Danza de los ukukus 0 nocturna']
+    assert motor.responder_donde("", 'Evento0') == motor._fragmento_donde('Evento0')
+
+
+def ttl_fragmentos(santuario: str) -> str:
+    """Días, eventos con lugar y orden, y naciones que los realizan (donde, cuando, quien)"""
+    lineas = [f':Lugar0 a :Lugar ; rdfs:label "{santuario}"@es .',
+              ':Lugar1 a :Lugar ; rdfs:label "Glaciar Colque Punku"@es .',
+              ':Paucartambo a :Nacion ; rdfs:label "Nación Paucartambo"@es .',
+              ':Quispicanchi a :Nacion ; rdfs:label "Nación Quispicanchi"@es .',
+              ':Dia1_Sabado rdfs:label "Día 1: Sábado"@es ; :tieneOrden "1"^^xsd:integer ;',
+              '    :defineMarcoTemporal :Evento0, :Evento1, :Evento2 .',
+              ':Dia2_Domingo rdfs:label "Día 2: Domingo"@es ; :tieneOrden "2"^^xsd:integer ;',
+              '    :defineMarcoTemporal :Evento3, :Evento4, :Evento5 .']
+    for i in range(6):
+        lineas.append(f':Evento{i} a :EventoRitual ; rdfs:label "Evento ritual {i}"@es ;\n'
+                      f'    :tieneOrdenEvento "{i % 3 + 1}"^^xsd:integer ;\n'
+                      f'    :ocurreEnLugar :Lugar{i % 2} ;\n'
+                      f'    :realizadoPor :{"Paucartambo" if i < 4 else "Quispicanchi"} .')
+    return '\n'.join(lineas) + '\n'
+
+
+def fragmentos_al_vuelo(motor: GraphRAG_v2) -> dict:
+    return {
+        intencion: {e: f for e in motor.entidades if (f := getattr(motor, f'_fragmento_{intencion}')(e))}
+        for intencion in motor.PLANTILLAS_FRAGMENTO
+    }
+
+
+def test_fragmentos_materializados_coinciden_con_las_plantillas(tmp_path, monkeypatch):
+    ttl = escribir_ttl(tmp_path / "a.ttl", ttl_fragmentos("Santuario de Sinakara"))
+    motor = GraphRAG_v2(ttl, cache_dir=str(tmp_path / "cache"), carga_modelo="perezosa", materializar=True)
+    almacen, fragmentos = motor._fragmentos
+    assert almacen is motor.entidades
+    assert fragmentos == fragmentos_al_vuelo(motor)
+    assert fragmentos['donde']['Evento0'] == "📍 **Evento ritual 0** ocurre en **Santuario de Sinakara**."
+    assert "🔢 Es el evento #2" in fragmentos['cuando']['Evento4']
+    assert fragmentos['quien']['Evento5'] == "👥 **Evento ritual 5** es realizado por **Nación Quispicanchi**."
+
+    # Con los fragmentos al día, las plantillas son una búsqueda en el diccionario
+    for intencion in motor.PLANTILLAS_FRAGMENTO:
+        monkeypatch.setattr(motor, f'_fragmento_{intencion}', None)
+    assert motor.responder_donde("", 'Evento1') == fragmentos['donde']['Evento1']
+    assert motor.responder_quien("", 'Paucartambo') == fragmentos['quien']['Paucartambo']
+    assert motor.responder_cuando("", 'Lugar1') is None
+
+
+def test_fragmentos_se_recalculan_solo_para_los_vecinos_del_cambio(tmp_path):
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_fragmentos("Santuario de Sinakara"))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_fragmentos("Santuario del Señor de Qoyllur Rit'i"))
+    motor = GraphRAG_v2(ttl_a, cache_dir=str(tmp_path / "cache"), carga_modelo="perezosa", materializar=True)
+    resumen = motor.recargar(ttl_b)
+
+    # Lugar0 y los eventos que ocurren en él; el resto de fragmentos se conserva
+    assert resumen['fragmentos_recalculados'] == 4
+    assert motor._fragmentos[0] is motor.entidades
+    assert motor._fragmentos[1] == fragmentos_al_vuelo(motor)
+    assert motor.responder_donde("", 'Evento2') == \
+        "📍 **Evento ritual 2** ocurre en **Santuario del Señor de Qoyllur Rit'i**."
+
+    frio = GraphRAG_v2(ttl_b, cache_dir=str(tmp_path / "cache_frio"), carga_modelo="perezosa", materializar=True)
+    assert motor._fragmentos[1] == frio._fragmentos[1]
+
+
+def test_exportar_faq_con_los_fragmentos(tmp_path):
+    ttl = escribir_ttl(tmp_path / "a.ttl", ttl_fragmentos("Santuario de Sinakara"))
+    motor = GraphRAG_v2(ttl, cache_dir=str(tmp_path / "cache"), carga_modelo="perezosa", materializar=True)
+    ruta = tmp_path / "faq" / "faq.json"
+    n = motor.exportar_faq(str(ruta))
+
+    paquete = json.loads(ruta.read_text(encoding='utf-8'))
+    assert paquete['version_grafo'] == motor.version_grafo
+    assert paquete['dias'] == {'1': 'Dia1_Sabado', '2': 'Dia2_Domingo'}
+    entradas = {e['id']: e for e in paquete['entradas']}
+    assert len(entradas) == n
+    fragmentos = motor._fragmentos[1]
+    for ent_id, entrada in entradas.items():
+        for intencion in motor.PLANTILLAS_FRAGMENTO:
+            assert entrada.get(intencion) == fragmentos[intencion].get(ent_id)
+    assert entradas['Dia2_Domingo']['eventos'] == motor.responder_que_eventos("", 'Dia2_Domingo')
+    assert entradas['Evento3']['tipo'] == 'EventoRitual'
+    assert not list(ruta.parent.glob('*.tmp'))
+
+
+def test_intencion_por_centroides_reutiliza_el_vector_de_la_busqueda(tmp_path, monkeypatch):
+    ttl = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    motor = crear_motor_semantico(ttl, tmp_path / "cache", intencion="mixto")
+    assert motor.clasificador_intencion.centroides is not None
+
+    # La intención no vuelve a consultar la caché: dos preguntas nuevas, dos fallos
+    motor.responder("danza de los ukukus 3", modo="semantico")
+    motor.responder("santuario de sinakara", modo="hibrido")
+    estadisticas = motor.estadisticas_cache()['consultas']
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (0, 2)
+
+    # Sin caché de consultas, los centroides siguen recibiendo el vector de la búsqueda
+    sin_cache = crear_motor_semantico(ttl, tmp_path / "cache", intencion="centroides", cache_consultas=0)
+    vectores = []
+    original = sin_cache.identificar_intencion
+    monkeypatch.setattr(sin_cache, 'identificar_intencion',
+                        lambda pregunta, vector=None: vectores.append(vector) or original(pregunta, vector))
+    sin_cache.responder("danza de los ukukus 3", modo="semantico", usar_cache=False)
+    sin_cache.responder_batch(["ritual en el glaciar", "santuario"], modo="hibrido", usar_cache=False)
+    sin_cache.responder("danza de los ukukus 3", modo="lexico", usar_cache=False)
+    esperados = sin_cache.codificar_consultas(["danza de los ukukus 3", "ritual en el glaciar", "santuario"])
+    np.testing.assert_array_equal(np.stack(vectores[:3]), esperados)
+    assert vectores[3] is None  # modo léxico: reglas
+
+
+def test_cache_de_respuestas_se_invalida_al_cambiar_la_version(tmp_path, monkeypatch):
+    ttl_a = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    ttl_b = escribir_ttl(tmp_path / "b.ttl", ttl_peregrinacion(" nocturna"))
+    motor = crear_motor(ttl_a, tmp_path / "cache")
+    version_a = motor.version()
+
+    # El sello se calcula al publicar: responder no recorre las entidades
+    def huella_en_consulta():
+        raise AssertionError("_huella_embeddings en el camino de la consulta")
+    monkeypatch.setattr(motor, '_huella_embeddings', huella_en_consulta)
+    respuesta_a = motor.responder("danza de los ukukus 3", modo="lexico")
+    assert motor.responder("¿Danza de los ukukus 3?", modo="lexico") == respuesta_a
+    assert motor.estadisticas_cache()['respuestas']['aciertos'] == 1
+    monkeypatch.undo()
+
+    motor.recargar(ttl_b)
+    assert motor.version() != version_a
+    respuesta_b = motor.responder("danza de los ukukus 3", modo="lexico")
+    assert respuesta_b != respuesta_a and 'nocturna' in respuesta_b
+    assert motor.responder_batch(["danza de los ukukus 3"], modo="lexico") == [respuesta_b]
+    assert motor.estadisticas_cache()['respuestas']['entradas'] == 1
+
+
+def test_cache_lru_desaloja_la_menos_reciente():
+    cache = CacheLRU(max_entradas=2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == 1  # 'a' pasa a ser la más reciente
+    cache.guardar('c', 3)
+    assert cache.obtener('b') is None
+    assert (cache.obtener('a'), cache.obtener('c')) == (1, 3)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['entradas'], estadisticas['desalojos']) == (2, 1)
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (3, 1)
+
+    sin_cache = CacheLRU(max_entradas=0)
+    sin_cache.guardar('a', 1)
+    assert sin_cache.obtener('a') is None and len(sin_cache) == 0
+
+
+def test_cache_lru_caduca_por_ttl():
+    cache = CacheLRU(max_entradas=10, ttl=0.05)
+    cache.guardar('a', 1)
+    assert cache.obtener('a') == 1
+    time.sleep(0.1)
+    assert cache.obtener('a') is None
+    assert len(cache) == 0  # la entrada caducada se descarta al leerla
+
+
+def test_cache_consultas_en_disco_ligada_al_modelo(tmp_path):
+    cache = CacheEmbeddingsConsulta("modelo-prueba")
+    vector = _normalizar_filas(np.ones((1, 4)))[0]
+    cache.guardar("donde queda sinakara", vector)
+    cache.guardar_disco(tmp_path / "consultas.npz")
+
+    cargada = CacheEmbeddingsConsulta("modelo-prueba")
+    assert cargada.cargar_disco(tmp_path / "consultas.npz") == 1
+    np.testing.assert_array_equal(cargada.obtener("donde queda sinakara"), vector)
+    assert CacheEmbeddingsConsulta("otro-modelo").cargar_disco(tmp_path / "consultas.npz") == 0
+
+
+def test_motor_reutiliza_el_embedding_de_una_consulta_repetida(tmp_path):
+    motor = crear_motor_semantico(escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion("")), tmp_path / "cache",
+                                  cache_consultas=1)
+    motor.buscar_semantico("danza de los ukukus 3")
+    motor.buscar_semantico("¿Danza de los Ukukus 3?")  # misma forma normalizada
+    motor.buscar_semantico("santuario de sinakara")   # desaloja la anterior
+    motor.buscar_semantico("danza de los ukukus 3")
+    estadisticas = motor.estadisticas_cache()['consultas']
+    assert (estadisticas['aciertos'], estadisticas['fallos'], estadisticas['desalojos']) == (1, 3, 2)
+
+
+def ttl_eventos_distintos() -> str:
+    """Eventos y lugares con palabras propias: sin vectores empatados, el orden está bien definido"""
+    return ''.join(
+        f':Evento{i} a :EventoRitual ; rdfs:label "Danza evento{i} comparsa{i % 7}"@es ;\n'
+        f'    :ocurreEnLugar :Lugar{i % 5} .\n' for i in range(40)
+    ) + ''.join(f':Lugar{j} a :Lugar ; rdfs:label "Santuario lugar{j}"@es .\n' for j in range(5))
+
+
+PREGUNTAS_LOTE = ["¿Dónde es la danza evento3?", "comparsa2", "¿Qué es el santuario lugar1?",
+                  "comparsa2", "danza evento17 comparsa3", "palabra_que_no_aparece"]
+
+
+def mismos_resultados(lote, individuales):
+    assert [[e for e, _ in fila] for fila in lote] == [[e for e, _ in fila] for fila in individuales]
+    for fila, individual in zip(lote, individuales):
+        assert [s for _, s in fila] == pytest.approx([s for _, s in individual], abs=1e-5)
+
+
+def test_busquedas_en_lote_coinciden_con_las_individuales(tmp_path):
+    motor = crear_motor_semantico(escribir_ttl(tmp_path / "a.ttl", ttl_eventos_distintos()), tmp_path / "cache")
+    mismos_resultados(motor.buscar_semantico_batch(PREGUNTAS_LOTE, top_k=5),
+                      [motor.buscar_semantico(p, top_k=5) for p in PREGUNTAS_LOTE])
+    for fusion in ("lineal", "rrf"):
+        mismos_resultados(motor.buscar_hibrido_batch(PREGUNTAS_LOTE, top_k=5, fusion=fusion),
+                          [motor.buscar_hibrido(p, top_k=5, fusion=fusion) for p in PREGUNTAS_LOTE])
+    for modo, individual in (("semantico", motor.buscar_semantico), ("lexico", motor.buscar_lexico),
+                             ("hibrido", motor.buscar_hibrido)):
+        mismos_resultados(motor.buscar_batch(PREGUNTAS_LOTE, modo=modo, top_k=5),
+                          [individual(p, top_k=5) for p in PREGUNTAS_LOTE])
+    assert motor.buscar_batch([], modo="hibrido") == []
+
+
+def test_responder_batch_coincide_con_responder(tmp_path):
+    motor = crear_motor_semantico(escribir_ttl(tmp_path / "a.ttl", ttl_eventos_distintos()), tmp_path / "cache")
+    for modo in ("semantico", "lexico", "hibrido"):
+        esperadas = [motor.responder(p, modo=modo, usar_cache=False) for p in PREGUNTAS_LOTE]
+        assert motor.responder_batch(PREGUNTAS_LOTE, modo=modo, usar_cache=False) == esperadas
+        # Con caché: la primera pasada la llena y la segunda sale entera de ella
+        assert motor.responder_batch(PREGUNTAS_LOTE, modo=modo) == esperadas
+        assert motor.responder_batch(PREGUNTAS_LOTE, modo=modo) == esperadas
+    assert motor.responder_batch(["¿Dónde es la danza evento3?"], modo="lexico")[0] == \
+        "📍 **Danza evento3 comparsa3** ocurre en **Santuario lugar3**."
+    assert motor.responder_batch([]) == []
+
+
+def test_lote_codifica_todas_las_preguntas_en_una_llamada(tmp_path):
+    motor = crear_motor_semantico(escribir_ttl(tmp_path / "a.ttl", ttl_eventos_distintos()), tmp_path / "cache")
+    llamadas = []
+    encode = motor._model.encode
+
+    def contar(textos, *args, **kwargs):
+        llamadas.append(list(textos))
+        return encode(textos, *args, **kwargs)
+    motor._model.encode = contar
+
+    motor.responder_batch(PREGUNTAS_LOTE, modo="hibrido", usar_cache=False)
+    assert len(llamadas) == 1
+    assert len(llamadas[0]) == len(set(PREGUNTAS_LOTE))  # las repetidas se codifican una vez
+
+
+def vectores_aleatorios(n: int, dim: int = 32, semilla: int = 0) -> np.ndarray:
+    return _normalizar_filas(np.random.RandomState(semilla).randn(n, dim))
+
+
+def recall(indice, base: np.ndarray, consultas: np.ndarray, top_k: int = 10) -> float:
+    exacto = IndiceExacto()
+    exacto.construir(base)
+    _, verdad = exacto.buscar(consultas, top_k)
+    _, obtenidos = indice.buscar(consultas, top_k)
+    return sum(len(set(v) & set(o)) for v, o in zip(verdad.tolist(), obtenidos.tolist())) / verdad.size
+
+
+@pytest.mark.parametrize('clase, sin_reordenar', [(IndiceFloat16, 0.99), (IndiceInt8, 0.9)])
+def test_indices_cuantizados_recall(clase, sin_reordenar):
+    base, consultas = vectores_aleatorios(2000), vectores_aleatorios(50, semilla=1)
+    indice = clase(reordenar=4)
+    indice.construir(base)
+    assert recall(indice, base, consultas) >= 0.99
+    assert recall(indice.con_parametros(reordenar=0), base, consultas) >= sin_reordenar
+    assert indice.reordenar == 4  # la copia ajustada no modifica el original
+
+
+def test_indices_cuantizados_no_duplican_la_matriz_float32(tmp_path):
+    base = vectores_aleatorios(2000)
+    sin_reordenar = IndiceInt8(reordenar=0)
+    sin_reordenar.construir(base)
+    assert sin_reordenar.vectores is None
+    assert sin_reordenar.residente() == sin_reordenar.memoria() < base.nbytes / 3
+    assert sin_reordenar.con_parametros(reordenar=4).faltan_vectores()
+
+    # Mapeada desde el almacén se conserva para reordenar sin ocupar memoria propia
+    almacen = AlmacenEmbeddings(str(tmp_path), "modelo-prueba")
+    almacen.guardar([str(i) for i in range(len(base))], base)
+    _, mapeada = almacen.cargar()
+    indice = IndiceFloat16(reordenar=4)
+    indice.construir(mapeada)
+    assert indice.vectores is mapeada and not indice.faltan_vectores()
+    assert indice.residente() == indice.memoria() == base.nbytes // 2
+
+
+def test_motor_cuantizado_con_almacen_mapeado(tmp_path):
+    ttl = escribir_ttl(tmp_path / "a.ttl", ttl_peregrinacion(""))
+    motor = crear_motor_semantico(ttl, tmp_path / "cache", indice_vectorial="int8")
+    assert _bytes_en_memoria(motor.embeddings) == 0  # reabierta desde el almacén tras codificar
+
+    consultas = ["danza de los ukukus 3", "santuario de sinakara", "ritual en el glaciar"]
+    r = motor.verificar_recall(consultas, top_k=5)
+    assert r['recall'] == 1.0
+    assert r['residente_mb'] == r['memoria_mb'] < r['memoria_float32_mb'] / 3
+
+    motor.ajustar_indice(reordenar=0)
+    assert motor.verificar_recall(consultas, top_k=5)['residente_mb'] == r['residente_mb']
+
+
+def test_indice_exacto_ordena_por_similitud():
+    base, consultas = vectores_aleatorios(500), vectores_aleatorios(5, semilla=1)
+    indice = IndiceExacto()
+    indice.construir(base)
+    scores, filas = indice.buscar(consultas, 10)
+    esperadas = np.argsort(-(consultas @ base.T), axis=1, kind='stable')[:, :10]
+    np.testing.assert_array_equal(filas, esperadas)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_indice_hnsw_recall_y_parametros_por_consulta(tmp_path):
+    pytest.importorskip('faiss')
+    base, consultas = vectores_aleatorios(2000), vectores_aleatorios(50, semilla=1)
+    indice = IndiceHNSW(M=16, ef_search=128)
+    indice.construir(base)
+    assert recall(indice, base, consultas) >= 0.95
+
+    # La copia ajustada comparte el índice de faiss sin modificar el original
+    estrecho = indice.con_parametros(ef_search=1)
+    assert estrecho.index is indice.index and indice.ef_search == 128
+    assert recall(estrecho, base, consultas) < recall(indice, base, consultas)
+
+    indice.guardar(tmp_path / "hnsw")
+    cargado = IndiceHNSW()
+    assert cargado.cargar(tmp_path / "hnsw") and cargado.ef_search == 128
+    np.testing.assert_array_equal(cargado.buscar(consultas, 10)[1], indice.buscar(consultas, 10)[1])
+
+
+def test_indice_ivfpq_nprobe(tmp_path):
+    pytest.importorskip('faiss')
+    base, consultas = vectores_aleatorios(4000), vectores_aleatorios(50, semilla=1)
+    indice = IndiceIVFPQ(nlist=64, m=8, nprobe=1)
+    indice.construir(base)
+    todas = indice.con_parametros(nprobe=indice.nlist)
+    assert recall(todas, base, consultas) > recall(indice, base, consultas)
+    assert indice.nprobe == 1
+
+    with pytest.raises(ValueError):
+        IndiceIVFPQ().construir(base[:100])  # muy pocos vectores para entrenar PQ
+
+
+def test_motor_verifica_recall_del_indice_aproximado(tmp_path):
+    pytest.importorskip('faiss')
+    # Palabras distintas por entidad: sin vectores empatados el top-k está bien definido
+    ttl = escribir_ttl(tmp_path / "a.ttl", ''.join(
+        f':Evento{i} rdfs:label "Danza evento{i} comparsa{i % 7} lugar{i % 5}"@es .\n' for i in range(60)))
+    consultas = ["comparsa3 lugar2", "evento17", "danza comparsa5"]
+    motor = crear_motor_semantico(ttl, tmp_path / "cache", indice_vectorial="hnsw",
+                                  parametros_indice={'ef_search': 64})
+    assert isinstance(motor.indice, IndiceHNSW)
+    assert motor.verificar_recall(consultas, top_k=5)['recall'] == 1.0
+
+    # Segundo arranque: índice cargado de disco (misma huella de embeddings)
+    otro = crear_motor_semantico(ttl, tmp_path / "cache", indice_vectorial="hnsw")
+    assert otro.buscar_semantico_batch(consultas, top_k=5) == motor.buscar_semantico_batch(consultas, top_k=5)
+
+    # IVF-PQ no se puede entrenar con 60 entidades: búsqueda exacta
+    pequeno = crear_motor_semantico(ttl, tmp_path / "cache", indice_vectorial="ivfpq")
+    assert type(pequeno.indice) is IndiceExacto
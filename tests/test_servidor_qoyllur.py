@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del servidor HTTP: micro-lotes, contrapresión (503) y tiempo máximo (504)
+
+Cada prueba levanta el servidor en un puerto libre sobre un TTL pequeño,
+con el motor en modo léxico (carga_modelo="perezosa").
+"""
+
+import sys
+import json
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from graphrag_v2 import BaseConocimientoVigente
+from servidor_qoyllur import ServidorQoyllur
+
+TTL = """\
+@prefix : <http://example.org/festividades#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+""" + "".join(
+    f':Evento{i} a :EventoRitual ; rdfs:label "Danza de los ukukus {i}"@es ;\n'
+    f'    rdfs:comment "Ritual en el glaciar con la comparsa {i % 3}"@es .\n'
+    for i in range(12)
+)
+
+CONSULTAS = ["danza de los ukukus 3", "ritual en el glaciar", "comparsa 2", "ukukus 7"]
+
+
+@pytest.fixture
+def vigente(tmp_path):
+    ruta = tmp_path / "servidor.ttl"
+    ruta.write_text(TTL, encoding='utf-8')
+    return BaseConocimientoVigente(str(ruta), cache_dir=str(tmp_path / "cache"),
+                                   motor_kwargs={'carga_modelo': "perezosa"})
+
+
+async def pedir(puerto: int, ruta: str, datos=None):
+    """Una petición HTTP/1.1 con Connection: close; devuelve (código, cabeceras, cuerpo JSON)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", puerto)
+    cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else b""
+    writer.write((f"POST {ruta} HTTP/1.1\r\nHost: prueba\r\nConnection: close\r\n"
+                  f"Content-Length: {len(cuerpo)}\r\n\r\n").encode('latin-1') + cuerpo)
+    await writer.drain()
+    respuesta = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    cabecera, _, contenido = respuesta.partition(b"\r\n\r\n")
+    lineas = cabecera.decode('latin-1').split("\r\n")
+    cabeceras = dict(linea.split(": ", 1) for linea in lineas[1:])
+    return int(lineas[0].split(" ")[1]), cabeceras, json.loads(contenido)
+
+
+def servir(vigente, prueba, **kwargs):
+    """Ejecuta `prueba(servidor, puerto)` con el servidor escuchando en un puerto libre"""
+    async def principal():
+        servidor = ServidorQoyllur(vigente, **kwargs)
+        escucha = await servidor.iniciar("127.0.0.1", 0)
+        try:
+            return await prueba(servidor, escucha.sockets[0].getsockname()[1])
+        finally:
+            await servidor.detener()
+    return asyncio.run(principal())
+
+
+def ralentizar(motor, segundos: float):
+    original = motor.buscar_batch
+
+    def lento(*args, **kwargs):
+        time.sleep(segundos)
+        return original(*args, **kwargs)
+    motor.buscar_batch = lento
+
+
+def test_peticiones_simultaneas_van_en_un_lote(vigente):
+    motor = vigente.motor()
+
+    async def prueba(servidor, puerto):
+        return await asyncio.gather(
+            *[pedir(puerto, "/buscar", {'consulta': c, 'modo': "lexico", 'top_k': 5}) for c in CONSULTAS],
+            *[pedir(puerto, "/responder", {'pregunta': c, 'modo': "lexico"}) for c in CONSULTAS],
+        ), servidor.metricas
+
+    respuestas, metricas = servir(vigente, prueba, ventana=0.2)
+    assert [codigo for codigo, _, _ in respuestas] == [200] * 2 * len(CONSULTAS)
+
+    # Un solo micro-lote con las ocho preguntas
+    assert metricas.lotes.totales[""] == 1
+    assert metricas.lotes.sumas[""] == 2 * len(CONSULTAS)
+
+    # Cada respuesta coincide con la de la llamada individual
+    for consulta, (_, _, cuerpo) in zip(CONSULTAS, respuestas):
+        assert [(r['id'], r['score']) for r in cuerpo['resultados']] == \
+            [(e, round(s, 6)) for e, s in motor.buscar_lexico(consulta, top_k=5)]
+    for consulta, (_, _, cuerpo) in zip(CONSULTAS, respuestas[len(CONSULTAS):]):
+        assert cuerpo['respuesta'] == motor.responder(consulta, modo="lexico", usar_cache=False)
+
+
+def test_cola_llena_responde_503(vigente):
+    ralentizar(vigente.motor(), 0.5)
+
+    async def prueba(servidor, puerto):
+        datos = {'consulta': "ukukus", 'modo': "lexico"}
+        ocupada = asyncio.ensure_future(pedir(puerto, "/buscar", datos))  # la calcula el motor
+        await asyncio.sleep(0.1)
+        en_cola = asyncio.ensure_future(pedir(puerto, "/buscar", datos))  # llena la cola
+        await asyncio.sleep(0.1)
+        rechazada = await pedir(puerto, "/buscar", datos)
+        return rechazada, await ocupada, await en_cola
+
+    (codigo, cabeceras, cuerpo), ocupada, en_cola = servir(vigente, prueba, ventana=0.0, max_cola=1)
+    assert codigo == 503
+    assert cabeceras['Retry-After'] == "1"
+    assert 'error' in cuerpo
+    assert ocupada[0] == en_cola[0] == 200
+
+
+def test_peticion_lenta_responde_504(vigente):
+    ralentizar(vigente.motor(), 0.5)
+
+    async def prueba(servidor, puerto):
+        return await pedir(puerto, "/buscar", {'consulta': "ukukus", 'modo': "lexico"}), servidor.metricas
+
+    (codigo, _, cuerpo), metricas = servir(vigente, prueba, ventana=0.0, timeout=0.1)
+    assert codigo == 504
+    assert 'error' in cuerpo
+    assert metricas.peticiones[("/buscar", 504)] == 1
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del codificador estático (tabla destilada) frente al modelo completo
+Sobre los casos del Evaluador: aciertos de la entidad esperada (semántico e
+híbrido), top-10 común con el modelo completo y latencia de codificar una consulta
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2
+from evaluar_v15_vs_v20 import CONSULTAS_LATENCIA, CASOS_CALIDAD
+
+
+def latencia_us(modelo, consultas, repeticiones: int = 20) -> float:
+    """Mediana (µs) de codificar una consulta aislada, sin caché de consultas"""
+    tiempos = []
+    for _ in range(repeticiones):
+        for consulta in consultas:
+            start = time.perf_counter()
+            modelo.encode([consulta], convert_to_numpy=True)
+            tiempos.append(time.perf_counter() - start)
+    return float(np.median(tiempos) * 1e6)
+
+
+def aciertos(rag: GraphRAG_v2, modo: str) -> int:
+    """Casos cuya entidad esperada aparece en la respuesta (mismo criterio que el Evaluador)"""
+    respuestas = rag.responder_batch([c['query'] for c in CASOS_CALIDAD], modo=modo, usar_cache=False)
+    return sum(c['entidad_esperada'].lower() in r.lower() for c, r in zip(CASOS_CALIDAD, respuestas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    args = parser.parse_args()
+    
+    motores = {
+        backend: GraphRAG_v2(args.ttl, model_name=args.modelo, cache_dir=args.cache_dir,
+                             carga_modelo="inmediata", backend=backend)
+        for backend in ['torch', 'estatico']
+    }
+    consultas = CONSULTAS_LATENCIA + [c['query'] for c in CASOS_CALIDAD]
+    
+    print("=" * 80)
+    print(f"📊 CODIFICADOR ESTÁTICO vs MODELO COMPLETO ({len(CASOS_CALIDAD)} casos, {len(consultas)} consultas)")
+    print("=" * 80)
+    
+    completo = motores['torch']
+    _, top_ref = completo.indice.buscar(completo.codificar_consultas(consultas), 10)
+    for backend, rag in motores.items():
+        _, top = rag.indice.buscar(rag.codificar_consultas(consultas), 10)
+        comun = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top.tolist(), top_ref.tolist())])
+        print(f"\n   {backend:9s} latencia consulta p50={latencia_us(rag._model, consultas):10.1f}µs   "
+              f"top-10 común={comun:.3f}")
+        print(f"   {'':9s} aciertos semántico={aciertos(rag, 'semantico')}/{len(CASOS_CALIDAD)}   "
+              f"híbrido={aciertos(rag, 'hibrido')}/{len(CASOS_CALIDAD)}")
+        tabla = getattr(rag._model, 'tabla', None)
+        if tabla is not None:
+            print(f"   {'':9s} tabla: {len(tabla)} palabras, {tabla.nbytes / 1e6:.2f}MB")
+    
+    print("\n" + "=" * 80)
+
+
+if __name__ == "__main__":
+    main()
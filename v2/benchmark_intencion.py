@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de detección de intención: búsquedas de subcadenas (anterior) vs
+expresiones compiladas de palabras completas, en v1.5 y v2.0, y el
+clasificador de centroides de v2.0 sobre el vector de consulta
+Mide preguntas/s y precisión sobre los casos del Evaluador
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2, ClasificadorIntencion
+from ultralite_qoyllur_v15 import UltraLiteQoyllurV15
+from evaluar_v15_vs_v20 import CASOS_CALIDAD, CASOS_INTENCION
+
+
+# Versiones anteriores (referencia): cascadas de any(w in p for w in [...])
+def intencion_v15_anterior(pregunta: str) -> str:
+    p = pregunta.lower()
+    if any(w in p for w in ['dónde', 'donde', 'lugar', 'ubicación', 'sitio']):
+        return 'donde'
+    elif any(w in p for w in ['cuándo', 'cuando', 'fecha', 'día', 'hora']):
+        return 'cuando'
+    elif any(w in p for w in ['quién', 'quien', 'quiénes', 'quienes', 'participa']):
+        return 'quien'
+    elif any(w in p for w in ['qué', 'que', 'cómo', 'como', 'cuál', 'cual']):
+        if 'evento' in p or 'actividad' in p or 'hito' in p:
+            return 'que_eventos'
+        elif 'danza' in p or 'baile' in p:
+            return 'que_danzas'
+        return 'que'
+    elif 'cuántos' in p or 'cuantos' in p or 'número' in p or 'cantidad' in p:
+        return 'cuantos'
+    return 'general'
+
+
+def intencion_v20_anterior(pregunta: str) -> str:
+    p = pregunta.lower()
+    if any(x in p for x in ['día 1', 'día 2', 'día 3', 'día 4', 'día 5',
+                             'dia 1', 'dia 2', 'dia 3', 'dia 4', 'dia 5',
+                             'dia1', 'dia2', 'dia3', 'dia4', 'dia5']):
+        if any(w in p for w in ['qué', 'que', 'cuales', 'cuáles', 'eventos', 'actividades']):
+            return 'que_eventos'
+    if any(w in p for w in ['dónde', 'donde', 'lugar', 'ubicación', 'sitio', 'está', 'esta']):
+        return 'donde'
+    elif any(w in p for w in ['cuándo', 'cuando', 'fecha', 'día', 'hora']):
+        return 'cuando'
+    elif any(w in p for w in ['quién', 'quien', 'quiénes', 'quienes', 'participa', 'realiza']):
+        return 'quien'
+    elif any(w in p for w in ['qué', 'que', 'cómo', 'como', 'cuál', 'cual']):
+        if 'evento' in p or 'actividad' in p or 'hito' in p:
+            return 'que_eventos'
+        elif 'danza' in p or 'baile' in p:
+            return 'que_danzas'
+        return 'que'
+    elif 'cuántos' in p or 'cuantos' in p or 'número' in p or 'cantidad' in p:
+        return 'cuantos'
+    return 'general'
+
+
+def preguntas_por_segundo(funcion, preguntas, repeticiones: int) -> float:
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        start = time.perf_counter()
+        for pregunta in preguntas:
+            funcion(pregunta)
+        mejor = min(mejor, time.perf_counter() - start)
+    return len(preguntas) / mejor
+
+
+def imprimir_precision(nombre: str, predichas, esperadas, intenciones):
+    por_intencion = defaultdict(lambda: [0, 0])
+    for p, e in zip(predichas, esperadas):
+        por_intencion[e][0] += p == e
+        por_intencion[e][1] += 1
+    total = sum(p == e for p, e in zip(predichas, esperadas)) / len(esperadas)
+    columnas = ''.join(f"{por_intencion[i][0]:>6d}/{por_intencion[i][1]:<2d}" for i in intenciones)
+    print(f"   {nombre:26s} {total:6.1%} {columnas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--sin-modelo', action='store_true', help="Omitir el clasificador de centroides")
+    args = parser.parse_args()
+
+    casos = [(c['query'], c['tipo']) for c in CASOS_CALIDAD] + CASOS_INTENCION
+    preguntas = [q for q, _ in casos]
+    esperadas = [t for _, t in casos]
+    intenciones = list(dict.fromkeys(esperadas))
+
+    clasificador = ClasificadorIntencion()
+    v15 = UltraLiteQoyllurV15.__new__(UltraLiteQoyllurV15)  # solo se usan las reglas
+    variantes = {
+        "v1.5 subcadenas (anterior)": intencion_v15_anterior,
+        "v1.5 compilado": v15.identificar_intencion,
+        "v2.0 subcadenas (anterior)": intencion_v20_anterior,
+        "v2.0 compilado": clasificador.por_reglas,
+    }
+
+    print("=" * 80)
+    print(f"📊 DETECCIÓN DE INTENCIÓN ({len(casos)} casos)")
+    print("=" * 80)
+
+    print(f"\n⚡ Rendimiento")
+    for nombre, funcion in variantes.items():
+        print(f"   {nombre:26s} {preguntas_por_segundo(funcion, preguntas, args.repeticiones):12,.0f} preguntas/s")
+
+    predicciones = {nombre: [funcion(q) for q in preguntas] for nombre, funcion in variantes.items()}
+
+    if not args.sin_modelo:
+        try:
+            rag = GraphRAG_v2(args.ttl, model_name=args.modelo, cache_dir=args.cache_dir,
+                              carga_modelo="inmediata")
+            vectores = rag.codificar_consultas(preguntas)
+            clasificador.entrenar(rag.model)
+            centroide = [clasificador.por_centroide(v)[0] for v in vectores]
+            predicciones["v2.0 centroides"] = centroide
+            predicciones["v2.0 mixto"] = [r if r != 'general' else c
+                                          for r, c in zip(predicciones["v2.0 compilado"], centroide)]
+            start = time.perf_counter()
+            for _ in range(args.repeticiones):
+                for v in vectores:
+                    clasificador.por_centroide(v)
+            qps = args.repeticiones * len(vectores) / (time.perf_counter() - start)
+            print(f"   {'v2.0 centroides':26s} {qps:12,.0f} preguntas/s (vector ya calculado)")
+        except ImportError as e:
+            print(f"   ⚠️  Sin clasificador de centroides: {e}")
+
+    print(f"\n🎯 Precisión (aciertos por intención)")
+    print(f"   {'variante':26s} {'total':>6s} " + ''.join(f"{i[:8]:>9s}" for i in intenciones))
+    for nombre, predichas in predicciones.items():
+        imprimir_precision(nombre, predichas, esperadas, intenciones)
+
+    fallos = [(q, e, predicciones["v2.0 compilado"][i]) for i, (q, e) in enumerate(casos)
+              if predicciones["v2.0 compilado"][i] != e]
+    if fallos:
+        print(f"\n❌ Fallos de v2.0 compilado:")
+        for q, e, p in fallos:
+            print(f"   {q:50s} esperada={e:12s} detectada={p}")
+
+    print("\n" + "=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark del tokenizador léxico: tokens/s de tokens_normalizados()
+(patrones compilados + str.translate + memoización) frente a la normalización
+anterior con re.sub sin compilar, sobre los labels, comments e IDs del grafo
+y las consultas del Evaluador
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2, tokens_normalizados, tokens_id, stem, _tokens_texto
+from evaluar_v15_vs_v20 import CONSULTAS_LATENCIA, CASOS_CALIDAD
+
+
+# Versión anterior (referencia): 4 re.sub por palabra y 7 str.replace por texto
+REGLAS_STEM = [(r'es$', ''), (r's$', ''), (r'ón$', 'on'), (r'í$', 'i')]
+
+
+def stem_anterior(word: str) -> str:
+    word = word.lower()
+    for pattern, replacement in REGLAS_STEM:
+        word = re.sub(pattern, replacement, word)
+    return word
+
+
+def normalizar_anterior(text: str) -> str:
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = re.sub(r'[^\w\sáéíóúüñ]', ' ', text)
+    replacements = {'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ü': 'u', 'ñ': 'n'}
+    for a, b in replacements.items():
+        text = text.replace(a, b)
+    return ' '.join(stem_anterior(w) for w in text.split() if len(w) > 2)
+
+
+def tokens_id_anterior(ent_id: str) -> str:
+    partes = re.findall(r'[A-ZÁÉÍÓÚÑ]?[a-záéíóúüñ]+|[A-ZÁÉÍÓÚÑ]+(?![a-z])|\d+', ent_id)
+    return normalizar_anterior(' '.join(partes))
+
+
+def vaciar_memos():
+    _tokens_texto.cache_clear()
+    stem.cache_clear()
+
+
+def medir(funcion, textos, repeticiones: int, antes=None) -> float:
+    """Segundos por pasada completa (mejor de las repeticiones)"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        start = time.perf_counter()
+        for texto in textos:
+            funcion(texto)
+        mejor = min(mejor, time.perf_counter() - start)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    rag = GraphRAG_v2(args.ttl, cache_dir=args.cache_dir, carga_modelo="perezosa")
+    textos = [t for ent in rag.entidades.values() for t in ent['labels'] + ent['comments']]
+    consultas = CONSULTAS_LATENCIA + [c['query'] for c in CASOS_CALIDAD]
+
+    # Equivalencia con la versión anterior
+    distintos = sum(' '.join(tokens_normalizados(t)) != normalizar_anterior(t) for t in textos + consultas)
+    distintos += sum(' '.join(tokens_id(e)) != tokens_id_anterior(e) for e in rag.entidades)
+    n_tokens = sum(len(tokens_normalizados(t)) for t in textos)
+
+    print("=" * 80)
+    print(f"📊 TOKENIZADOR LÉXICO ({len(textos)} textos del grafo, {n_tokens:,} tokens)")
+    print("=" * 80)
+    print(f"   Diferencias con la versión anterior: {distintos}")
+
+    anterior = medir(normalizar_anterior, textos, args.repeticiones)
+    frio = medir(tokens_normalizados, textos, args.repeticiones, antes=vaciar_memos)
+    caliente = medir(tokens_normalizados, textos, args.repeticiones)
+
+    print(f"\n   {'variante':34s} {'tokens/s':>14s} {'aceleración':>12s}")
+    for nombre, segundos in [("re.sub sin compilar (anterior)", anterior),
+                             ("compilado, memos vacías", frio),
+                             ("compilado, memoizado", caliente)]:
+        print(f"   {nombre:34s} {n_tokens / segundos:14,.0f} {anterior / segundos:11.1f}x")
+
+    # Lo que cuesta ahora una consulta: solo se normaliza la pregunta
+    por_consulta = medir(tokens_normalizados, consultas, args.repeticiones) / len(consultas)
+    print(f"\n   Normalizar una consulta (memoizada): {por_consulta * 1e6:.2f}µs")
+    print("\n" + "=" * 80)
+
+
+if __name__ == "__main__":
+    main()
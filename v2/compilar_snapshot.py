@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compila un TTL a instantánea binaria (términos + tripletas enteras + índices)
+Los motores la cargan en milisegundos y solo vuelven a parsear si el TTL cambia
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2, SnapshotGrafo
+from ultralite_qoyllur_v15 import UltraLiteQoyllurV15
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2", help="Directorio de GraphRAG v2.0")
+    parser.add_argument('--cache-dir-v15', default="cache_v15", help="Directorio de v1.5")
+    parser.add_argument('--forzar', action='store_true', help="Recompilar aunque esté vigente")
+    args = parser.parse_args()
+    
+    stem = Path(args.ttl).stem
+    for cache_dir in (args.cache_dir, args.cache_dir_v15):
+        snapshot = SnapshotGrafo(args.ttl, Path(cache_dir) / f"snapshot_{stem}")
+        if args.forzar or not snapshot.vigente():
+            from rdflib import Graph
+            start = time.time()
+            g = Graph()
+            g.parse(args.ttl, format='turtle')
+            n = snapshot.compilar(g)
+            print(f"✅ {snapshot.directorio}: {n} tripletas en {time.time() - start:.2f}s")
+        else:
+            print(f"♻️  {snapshot.directorio}: vigente")
+    
+    # Los motores añaden sus índices precalculados a la instantánea
+    GraphRAG_v2(args.ttl, cache_dir=args.cache_dir, carga_modelo="perezosa")
+    UltraLiteQoyllurV15(args.ttl, cache_dir=args.cache_dir_v15)
+    
+    print("✅ Instantáneas listas")
+
+
+if __name__ == "__main__":
+    main()
@@ -105,11 +105,13 @@ def diagnosticar_problemas_comunes(rag: GraphRAG_v2):
         ("¿Qué hacen los ukukus?", "Ukumari"),
     ]
     
-    for query, entidad_esperada in queries_problema:
+    # Búsquedas de verificación en un solo lote
+    lote = rag.buscar_hibrido_batch([query for query, _ in queries_problema], top_k=10)
+    
+    for (query, entidad_esperada), results in zip(queries_problema, lote):
         diagnosticar_query(rag, query)
         
         # Verificar si la entidad esperada está en los resultados
-        results = rag.buscar_hibrido(query, top_k=10)
         encontrado = any(ent_id == entidad_esperada or 
                         entidad_esperada.lower() in ent_id.lower() 
                         for ent_id, _ in results)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de estrés de concurrencia: un solo GraphRAG_v2 compartido por muchos
+hilos, como las sesiones de Streamlit con @st.cache_resource
+
+Lanza cientos de consultas en paralelo (responder, responder_batch y
+buscar_batch, con y sin caché) y comprueba que las respuestas son idénticas
+a las secuenciales y que la latencia p99 queda acotada. Con --recargas, otro
+hilo alterna el TTL entre el original y una versión modificada mientras
+tanto: cada respuesta debe coincidir con la de una de las dos versiones
+(nunca una mezcla) y al final el motor vuelve a responder como al principio.
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import io
+from pathlib import Path
+
+import numpy as np
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDFS
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2
+from evaluar_v15_vs_v20 import CONSULTAS_LATENCIA, CASOS_CALIDAD, CASOS_INTENCION
+
+
+def preguntas_prueba() -> list:
+    preguntas = CONSULTAS_LATENCIA + [c['query'] for c in CASOS_CALIDAD] + [q for q, _ in CASOS_INTENCION]
+    return list(dict.fromkeys(preguntas))
+
+
+def escribir_variante(rag: GraphRAG_v2, ttl: str, destino: Path, preguntas: list) -> int:
+    """
+    Copia del TTL con los labels de las entidades más citadas cambiados, para
+    que la versión B responda distinto a varias preguntas
+    """
+    entidades = {r[0][0] for r in (rag.buscar_lexico(q, top_k=1) for q in preguntas) if r}
+    g = Graph()
+    g.parse(ttl, format='turtle')
+    for ent_id in entidades:
+        sujeto = URIRef(rag.entidades[ent_id]['uri'])
+        for label in list(g.objects(sujeto, RDFS.label)):
+            g.remove((sujeto, RDFS.label, label))
+            g.add((sujeto, RDFS.label, Literal(f"{label} [B]", lang=label.language)))
+    g.serialize(destination=str(destino), format='turtle')
+    return len(entidades)
+
+
+def tareas(preguntas: list, modos: list) -> list:
+    """(tipo, modo, preguntas, usar_cache): consultas sueltas, lotes pequeños y búsquedas"""
+    lista = []
+    for i, pregunta in enumerate(preguntas):
+        for modo in modos:
+            lista.append(('responder', modo, (pregunta,), i % 2 == 0))
+            lista.append(('buscar', modo, (pregunta,), False))
+        lote = tuple(preguntas[i:i + 3])
+        lista.append(('lote', modos[i % len(modos)], lote, i % 2 == 1))
+    return lista
+
+
+def ejecutar(rag: GraphRAG_v2, tarea: tuple):
+    tipo, modo, preguntas, usar_cache = tarea
+    if tipo == 'responder':
+        return rag.responder(preguntas[0], modo=modo, usar_cache=usar_cache)
+    if tipo == 'lote':
+        return tuple(rag.responder_batch(list(preguntas), modo=modo, usar_cache=usar_cache))
+    return tuple(tuple(r) for r in rag.buscar_batch(list(preguntas), modo=modo, top_k=10))
+
+
+def referencia(rag: GraphRAG_v2, lista: list) -> dict:
+    """Resultados secuenciales (sin caché) por (tipo, modo, preguntas)"""
+    return {t[:3]: ejecutar(rag, t[:3] + (False,)) for t in lista}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--consultas', type=int, default=2000, help="Tareas mínimas a ejecutar en paralelo")
+    parser.add_argument('--recargas', type=int, default=6, help="Recargas del TTL durante la prueba (0 = ninguna)")
+    parser.add_argument('--max-p99-ms', type=float, default=1000.0)
+    parser.add_argument('--sin-modelo', action='store_true', help="Solo modo léxico (sin sentence-transformers)")
+    args = parser.parse_args()
+
+    modos = ['lexico'] if args.sin_modelo else ['lexico', 'semantico', 'hibrido']
+    directorio = Path(tempfile.mkdtemp(prefix="estres_qoyllur_"))
+    ttl_a, ttl_b = directorio / "version_a.ttl", directorio / "version_b.ttl"
+    shutil.copy(args.ttl, ttl_a)
+
+    print("=" * 80)
+    print(f"🧵 ESTRÉS DE CONCURRENCIA ({args.hilos} hilos, modos: {', '.join(modos)})")
+    print("=" * 80)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rag = GraphRAG_v2(str(ttl_a), model_name=args.modelo, cache_dir=str(directorio / "cache"),
+                          carga_modelo="perezosa" if args.sin_modelo else "inmediata", materializar=True)
+    preguntas = preguntas_prueba()
+    lista = tareas(preguntas, modos)
+
+    # Referencias secuenciales de las dos versiones
+    with contextlib.redirect_stdout(io.StringIO()):
+        ref_a = referencia(rag, lista)
+        ref_b = None
+        if args.recargas:
+            cambiadas = escribir_variante(rag, str(ttl_a), ttl_b, preguntas)
+            rag.recargar(str(ttl_b))
+            ref_b = referencia(rag, lista)
+            rag.recargar(str(ttl_a))
+    distintas = sum(ref_a[t] != ref_b[t] for t in ref_a) if ref_b else 0
+    print(f"   {len(preguntas)} preguntas, {len(ref_a)} tareas distintas")
+    if ref_b:
+        print(f"   Versión B: {cambiadas} entidades renombradas, {distintas} tareas con otro resultado")
+
+    # Consultas en paralelo (y recargas alternas en otro hilo)
+    latencias, errores, mezclas = [], [], []
+    contador = iter(range(10 ** 9))
+    lock = threading.Lock()
+    fin_recargas = threading.Event()
+    recargas_hechas = 0
+
+    def recargar():
+        nonlocal recargas_hechas
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.recargas):
+                rag.recargar(str(ttl_b if i % 2 == 0 else ttl_a))
+                recargas_hechas += 1
+            if args.recargas % 2:
+                rag.recargar(str(ttl_a))
+        fin_recargas.set()
+
+    def trabajar():
+        while True:
+            with lock:
+                n = next(contador)
+            if n >= args.consultas and fin_recargas.is_set():
+                return
+            tarea = lista[n % len(lista)]
+            start = time.perf_counter()
+            try:
+                resultado = ejecutar(rag, tarea)
+            except Exception as e:
+                errores.append((tarea, repr(e)))
+                continue
+            latencias.append(time.perf_counter() - start)
+            if resultado != ref_a[tarea[:3]] and (ref_b is None or resultado != ref_b[tarea[:3]]):
+                mezclas.append(tarea)
+
+    if not args.recargas:
+        fin_recargas.set()
+    start = time.perf_counter()
+    hilos = [threading.Thread(target=trabajar, name=f"consulta-{i}") for i in range(args.hilos)]
+    if args.recargas:
+        hilos.append(threading.Thread(target=recargar, name="recargas"))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - start
+
+    # Tras las recargas el motor vuelve a la versión A
+    finales = sum(ejecutar(rag, t + (False,)) != r for t, r in ref_a.items())
+
+    ms = np.array(latencias) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+    print(f"\n⚡ {len(latencias):,} tareas en {total:.2f}s ({len(latencias) / total:,.0f}/s), "
+          f"{recargas_hechas} recargas")
+    print(f"   Latencia: p50 {p50:.2f}ms | p95 {p95:.2f}ms | p99 {p99:.2f}ms | máx {ms.max() if len(ms) else 0:.2f}ms")
+    print(f"   Errores: {len(errores)} | Resultados distintos de A y B: {len(mezclas)} | "
+          f"Distintos de A al final: {finales}")
+    for tarea, error in errores[:5]:
+        print(f"   ❌ {tarea[0]} {tarea[1]} {tarea[2][0][:40]}: {error}")
+    for tarea in mezclas[:5]:
+        print(f"   ❌ Mezcla en {tarea[0]} {tarea[1]} {tarea[2][0][:40]}")
+
+    fallos = []
+    if errores:
+        fallos.append("excepciones")
+    if mezclas or finales:
+        fallos.append("resultados distintos")
+    if p99 > args.max_p99_ms:
+        fallos.append(f"p99 {p99:.0f}ms > {args.max_p99_ms:.0f}ms")
+    shutil.rmtree(directorio, ignore_errors=True)
+
+    print("\n" + "=" * 80)
+    print(f"❌ FALLO: {', '.join(fallos)}" if fallos else "✅ Respuestas idénticas y latencia acotada")
+    print("=" * 80)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,80 @@ import numpy as np
 # Importar ambas versiones
 sys.path.insert(0, 'uploads')
 from ultralite_qoyllur_v15 import UltraLiteQoyllurV15
-from graphrag_v2 import GraphRAG_v2
+from graphrag_v2 import GraphRAG_v2, INDICES_VECTORIALES
+
+
+# Consultas de latencia y casos de calidad (también los usan otros benchmarks)
+CONSULTAS_LATENCIA = [
+    "¿Qué es Qoyllur Rit'i?",
+    "¿Dónde está el santuario?",
+    "¿Qué hacen los ukukus?",
+    "¿Cuándo es la bajada del glaciar?",
+    "¿Quién realiza la lomada?",
+]
+
+CASOS_CALIDAD = [
+    {
+        'query': '¿Qué es Qoyllur Rit\'i?',
+        'tipo': 'que',
+        'entidad_esperada': 'Festividad',
+        'keywords_esperados': ['peregrinación', 'andina', 'Sinakara']
+    },
+    {
+        'query': '¿Dónde está el glaciar Colque Punku?',
+        'tipo': 'donde',
+        'entidad_esperada': 'Colque Punku',
+        'keywords_esperados': ['glaciar', '5200']
+    },
+    {
+        'query': '¿Quién realiza la lomada?',
+        'tipo': 'quien',
+        'entidad_esperada': 'Nacion',
+        'keywords_esperados': ['Paucartambo', 'Ukumaris']
+    },
+    {
+        'query': '¿Qué eventos hay el día 2?',
+        'tipo': 'que_eventos',
+        'entidad_esperada': 'Domingo',
+        'keywords_esperados': ['misa', 'partida', 'viaje']
+    },
+]
+
+# Preguntas con su intención esperada (incluye trampas de subcadenas: "fiesta", "ahora", "media")
+CASOS_INTENCION = [
+    ("¿Dónde queda el santuario?", 'donde'),
+    ("¿En qué lugar se hace la misa de ukukus?", 'donde'),
+    ("¿Dónde se encuentra Sinakara?", 'donde'),
+    ("Ubicación del glaciar Colque Punku", 'donde'),
+    ("¿Cuándo es la bajada del glaciar?", 'cuando'),
+    ("¿En qué fecha empieza la peregrinación?", 'cuando'),
+    ("¿A qué hora sale la procesión?", 'cuando'),
+    ("¿Cuándo termina la fiesta?", 'cuando'),
+    ("¿Quién realiza la lomada?", 'quien'),
+    ("¿Quiénes participan en la procesión?", 'quien'),
+    ("¿Quién organiza la fiesta?", 'quien'),
+    ("¿Quiénes son los ukukus?", 'quien'),
+    ("¿Qué eventos hay el día 2?", 'que_eventos'),
+    ("¿Qué actividades se realizan en el santuario?", 'que_eventos'),
+    ("¿Cuáles son los eventos del dia 3?", 'que_eventos'),
+    ("¿Qué hitos tiene la peregrinación?", 'que_eventos'),
+    ("¿Qué danzas se bailan en la fiesta?", 'que_danzas'),
+    ("¿Qué baile hacen los ukumaris?", 'que_danzas'),
+    ("¿Cuál es la danza de los chunchos?", 'que_danzas'),
+    ("¿Qué es Qoyllur Rit'i?", 'que'),
+    ("¿Qué hacen los ukukus?", 'que'),
+    ("¿Qué es la lomada?", 'que'),
+    ("¿Qué se celebra en la fiesta?", 'que'),
+    ("¿Qué significa ahora el ukuku?", 'que'),
+    ("¿Cómo se prepara la media luna de la danza?", 'que_danzas'),
+    ("¿Qué representa la fiesta de la estrella?", 'que'),
+    ("¿Qué comen los peregrinos en la festividad?", 'que'),
+    ("¿Cuántos peregrinos asisten?", 'cuantos'),
+    ("¿Cuántas naciones hay?", 'cuantos'),
+    ("Número de danzantes", 'cuantos'),
+    ("Colque Punku", 'general'),
+    ("Señor de Qoyllur Rit'i", 'general'),
+]
 
 
 class Evaluador:
@@ -87,6 +160,13 @@ class Evaluador:
             resultados['v20_hibrido'].append(t)
             print(f"   v2.0 (híbrido): {t*1000:.1f}ms")
         
+        # v2.0 híbrido en lote: una codificación y un producto matricial para todas
+        start = time.time()
+        _ = self.v20.responder_batch(queries, modo="hibrido", usar_cache=False)
+        t = time.time() - start
+        resultados['v20_hibrido_lote'] = [t / len(queries)] * len(queries)
+        print(f"\n📦 v2.0 (híbrido, lote de {len(queries)}): {t*1000:.1f}ms total")
+        
         # Calcular estadísticas
         print("\n" + "=" * 80)
         print("📊 RESUMEN DE LATENCIA")
@@ -125,6 +205,11 @@ class Evaluador:
             'v20_hibrido': {'aciertos': 0, 'total': 0}
         }
         
+        # Respuestas de v2.0 calculadas en lote (una codificación por modo)
+        queries = [test['query'] for test in test_cases]
+        lote_sem = self.v20.responder_batch(queries, modo="semantico")
+        lote_hyb = self.v20.responder_batch(queries, modo="hibrido")
+        
         for i, test in enumerate(test_cases, 1):
             query = test['query']
             entidad_esperada = test['entidad_esperada']
@@ -151,7 +236,7 @@ class Evaluador:
             
             # v2.0 semántico
             print("\n🟢 v2.0 (semántico):")
-            resp20_sem = self.v20.responder(query, modo="semantico", verbose=False)
+            resp20_sem = lote_sem[i - 1]
             print(f"   {resp20_sem[:200]}...")
             
             v20_sem_correcto = entidad_esperada.lower() in resp20_sem.lower()
@@ -164,7 +249,7 @@ class Evaluador:
             
             # v2.0 híbrido
             print("\n🟣 v2.0 (híbrido):")
-            resp20_hyb = self.v20.responder(query, modo="hibrido", verbose=False)
+            resp20_hyb = lote_hyb[i - 1]
             print(f"   {resp20_hyb[:200]}...")
             
             v20_hyb_correcto = entidad_esperada.lower() in resp20_hyb.lower()
@@ -232,6 +317,31 @@ class Evaluador:
                 print(f"   ✅ Mismo top-1 resultado (consistencia alta)")
             else:
                 print(f"   ⚠️  Diferentes top-1 (puede variar según paráfrasis)")
+    
+    def evaluar_cuantizacion(self, queries: List[str], top_k: int = 10) -> Dict:
+        """
+        Recall@k y memoria de los índices float16/int8 frente a float32 exacto
+        
+        'residente' es la memoria propia del proceso con ese índice (índice +
+        embeddings del motor que no están mapeados desde el almacén).
+        """
+        print("\n" + "=" * 80)
+        print(f"🗜️  CUANTIZACIÓN DE EMBEDDINGS (recall@{top_k} vs float32)")
+        print("=" * 80)
+        
+        resultados = {}
+        for tipo in ['float16', 'int8']:
+            for reordenar in [0, 4]:
+                indice = INDICES_VECTORIALES[tipo](reordenar=reordenar)
+                indice.construir(self.v20.embeddings)
+                r = self.v20.verificar_recall(queries, top_k=top_k, indice=indice)
+                nombre = f"{tipo}{' + reordenar' if reordenar else ''}"
+                resultados[nombre] = r
+                print(f"   {nombre:22s} recall@{top_k}={r['recall']:.3f}   "
+                      f"índice={r['memoria_mb']:.2f}MB residente={r['residente_mb']:.2f}MB "
+                      f"(float32: {r['memoria_float32_mb']:.2f}MB)")
+        
+        return resultados
 
 
 def main():
@@ -263,53 +373,28 @@ def main():
     evaluador = Evaluador(ttl_path)
     
     # 1. Test de latencia
-    queries_latencia = [
-        "¿Qué es Qoyllur Rit'i?",
-        "¿Dónde está el santuario?",
-        "¿Qué hacen los ukukus?",
-        "¿Cuándo es la bajada del glaciar?",
-        "¿Quién realiza la lomada?",
-    ]
+    queries_latencia = CONSULTAS_LATENCIA
     
     latencia_results = evaluador.evaluar_latencia(queries_latencia)
     
     # 2. Test de calidad
-    test_cases = [
-        {
-            'query': '¿Qué es Qoyllur Rit\'i?',
-            'tipo': 'que',
-            'entidad_esperada': 'Festividad',
-            'keywords_esperados': ['peregrinación', 'andina', 'Sinakara']
-        },
-        {
-            'query': '¿Dónde está el glaciar Colque Punku?',
-            'tipo': 'donde',
-            'entidad_esperada': 'Colque Punku',
-            'keywords_esperados': ['glaciar', '5200']
-        },
-        {
-            'query': '¿Quién realiza la lomada?',
-            'tipo': 'quien',
-            'entidad_esperada': 'Nacion',
-            'keywords_esperados': ['Paucartambo', 'Ukumaris']
-        },
-        {
-            'query': '¿Qué eventos hay el día 2?',
-            'tipo': 'que_eventos',
-            'entidad_esperada': 'Domingo',
-            'keywords_esperados': ['misa', 'partida', 'viaje']
-        },
-    ]
+    test_cases = CASOS_CALIDAD
     
     calidad_results = evaluador.evaluar_calidad(test_cases)
     
     # 3. Test de sinónimos
     evaluador.test_sinonimos()
     
+    # 3b. Recall de los índices cuantizados sobre las consultas de evaluación
+    cuantizacion_results = evaluador.evaluar_cuantizacion(
+        queries_latencia + [c['query'] for c in test_cases]
+    )
+    
     # 4. Guardar resultados
     resultados_finales = {
         'latencia': {k: [float(x) for x in v] for k, v in latencia_results.items()},
         'calidad': calidad_results,
+        'cuantizacion': cuantizacion_results,
         'timestamp': time.time()
     }
     
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporta las respuestas de plantilla (dónde, cuándo, quién y eventos de cada
+día) como paquete FAQ estático en JSON, para kioscos sin conexión
+No carga el modelo de embeddings: los fragmentos salen solo del grafo
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import GraphRAG_v2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--salida', default="faq_qoyllur.json")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    args = parser.parse_args()
+
+    rag = GraphRAG_v2(args.ttl, cache_dir=args.cache_dir, carga_modelo="perezosa", materializar=True)
+    start = time.time()
+    n = rag.exportar_faq(args.salida)
+    print(f"📦 {n} entradas exportadas a {args.salida} en {time.time() - start:.2f}s "
+          f"({Path(args.salida).stat().st_size / 1e3:.0f}KB)")
+
+
+if __name__ == "__main__":
+    main()
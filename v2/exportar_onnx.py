@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporta el modelo de embeddings a ONNX (fp32 + int8 dinámico), una sola vez
+Usa el modelo ya descargado por sentence-transformers; después GraphRAG_v2
+puede codificar con backend='onnx' u 'onnx-int8' sin importar torch
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import exportar_onnx, ruta_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2",
+                        help="Se exporta a <cache-dir>/onnx_<modelo>, donde lo busca GraphRAG_v2")
+    parser.add_argument('--destino', default=None, help="Directorio de salida explícito (dir_onnx)")
+    parser.add_argument('--sin-int8', action='store_true', help="No generar la variante cuantizada")
+    args = parser.parse_args()
+    
+    destino = args.destino or ruta_onnx(args.cache_dir, args.modelo)
+    print(f"📦 Exportando {args.modelo} -> {destino}")
+    start = time.time()
+    destino = exportar_onnx(args.modelo, destino, cuantizar=not args.sin_int8)
+    print(f"✅ Exportado en {time.time() - start:.1f}s")
+    for archivo in sorted(destino.glob("*.onnx")):
+        print(f"   {archivo.name}: {archivo.stat().st_size / 1e6:.1f}MB")
+    print("   Verificar paridad con PyTorch: python paridad_onnx.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,1875 @@ Optimizado para Raspberry Pi 5 (8GB)
 
 import sys
 import re
+import os
+import json
+import hashlib
+import copy
 import numpy as np
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, Counter
+from collections.abc import Mapping
+from functools import lru_cache, wraps
+from contextlib import contextmanager
 from typing import List, Dict, Tuple, Optional
-import pickle
 import time
+import threading
+import atexit
 
-from rdflib import Graph, Literal
-from rdflib.namespace import RDFS
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from rdflib import Graph, Literal, Namespace, URIRef, BNode
+from rdflib.namespace import RDFS, RDF
+
+# Namespaces de la ontología
+GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
+FESTIVIDAD = Namespace("http://example.org/festividades#")
+
+# rdf:type genéricos de OWL: solo cuentan si la entidad no tiene otro tipo
+TIPOS_GENERICOS = {'NamedIndividual', 'Thing'}
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Índices de los k mayores scores en orden descendente (argpartition + sort de k)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def _normalizar_filas(matriz: np.ndarray) -> np.ndarray:
+    """Normaliza L2 cada fila y devuelve un array float32 contiguo"""
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def _bytes_en_memoria(array: Optional[np.ndarray]) -> int:
+    """Bytes de `array` en memoria propia del proceso (0 si es una vista de un .npy mapeado)"""
+    base = array
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return 0
+        base = getattr(base, 'base', None)
+    return 0 if array is None else array.nbytes
+
+
+def _hash_archivo(ruta: str) -> str:
+    """Huella corta (SHA-1) del contenido de un archivo"""
+    with open(ruta, 'rb') as f:
+        return _hash_contenido(f.read())
+
+
+def _hash_contenido(contenido: bytes) -> str:
+    return hashlib.sha1(contenido).hexdigest()[:16]
+
+
+def normalizar_consulta(texto: str) -> str:
+    """Forma canónica de una pregunta para usarla como clave de caché"""
+    texto = ' '.join(texto.lower().split())
+    return texto.strip(' ¿?¡!.,;:')
+
+
+# Tokenización léxica (patrones compilados una sola vez)
+_TILDES = str.maketrans('áéíóúüñ', 'aeiouun')
+_RE_NO_PALABRA = re.compile(r'[^\w\sáéíóúüñ]')
+_RE_PARTES_ID = re.compile(r'[A-ZÁÉÍÓÚÑ]?[a-záéíóúüñ]+|[A-ZÁÉÍÓÚÑ]+(?![a-z])|\d+')
+
+
+@lru_cache(maxsize=65536)
+def stem(palabra: str) -> str:
+    """Stemming básico en español (reglas de v1.5: -es, -s, -ón, -í), memoizado"""
+    palabra = palabra.lower()
+    if palabra.endswith('es'):
+        palabra = palabra[:-2]
+    if palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if palabra.endswith('ón'):
+        palabra = palabra[:-2] + 'on'
+    if palabra.endswith('í'):
+        palabra = palabra[:-1] + 'i'
+    return palabra
+
+
+@lru_cache(maxsize=65536)
+def _tokens_texto(texto: str) -> Tuple[str, ...]:
+    texto = _RE_NO_PALABRA.sub(' ', texto.lower()).translate(_TILDES)
+    return tuple(stem(w) for w in texto.split() if len(w) > 2)
+
+
+def tokens_normalizados(texto: str) -> Tuple[str, ...]:
+    """
+    Tokens léxicos de un texto: minúsculas, sin puntuación ni tildes,
+    palabras de más de dos letras y con stemming (memoizado por texto)
+    """
+    if not isinstance(texto, str):
+        return ()
+    return _tokens_texto(texto)
+
+
+def tokens_id(ent_id: str) -> Tuple[str, ...]:
+    """Tokens normalizados de un ID (separa CamelCase, guiones bajos y números)"""
+    return tokens_normalizados(' '.join(_RE_PARTES_ID.findall(ent_id)))
+
+
+# Ejemplos por intención para el clasificador de centroides (modo 'centroides'/'mixto')
+EJEMPLOS_INTENCION = {
+    'donde': [
+        "¿Dónde queda el santuario?", "Ubicación del glaciar", "¿En qué lugar se celebra la misa?",
+        "¿Dónde se encuentra Sinakara?", "Sitio donde acampan los peregrinos",
+    ],
+    'cuando': [
+        "¿Cuándo es la procesión?", "¿En qué fecha empieza la festividad?", "¿A qué hora sale la peregrinación?",
+        "¿Qué día suben al glaciar?", "Fecha de la bajada",
+    ],
+    'quien': [
+        "¿Quién realiza la danza?", "¿Quiénes participan en la lomada?", "¿Qué nación organiza la entrada?",
+        "Participantes de la procesión", "¿Quiénes suben al glaciar?",
+    ],
+    'que_eventos': [
+        "¿Qué eventos hay el día 3?", "Actividades del primer día", "¿Qué hitos tiene la peregrinación?",
+        "¿Qué actividades se realizan en el santuario?", "Programa de eventos de la fiesta",
+    ],
+    'que_danzas': [
+        "¿Qué danzas se bailan?", "¿Qué baile hacen los ukukus?", "Danzas de la festividad",
+        "¿Qué comparsas bailan en el santuario?", "¿Cómo es la danza de los chunchos?",
+    ],
+    'que': [
+        "¿Qué es Qoyllur Rit'i?", "¿Qué significa ukuku?", "¿Cómo se originó la festividad?",
+        "Explica qué es el Señor de Qoyllur Rit'i", "¿Cuál es el origen del santuario?",
+    ],
+    'cuantos': [
+        "¿Cuántos peregrinos asisten?", "¿Cuántas naciones participan?", "Número de danzantes",
+        "Cantidad de días de la fiesta", "¿Cuántos eventos hay?",
+    ],
+}
+
+
+class ClasificadorIntencion:
+    """
+    Clasificador de intención construido una sola vez
+    
+    La pregunta se parte en palabras y cada una (sin puntuación ni tildes) se
+    busca en un diccionario palabra -> rasgo o en una tupla de prefijos
+    ('evento*'); el resultado se memoiza por palabra, así que el coste no
+    crece con el número de palabras clave y 'esta' ya no casa dentro de
+    'fiesta'. Las reglas se evalúan en orden de prioridad: una regla se
+    cumple si cada uno de sus grupos tiene algún rasgo presente.
+    
+    Opcionalmente se entrena con centroides de embeddings de EJEMPLOS_INTENCION
+    y clasifica el vector de consulta ya calculado (sin codificar de nuevo).
+    """
+    
+    RASGOS = {
+        'donde': ('donde', 'lugar', 'ubicacion', 'sitio', 'esta'),
+        'cuando': ('cuando', 'fecha', 'dia', 'hora'),
+        'quien': ('quien', 'quienes'),
+        'accion': ('participa*', 'realiza*'),
+        'que': ('que', 'como', 'cual', 'cuales'),
+        'eventos': ('evento*', 'actividad*', 'hito*'),
+        'danzas': ('danza*', 'baile*'),
+        'cuantos': ('cuantos', 'cuantas', 'numero', 'cantidad'),
+    }
+    
+    REGLAS = (
+        ('que_eventos', ('dia_n',), ('que', 'eventos')),  # "¿qué eventos hay el día 2?"
+        ('donde', ('donde',)),
+        ('cuando', ('cuando', 'dia_n')),
+        ('quien', ('quien',)),
+        ('que_eventos', ('que',), ('eventos',)),
+        ('que_danzas', ('que',), ('danzas',)),
+        ('quien', ('accion',)),  # "¿qué nación realiza...?", pero no "¿qué actividades se realizan?"
+        ('que', ('que',)),
+        ('cuantos', ('cuantos',)),
+    )
+    
+    _PUNTUACION = '¿?¡!.,;:()"«»'
+    _RE_DIA_NUM = re.compile(r'dia\d+')        # rasgo 'dia_n' en una palabra: "dia2"
+    _RE_DIA_N = re.compile(r'\bd[ií]a\s*\d')  # y en dos: "día 2"
+    MAX_MEMO = 65536
+    
+    def __init__(self):
+        self._palabras = {p: r for r, ps in self.RASGOS.items() for p in ps if not p.endswith('*')}
+        self._prefijos = tuple((p[:-1], r) for r, ps in self.RASGOS.items() for p in ps if p.endswith('*'))
+        self._inicios = tuple(p for p, _ in self._prefijos)
+        self._reglas = [(intencion, [frozenset(g) for g in grupos]) for intencion, *grupos in self.REGLAS]
+        self._memo: Dict[str, Tuple[str, ...]] = {}
+        self.intenciones: List[str] = []
+        self.centroides: Optional[np.ndarray] = None
+    
+    def _rasgos_palabra(self, palabra: str) -> Tuple[str, ...]:
+        """Rasgos de una palabra tal como aparece en la pregunta en minúsculas"""
+        w = palabra.strip(self._PUNTUACION).translate(_TILDES)
+        rasgo = self._palabras.get(w)
+        if rasgo is not None:
+            rasgos = (rasgo,)
+        elif w.startswith(self._inicios):
+            rasgos = tuple(r for p, r in self._prefijos if w.startswith(p))
+        elif self._RE_DIA_NUM.fullmatch(w):
+            rasgos = ('dia_n',)
+        else:
+            rasgos = ()
+        if len(self._memo) < self.MAX_MEMO:
+            self._memo[palabra] = rasgos
+        return rasgos
+    
+    def rasgos(self, pregunta: str) -> set:
+        """Rasgos presentes en la pregunta"""
+        texto = pregunta.lower()
+        presentes = set()
+        memo = self._memo
+        for palabra in texto.split():
+            rasgos = memo.get(palabra)
+            if rasgos is None:
+                rasgos = self._rasgos_palabra(palabra)
+            presentes.update(rasgos)
+        if 'cuando' in presentes and self._RE_DIA_N.search(texto):
+            presentes.add('dia_n')
+        return presentes
+    
+    def por_reglas(self, pregunta: str) -> str:
+        presentes = self.rasgos(pregunta)
+        for intencion, grupos in self._reglas:
+            for grupo in grupos:
+                if presentes.isdisjoint(grupo):
+                    break
+            else:
+                return intencion
+        return 'general'
+    
+    def entrenar(self, modelo, ejemplos: Optional[Dict[str, List[str]]] = None):
+        """Un centroide normalizado por intención (una sola llamada a encode)"""
+        ejemplos = ejemplos or EJEMPLOS_INTENCION
+        intenciones = [i for i, textos in ejemplos.items() for _ in textos]
+        vectores = _normalizar_filas(modelo.encode(
+            [t for textos in ejemplos.values() for t in textos], convert_to_numpy=True
+        ))
+        self.intenciones = list(ejemplos)
+        etiquetas = np.array([self.intenciones.index(i) for i in intenciones])
+        self.centroides = _normalizar_filas(np.stack([
+            vectores[etiquetas == k].mean(axis=0) for k in range(len(self.intenciones))
+        ]))
+    
+    def por_centroide(self, vector: np.ndarray) -> Tuple[str, float]:
+        """(intención, similitud coseno) del centroide más cercano"""
+        scores = self.centroides @ vector
+        k = int(np.argmax(scores))
+        return self.intenciones[k], float(scores[k])
+
+
+class CacheLRU:
+    """
+    Caché LRU acotada y segura entre hilos, con TTL opcional y métricas
+    
+    Las entradas más antiguas se descartan al superar max_entradas; con ttl
+    (segundos) las entradas caducadas se tratan como fallos.
+    """
+    
+    def __init__(self, max_entradas: int = 1024, ttl: Optional[float] = None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (instante, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+    
+    def __len__(self) -> int:
+        return len(self._datos)
+    
+    def obtener(self, clave):
+        """Devuelve el valor o None (cuenta acierto/fallo)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and self.ttl is not None and time.time() - entrada[0] > self.ttl:
+                del self._datos[clave]
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+    
+    def guardar(self, clave, valor):
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (time.time(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+    
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+    
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / total if total else 0.0,
+            }
+
+
+class CacheEmbeddingsConsulta(CacheLRU):
+    """
+    Caché LRU de embeddings de consulta (clave: pregunta normalizada)
+    
+    Puede persistirse en disco para que las preguntas frecuentes estén
+    calientes justo después de reiniciar, sin cargar el modelo.
+    """
+    
+    def __init__(self, model_name: str, max_entradas: int = 1024, ttl: Optional[float] = None):
+        super().__init__(max_entradas, ttl)
+        self.model_name = model_name
+    
+    def guardar_disco(self, ruta: str):
+        with self._lock:
+            claves = list(self._datos.keys())
+            vectores = [v for _, v in self._datos.values()]
+        if not claves:
+            return
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps({'model_name': self.model_name})),
+                     claves=np.array(claves), vectores=np.stack(vectores))
+        os.replace(tmp, ruta)
+    
+    def cargar_disco(self, ruta: str) -> int:
+        """Carga entradas guardadas (en orden LRU); devuelve cuántas se cargaron"""
+        if not Path(ruta).exists():
+            return 0
+        try:
+            with np.load(ruta, allow_pickle=False) as data:
+                if json.loads(str(data['meta'])).get('model_name') != self.model_name:
+                    return 0
+                claves = [str(c) for c in data['claves']]
+                vectores = data['vectores']
+        except Exception as e:
+            print(f"   ⚠️  No se pudo leer la caché de consultas: {e}")
+            return 0
+        for clave, vector in zip(claves, vectores):
+            vector.flags.writeable = False
+            self.guardar(clave, vector)
+        return len(claves)
+
+
+def _guardar_npy(ruta: Path, matriz: np.ndarray, meta: Dict):
+    """
+    Escribe una matriz .npy y su sidecar JSON (misma ruta, extensión .json)
+    
+    Ambos se escriben de forma atómica (temporal + rename); el .npy primero,
+    así un lector nunca ve metadatos que describan un .npy a medio escribir.
+    Los procesos que ya lo tengan mapeado conservan la versión anterior.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(ruta.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(matriz))
+    os.replace(tmp, ruta)
+    
+    ruta_meta = ruta.with_suffix('.json')
+    tmp = ruta_meta.with_name(ruta_meta.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, ruta_meta)
+
+
+def _cargar_npy(ruta: Path, clave: str = 'hashes') -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+    """
+    Abre una matriz .npy con mmap (solo lectura) junto con su sidecar JSON
+    
+    Las páginas se comparten entre procesos a través de la caché del sistema
+    operativo y no se ejecuta código pickle al cargar. La lista meta[clave]
+    debe tener una entrada por fila.
+    
+    Returns:
+        (meta, matriz); (None, None) si falta algún archivo o no coinciden
+    """
+    ruta = Path(ruta)
+    ruta_meta = ruta.with_suffix('.json')
+    if not ruta.exists() or not ruta_meta.exists():
+        return None, None
+    with open(ruta_meta, encoding='utf-8') as f:
+        meta = json.load(f)
+    matriz = np.load(ruta, mmap_mode='r', allow_pickle=False)
+    if matriz.ndim != 2 or len(matriz) != len(meta.get(clave, [])):
+        return None, None
+    return meta, matriz
+
+
+class AlmacenEmbeddings:
+    """
+    Almacén persistente de embeddings direccionado por contenido
+    
+    Cada vector se guarda bajo el hash del texto de su entidad (salida de
+    _build_entity_text), en un .npy por modelo (normalizado, float32) con un
+    sidecar JSON que registra nombre, dimensión y hashes. Al reiniciar solo
+    se codifican entidades nuevas o modificadas; si cambia el modelo o su
+    dimensión, el archivo se descarta.
+    """
+    
+    def __init__(self, directorio: str, model_name: str):
+        self.directorio = Path(directorio)
+        self.model_name = model_name
+        slug = re.sub(r'[^\w.-]', '_', model_name)
+        self.ruta = self.directorio / f"embeddings_{slug}.npy"
+    
+    @staticmethod
+    def hash_texto(texto: str) -> str:
+        """Hash estable del texto de una entidad"""
+        return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+    
+    def cargar(self) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        Abre los vectores guardados para este modelo (mmap, solo lectura)
+        
+        No requiere el modelo cargado: la dimensión de la matriz se valida
+        cuando el modelo esté disponible.
+        
+        Returns:
+            (hashes, matriz normalizada fila a fila); ([], None) si no hay archivo válido
+        """
+        try:
+            meta, vectores = _cargar_npy(self.ruta)
+        except Exception as e:
+            print(f"   ⚠️  No se pudo leer el almacén de embeddings: {e}")
+            return [], None
+        if meta is None:
+            return [], None
+        if meta.get('model_name') != self.model_name:
+            print(f"   ⚠️  Almacén de embeddings de otro modelo, se ignora")
+            return [], None
+        return meta['hashes'], vectores
+    
+    def guardar(self, hashes: List[str], vectores: np.ndarray):
+        """Escribe el almacén de forma atómica (vectores ya normalizados)"""
+        meta = {'model_name': self.model_name, 'dim': int(vectores.shape[1]), 'hashes': list(hashes)}
+        _guardar_npy(self.ruta, vectores.astype(np.float32, copy=False), meta)
+
+
+BACKENDS_CODIFICADOR = ('torch', 'onnx', 'onnx-int8', 'estatico')
+
+
+def ruta_onnx(cache_dir: Optional[str], model_name: str) -> Path:
+    """Directorio por defecto del modelo exportado: <cache_dir>/onnx_<modelo>"""
+    slug = re.sub(r'[^\w.-]', '_', model_name)
+    return Path(cache_dir or ".") / f"onnx_{slug}"
+
+
+def exportar_onnx(model_name: str, destino: str, cuantizar: bool = True, opset: int = 14) -> Path:
+    """
+    Exporta un SentenceTransformer ya descargado a ONNX (una sola vez)
+    
+    Escribe en `destino` el transformer (modelo.onnx), su versión cuantizada
+    dinámicamente a int8 (modelo_int8.onnx), el tokenizer y codificador.json
+    con el pooling y la normalización del modelo original. codificador.json
+    se escribe al final: su presencia indica una exportación completa.
+    
+    Requiere sentence-transformers, torch y onnx (y onnxruntime para cuantizar).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    modelo = SentenceTransformer(model_name, device='cpu')
+    
+    # Solo se exporta el transformer; pooling y normalización se hacen en NumPy
+    modulos = [type(m).__name__ for m in modelo]
+    if modulos[0] != 'Transformer' or any(m not in ('Pooling', 'Normalize') for m in modulos[1:]):
+        raise ValueError(f"Arquitectura no soportada para ONNX: {modulos}")
+    pooling = 'mean'
+    for m in modelo:
+        if type(m).__name__ == 'Pooling' and getattr(m, 'pooling_mode_cls_token', False):
+            pooling = 'cls'
+    
+    transformer = modelo[0]
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    ejemplo = tokenizer(["texto de ejemplo"], return_tensors='pt')
+    nombres = list(ejemplo.keys())
+    
+    class _Envoltorio(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.auto_model = auto_model
+        
+        def forward(self, *entradas):
+            return self.auto_model(**dict(zip(nombres, entradas))).last_hidden_state
+    
+    ejes = {n: {0: 'batch', 1: 'secuencia'} for n in nombres + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(_Envoltorio(), tuple(ejemplo[n] for n in nombres), str(destino / "modelo.onnx"),
+                          input_names=nombres, output_names=['last_hidden_state'],
+                          dynamic_axes=ejes, opset_version=opset)
+    tokenizer.save_pretrained(str(destino))
+    
+    if cuantizar:
+        cuantizar_onnx(destino)
+    
+    config = {
+        'model_name': model_name,
+        'dim': int(modelo.get_sentence_embedding_dimension()),
+        'pooling': pooling,
+        'normalizar': 'Normalize' in modulos,
+        'max_seq_length': int(modelo.max_seq_length),
+    }
+    with open(destino / "codificador.json", 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    return destino
+
+
+def cuantizar_onnx(directorio: str):
+    """Cuantización dinámica a int8 (pesos) de modelo.onnx -> modelo_int8.onnx"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    directorio = Path(directorio)
+    quantize_dynamic(str(directorio / "modelo.onnx"), str(directorio / "modelo_int8.onnx"),
+                     weight_type=QuantType.QInt8)
+
+
+class CodificadorONNX:
+    """
+    Codificador de frases con ONNX Runtime (misma interfaz que SentenceTransformer)
+    
+    Usa un modelo exportado con exportar_onnx(): no importa torch, y la
+    variante int8 reduce a la cuarta parte los pesos que se leen por consulta.
+    """
+    
+    def __init__(self, directorio: str, cuantizado: bool = False, hilos: Optional[int] = None):
+        """
+        Args:
+            directorio: Salida de exportar_onnx()
+            cuantizado: Usar modelo_int8.onnx en vez de modelo.onnx
+            hilos: Hilos intra-op de ONNX Runtime (None = los que elija ORT)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        directorio = Path(directorio)
+        with open(directorio / "codificador.json", encoding='utf-8') as f:
+            self.config = json.load(f)
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if hilos:
+            opciones.intra_op_num_threads = hilos
+        archivo = "modelo_int8.onnx" if cuantizado else "modelo.onnx"
+        self.sesion = ort.InferenceSession(str(directorio / archivo), opciones,
+                                           providers=['CPUExecutionProvider'])
+        self.entradas = {e.name for e in self.sesion.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(directorio))
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dim']
+    
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False) -> np.ndarray:
+        """Embeddings (n, dim) float32, o (dim,) si `sentences` es un str"""
+        unica = isinstance(sentences, str)
+        textos = [sentences] if unica else list(sentences)
+        salida = np.zeros((len(textos), self.config['dim']), dtype=np.float32)
+        
+        # Lotes de longitud parecida: menos padding
+        orden = np.argsort([-len(t) for t in textos], kind='stable')
+        for a in range(0, len(textos), batch_size):
+            filas = orden[a:a + batch_size]
+            tokens = self.tokenizer([textos[i] for i in filas], padding=True, truncation=True,
+                                    max_length=self.config['max_seq_length'], return_tensors='np')
+            feed = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.entradas}
+            ocultos = self.sesion.run(None, feed)[0]
+            salida[filas] = self._pooling(ocultos, tokens['attention_mask'])
+        
+        if self.config['normalizar'] or normalize_embeddings:
+            salida = _normalizar_filas(salida)
+        return salida[0] if unica else salida
+    
+    def _pooling(self, ocultos: np.ndarray, mascara: np.ndarray) -> np.ndarray:
+        if self.config['pooling'] == 'cls':
+            return ocultos[:, 0]
+        mascara = mascara[..., None].astype(np.float32)
+        return (ocultos * mascara).sum(axis=1) / np.maximum(mascara.sum(axis=1), 1e-9)
+
+
+# Vocabulario base del codificador estático, además del de la ontología: términos
+# frecuentes en las preguntas y vocabulario quechua/andino de la festividad
+VOCABULARIO_BASE = [
+    # Español
+    'fiesta', 'festividad', 'celebración', 'peregrinación', 'peregrino', 'peregrinos', 'viaje',
+    'camino', 'ruta', 'caminata', 'subida', 'bajada', 'ascenso', 'descenso', 'llegada', 'partida',
+    'lugar', 'sitio', 'ubicación', 'pueblo', 'comunidad', 'santuario', 'templo', 'iglesia',
+    'capilla', 'plaza', 'cruz', 'montaña', 'cerro', 'nevado', 'glaciar', 'hielo', 'nieve',
+    'laguna', 'río', 'valle', 'altura', 'altitud', 'día', 'noche', 'madrugada', 'fecha',
+    'hora', 'mes', 'junio', 'mayo', 'corpus', 'christi', 'trinidad', 'domingo', 'lunes',
+    'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'misa', 'procesión', 'ritual',
+    'rito', 'ceremonia', 'ofrenda', 'danza', 'danzante', 'danzantes', 'baile', 'bailarín',
+    'música', 'canto', 'vestimenta', 'traje', 'máscara', 'imagen', 'señor', 'virgen', 'cristo',
+    'dios', 'santo', 'sagrado', 'religioso', 'católico', 'andino', 'indígena', 'tradición',
+    'costumbre', 'historia', 'origen', 'leyenda', 'milagro', 'función', 'papel', 'significado',
+    'grupo', 'nación', 'naciones', 'cargo', 'autoridad', 'organizador', 'guardián', 'guardianes',
+    # Quechua / andino
+    'apu', 'apus', 'taytacha', 'pachamama', 'ukuku', 'ukukus', 'ukumari', 'ukumaris', 'pablito',
+    'chunchu', 'chunchus', "ch'unchu", 'qolla', 'qhapaq', 'qollas', 'wayri', 'qoyllur', "rit'i",
+    'riti', 'sinakara', 'ausangate', 'colque', 'punku', 'ccatcca', 'ocongate', 'mahuayani',
+    'tayankani', 'paucartambo', 'quispicanchi', 'cusco', 'qosqo', 'inti', 'killa', 'ayllu',
+    'despacho', 'coca', 'k\'intu', 'kintu', 'lomada', 'huaylia', 'wayllacha', 'qaqa', 'urqu',
+    'yaku', 'ñan', 'hatun', 'taki', 'tusuy', 'arariwa', 'prioste', 'carguyoq', 'mayordomo',
+]
+
+# Palabras sin contenido: no aportan al vector de una frase
+PALABRAS_VACIAS = {
+    'de', 'del', 'el', 'la', 'los', 'las', 'lo', 'un', 'una', 'unos', 'unas', 'y', 'o', 'a',
+    'al', 'en', 'es', 'son', 'se', 'su', 'sus', 'que', 'qué', 'quién', 'quienes', 'quiénes',
+    'dónde', 'donde', 'cuándo', 'cuando', 'cómo', 'como', 'cuál', 'cual', 'cuáles', 'hay',
+    'está', 'esta', 'están', 'con', 'por', 'para', 'sobre', 'entre', 'desde', 'hasta', 'muy',
+    'más', 'me', 'te', 'le', 'les', 'nos', 'este', 'esto', 'ese', 'eso', 'hace', 'hacen',
+}
+
+
+def _palabras(texto: str) -> List[str]:
+    """Palabras en minúsculas (conserva tildes y apóstrofos quechuas)"""
+    return re.findall(r"\w+(?:'\w+)?", texto.lower())
+
+
+def ruta_estatico(cache_dir: Optional[str], model_name: str) -> Path:
+    """Tabla destilada por defecto: <cache_dir>/estatico_<modelo>.npy"""
+    slug = re.sub(r'[^\w.-]', '_', model_name)
+    return Path(cache_dir or ".") / f"estatico_{slug}.npy"
+
+
+def destilar_estatico(modelo, textos: List[str], destino: str,
+                      vocabulario_extra: Optional[List[str]] = None) -> Path:
+    """
+    Destila un codificador de frases en una tabla estática de palabras
+    
+    Cada palabra del vocabulario (las de `textos` más el vocabulario base)
+    se codifica una vez con el modelo completo. El peso de cada palabra
+    (SIF: a / (a + frecuencia)) reduce la influencia de las muy frecuentes
+    en la ontología. Se resta el vector medio de la tabla, que es común a
+    todas las palabras y solo acerca frases no relacionadas.
+    
+    Args:
+        modelo: SentenceTransformer (u objeto con la misma interfaz encode)
+        textos: Textos del dominio (p. ej. entity_texts del motor)
+        destino: Ruta del .npy (la tabla, float16) con sidecar .json
+        vocabulario_extra: Palabras añadidas al vocabulario base
+    """
+    frecuencias = defaultdict(int)
+    for texto in textos:
+        for palabra in _palabras(texto):
+            frecuencias[palabra] += 1
+    for palabra in (vocabulario_extra if vocabulario_extra is not None else VOCABULARIO_BASE):
+        frecuencias.setdefault(palabra.lower(), 0)
+    vocabulario = sorted(p for p in frecuencias if p not in PALABRAS_VACIAS and len(p) > 1)
+    
+    tabla = np.asarray(modelo.encode(vocabulario, batch_size=64, convert_to_numpy=True), dtype=np.float32)
+    tabla = _normalizar_filas(tabla - tabla.mean(axis=0))
+    
+    total = sum(frecuencias.values()) or 1
+    a = 1e-3
+    pesos = [a / (a + frecuencias[p] / total) for p in vocabulario]
+    
+    destino = Path(destino)
+    _guardar_npy(destino, tabla.astype(np.float16), {
+        'vocabulario': vocabulario,
+        'pesos': pesos,
+        'dim': int(tabla.shape[1]),
+    })
+    return destino
+
+
+class CodificadorEstatico:
+    """
+    Codificador de frases por consulta a tabla (misma interfaz que SentenceTransformer)
+    
+    El vector de una frase es la media ponderada de los vectores de sus
+    palabras en la tabla destilada con destilar_estatico(): cuesta
+    microsegundos y no necesita torch ni ONNX Runtime. Las palabras fuera
+    del vocabulario se buscan sin tildes y sin plural; si no aparecen, se
+    ignoran.
+    """
+    
+    def __init__(self, ruta: str):
+        meta, tabla = _cargar_npy(Path(ruta), clave='vocabulario')
+        if meta is None:
+            raise FileNotFoundError(f"No hay tabla estática en {ruta}")
+        self.tabla = tabla
+        self.pesos = np.asarray(meta['pesos'], dtype=np.float32)
+        self.dim = meta['dim']
+        self.indice: Dict[str, int] = {}
+        for fila, palabra in enumerate(meta['vocabulario']):
+            self.indice[palabra] = fila
+        for fila, palabra in enumerate(meta['vocabulario']):
+            self.indice.setdefault(palabra.translate(_TILDES), fila)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+    
+    def _fila(self, palabra: str) -> Optional[int]:
+        fila = self.indice.get(palabra)
+        if fila is None:
+            palabra = palabra.translate(_TILDES)
+            fila = self.indice.get(palabra)
+            for sufijo in ('es', 's'):
+                if fila is None and palabra.endswith(sufijo) and len(palabra) > len(sufijo) + 2:
+                    fila = self.indice.get(palabra[:-len(sufijo)])
+        return fila
+    
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False) -> np.ndarray:
+        """Embeddings (n, dim) float32 normalizados, o (dim,) si `sentences` es un str"""
+        unica = isinstance(sentences, str)
+        textos = [sentences] if unica else list(sentences)
+        salida = np.zeros((len(textos), self.dim), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            filas = [f for f in (self._fila(p) for p in _palabras(texto) if p not in PALABRAS_VACIAS)
+                     if f is not None]
+            if filas:
+                salida[i] = self.pesos[filas] @ self.tabla[filas].astype(np.float32)
+        salida = _normalizar_filas(salida)
+        return salida[0] if unica else salida
+
+
+class CodificadorSerializado:
+    """
+    Envoltura de un codificador (SentenceTransformer, ONNX o estático) que
+    serializa las llamadas a encode
+    
+    Los tokenizadores rápidos de HuggingFace no admiten llamadas concurrentes
+    ("Already borrowed") y torch/ONNX Runtime ya reparten cada llamada entre
+    los núcleos, así que las consultas de varias sesiones se turnan en vez de
+    competir. Los motores que adoptan el modelo comparten la envoltura y, con
+    ella, el lock. El resto de atributos se delegan en el codificador.
+    """
+    
+    def __init__(self, codificador):
+        self.codificador = codificador
+        self._lock = threading.Lock()
+    
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self.codificador.encode(*args, **kwargs)
+    
+    def __getattr__(self, nombre):
+        return getattr(self.codificador, nombre)
+
+
+def _top_k_filas(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k por fila de una matriz de scores (nq, N) -> (scores, índices) de forma (nq, k)"""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    orden = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top_scores, orden, axis=1), np.take_along_axis(top, orden, axis=1)
+
+
+class IndiceExacto:
+    """
+    Índice vectorial exacto: producto punto contra la matriz completa
+    
+    Todos los índices vectoriales comparten la interfaz construir / buscar /
+    ajustar / guardar / cargar y asumen vectores normalizados (producto
+    punto = similitud coseno).
+    """
+    
+    tipo = 'exacto'
+    PERSISTENTE = False  # True si el índice se guarda en disco junto a su huella
+    
+    def __init__(self, **params):
+        self.vectores = None
+    
+    def __len__(self) -> int:
+        return 0 if self.vectores is None else len(self.vectores)
+    
+    def construir(self, vectores: np.ndarray):
+        self.vectores = vectores
+    
+    def ajustar(self, **params):
+        """Sin parámetros de búsqueda: el recall siempre es 1.0"""
+    
+    def con_parametros(self, **params) -> 'IndiceExacto':
+        """Copia con otros parámetros de búsqueda que comparte los datos del índice"""
+        copia = copy.copy(self)
+        copia.ajustar(**params)
+        return copia
+    
+    def buscar(self, consultas: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            consultas: Matriz (nq, d) de consultas normalizadas
+            top_k: Vecinos por consulta
+            
+        Returns:
+            (scores, índices) de forma (nq, k); índice -1 = sin resultado
+        """
+        return _top_k_filas(consultas @ self.vectores.T, top_k)
+    
+    def guardar(self, ruta: str):
+        """Nada que guardar: los vectores viven en el almacén de embeddings"""
+    
+    def cargar(self, ruta: str) -> bool:
+        return False
+    
+    def memoria(self) -> int:
+        """Bytes que ocupa la matriz recorrida en cada búsqueda"""
+        return 0 if self.vectores is None else self.vectores.nbytes
+    
+    def residente(self) -> int:
+        """Bytes en memoria propia del proceso (los vectores mapeados no cuentan)"""
+        return _bytes_en_memoria(self.vectores)
+    
+    def faltan_vectores(self) -> bool:
+        """True si los parámetros actuales necesitan datos que el índice no conservó"""
+        return False
+
+
+class IndiceCuantizado(IndiceExacto):
+    """
+    Búsqueda exacta sobre una copia cuantizada de los vectores
+    
+    'float16' reduce la matriz a la mitad; 'int8' (cuantización escalar con
+    una escala por dimensión) a la cuarta parte. Los scores se calculan por
+    bloques de filas cuantizadas, de modo que en cada búsqueda se recorre la
+    copia compacta y no la float32. Opcionalmente se reordenan los
+    `reordenar * top_k` mejores candidatos con los vectores float32.
+    
+    Solo se conserva una referencia a los float32 si se van a reordenar o si
+    están mapeados desde el almacén (no ocupan memoria propia y solo se leen
+    las filas candidatas); con reordenar=0 sobre una matriz en memoria, el
+    índice no la retiene.
+    """
+    
+    tipo = 'cuantizado'
+    precision = 'int8'
+    BLOQUE = 256  # filas convertidas a float32 a la vez (la copia temporal cabe en caché L2)
+    
+    def __init__(self, reordenar: int = 4, **params):
+        """
+        Args:
+            reordenar: Candidatos por resultado que se puntúan en float32 (0 = no reordenar)
+        """
+        super().__init__()
+        self.reordenar = reordenar
+        self.codigos = None
+        self.escala = None
+    
+    def __len__(self) -> int:
+        return 0 if self.codigos is None else len(self.codigos)
+    
+    def construir(self, vectores: np.ndarray):
+        self.vectores = vectores if self.reordenar or not _bytes_en_memoria(vectores) else None
+        if self.precision == 'float16':
+            self.codigos = np.asarray(vectores, dtype=np.float16)
+            return
+        maximo = np.abs(vectores).max(axis=0) if len(vectores) else np.zeros(vectores.shape[1])
+        self.escala = np.where(maximo > 0, maximo / 127.0, 1.0).astype(np.float32)
+        self.codigos = np.clip(np.rint(vectores / self.escala), -127, 127).astype(np.int8)
+    
+    def ajustar(self, reordenar: Optional[int] = None, **params):
+        if reordenar is not None:
+            self.reordenar = int(reordenar)
+    
+    def memoria(self) -> int:
+        if self.codigos is None:
+            return 0
+        return self.codigos.nbytes + (0 if self.escala is None else self.escala.nbytes)
+    
+    def residente(self) -> int:
+        return self.memoria() + _bytes_en_memoria(self.vectores)
+    
+    def faltan_vectores(self) -> bool:
+        return bool(self.reordenar) and self.vectores is None
+    
+    def _scores(self, consultas: np.ndarray) -> np.ndarray:
+        """Producto punto aproximado contra los códigos, bloque a bloque"""
+        consultas = np.asarray(consultas, dtype=np.float32)
+        if self.escala is not None:
+            # q · (c * escala) = (q * escala) · c
+            consultas = consultas * self.escala
+        n = len(self.codigos)
+        scores = np.empty((len(consultas), n), dtype=np.float32)
+        for a in range(0, n, self.BLOQUE):
+            bloque = self.codigos[a:a + self.BLOQUE].astype(np.float32)
+            scores[:, a:a + len(bloque)] = consultas @ bloque.T
+        return scores
+    
+    def buscar(self, consultas: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self._scores(consultas)
+        if not self.reordenar or self.vectores is None:
+            return _top_k_filas(scores, top_k)
+        
+        # Reordenar los candidatos con los vectores float32
+        _, candidatos = _top_k_filas(scores, top_k * self.reordenar)
+        exactos = np.einsum('qd,qkd->qk', np.asarray(consultas, dtype=np.float32),
+                            np.asarray(self.vectores[candidatos], dtype=np.float32))
+        top_scores, orden = _top_k_filas(exactos, top_k)
+        return top_scores, np.take_along_axis(candidatos, orden, axis=1)
+
+
+class IndiceFloat16(IndiceCuantizado):
+    """Búsqueda exacta sobre vectores float16 (mitad de memoria)"""
+    tipo = 'float16'
+    precision = 'float16'
+
+
+class IndiceInt8(IndiceCuantizado):
+    """Búsqueda exacta sobre vectores int8 con escala por dimensión (cuarta parte de memoria)"""
+    tipo = 'int8'
+    precision = 'int8'
+
+
+class _IndiceFaiss(IndiceExacto):
+    """Base de los índices aproximados respaldados por faiss (dependencia opcional)"""
+    
+    PERSISTENTE = True
+    
+    def __init__(self):
+        super().__init__()
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError(
+                f"El índice '{self.tipo}' requiere faiss: pip install faiss-cpu"
+            )
+        self._faiss = faiss
+        self.index = None
+    
+    def __len__(self) -> int:
+        return 0 if self.index is None else self.index.ntotal
+    
+    def _params(self) -> Dict:
+        """Parámetros que se guardan junto al índice"""
+        return {}
+    
+    def _parametros_busqueda(self):
+        """
+        Parámetros de faiss por consulta: el índice de faiss no se modifica al
+        ajustar, así que las copias de con_parametros() pueden compartirlo
+        """
+        return None
+    
+    def memoria(self) -> int:
+        return 0 if self.index is None else self._faiss.serialize_index(self.index).nbytes
+    
+    def residente(self) -> int:
+        return self.memoria()  # faiss guarda su propia copia de los datos
+    
+    def buscar(self, consultas: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores, indices = self.index.search(np.ascontiguousarray(consultas, dtype=np.float32), top_k,
+                                            params=self._parametros_busqueda())
+        return scores, indices
+    
+    def guardar(self, ruta: str):
+        ruta = Path(ruta)
+        ruta.mkdir(parents=True, exist_ok=True)
+        self._faiss.write_index(self.index, str(ruta / "indice.faiss"))
+        with open(ruta / "params.json", 'w', encoding='utf-8') as f:
+            json.dump({'tipo': self.tipo, **self._params()}, f)
+    
+    def cargar(self, ruta: str) -> bool:
+        ruta = Path(ruta)
+        if not (ruta / "indice.faiss").exists():
+            return False
+        self.index = self._faiss.read_index(str(ruta / "indice.faiss"))
+        with open(ruta / "params.json", encoding='utf-8') as f:
+            params = json.load(f)
+        params.pop('tipo', None)
+        self.ajustar(**{k: v for k, v in params.items() if k in self._params()})
+        return True
+
+
+class IndiceHNSW(_IndiceFaiss):
+    """
+    Grafo HNSW (faiss.IndexHNSWFlat, producto interno)
+    
+    ef_search controla el compromiso recall/latencia en consulta; M y
+    ef_construccion solo afectan a la construcción.
+    """
+    
+    tipo = 'hnsw'
+    
+    def __init__(self, M: int = 32, ef_construccion: int = 200, ef_search: int = 64):
+        super().__init__()
+        self.M = M
+        self.ef_construccion = ef_construccion
+        self.ef_search = ef_search
+    
+    def _params(self) -> Dict:
+        return {'M': self.M, 'ef_construccion': self.ef_construccion, 'ef_search': self.ef_search}
+    
+    def construir(self, vectores: np.ndarray):
+        faiss = self._faiss
+        self.index = faiss.IndexHNSWFlat(vectores.shape[1], self.M, faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = self.ef_construccion
+        self.index.add(np.ascontiguousarray(vectores, dtype=np.float32))
+        self.ajustar(ef_search=self.ef_search)
+    
+    def ajustar(self, ef_search: Optional[int] = None, **params):
+        if ef_search is not None:
+            self.ef_search = int(ef_search)
+    
+    def _parametros_busqueda(self):
+        return self._faiss.SearchParametersHNSW(efSearch=self.ef_search)
+
+
+class IndiceIVFPQ(_IndiceFaiss):
+    """
+    Índice IVF con cuantización de producto (faiss.IndexIVFPQ, producto interno)
+    
+    nprobe (listas visitadas por consulta) controla el compromiso
+    recall/latencia. Requiere suficientes vectores para entrenar: nlist se
+    reduce automáticamente en grafos pequeños.
+    """
+    
+    tipo = 'ivfpq'
+    MIN_VECTORES = 1024  # por debajo, PQ de 8 bits no se puede entrenar con fiabilidad
+    
+    def __init__(self, nlist: int = 1024, m: int = 48, nbits: int = 8, nprobe: int = 16):
+        super().__init__()
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self.nprobe = nprobe
+    
+    def _params(self) -> Dict:
+        return {'nlist': self.nlist, 'm': self.m, 'nbits': self.nbits, 'nprobe': self.nprobe}
+    
+    def construir(self, vectores: np.ndarray):
+        n, dim = vectores.shape
+        if n < self.MIN_VECTORES:
+            raise ValueError(f"IVF-PQ necesita al menos {self.MIN_VECTORES} vectores (hay {n})")
+        if dim % self.m:
+            raise ValueError(f"m={self.m} debe dividir la dimensión {dim}")
+        faiss = self._faiss
+        # ~39 vectores de entrenamiento por lista como mínimo
+        self.nlist = max(1, min(self.nlist, n // 39))
+        cuantizador = faiss.IndexFlatIP(dim)
+        self.index = faiss.IndexIVFPQ(cuantizador, dim, self.nlist, self.m, self.nbits,
+                                      faiss.METRIC_INNER_PRODUCT)
+        datos = np.ascontiguousarray(vectores, dtype=np.float32)
+        self.index.train(datos)
+        self.index.add(datos)
+        self.ajustar(nprobe=self.nprobe)
+    
+    def ajustar(self, nprobe: Optional[int] = None, **params):
+        if nprobe is not None:
+            self.nprobe = int(nprobe)
+    
+    def _parametros_busqueda(self):
+        return self._faiss.SearchParametersIVF(nprobe=self.nprobe)
+
+
+INDICES_VECTORIALES = {
+    'exacto': IndiceExacto,
+    'float16': IndiceFloat16,
+    'int8': IndiceInt8,
+    'hnsw': IndiceHNSW,
+    'ivfpq': IndiceIVFPQ,
+}
+
+
+class RegistroEntidad:
+    """
+    Datos escalares de una entidad (sin relaciones, que viven en el almacén)
+    
+    tokens_labels (una tupla por label), tokens_comments y tokens_id se
+    rellenan al indexar con tokens_normalizados(), para que las consultas no
+    vuelvan a normalizar el texto del grafo.
+    """
+    
+    __slots__ = ('uri', 'labels', 'descriptions', 'comments', 'type', 'propiedades',
+                 'tokens_labels', 'tokens_comments', 'tokens_id')
+    
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.labels = []
+        self.descriptions = []
+        self.comments = []
+        self.type = None
+        self.propiedades = {}
+        self.tokens_labels = None
+        self.tokens_comments = None
+        self.tokens_id = None
+    
+    def tokenizar(self, ent_id: str):
+        """Calcula los tokens normalizados de labels, comments e ID"""
+        self.tokens_labels = tuple(tokens_normalizados(l) for l in self.labels)
+        self.tokens_comments = tuple(t for c in self.comments for t in tokens_normalizados(c))
+        self.tokens_id = tokens_id(ent_id)
+
+
+class VistaRelaciones(Mapping):
+    """Vista de solo lectura predicado → [ids] sobre una fila de la adyacencia CSR"""
+    
+    __slots__ = ('_almacen', '_inicio', '_fin', '_vecinos', '_predicados')
+    
+    def __init__(self, almacen: 'AlmacenEntidades', fila: int, inversa: bool):
+        indptr, vecinos, predicados = almacen._inversa if inversa else almacen._directa
+        self._almacen = almacen
+        self._inicio = int(indptr[fila])
+        self._fin = int(indptr[fila + 1])
+        self._vecinos = vecinos
+        self._predicados = predicados
+    
+    def _rango(self, prop: str) -> Tuple[int, int]:
+        pid = self._almacen.indice_predicados.get(prop)
+        if pid is None:
+            return 0, 0
+        # Dentro de cada fila las aristas están ordenadas por predicado
+        fila = self._predicados[self._inicio:self._fin]
+        return (self._inicio + int(np.searchsorted(fila, pid, 'left')),
+                self._inicio + int(np.searchsorted(fila, pid, 'right')))
+    
+    def __getitem__(self, prop: str) -> List[str]:
+        a, b = self._rango(prop)
+        if a == b:
+            raise KeyError(prop)
+        ids = self._almacen.ids
+        return [ids[j] for j in self._vecinos[a:b].tolist()]
+    
+    def __iter__(self):
+        predicados = self._almacen.predicados
+        for pid in np.unique(self._predicados[self._inicio:self._fin]).tolist():
+            yield predicados[pid]
+    
+    def __len__(self) -> int:
+        return len(np.unique(self._predicados[self._inicio:self._fin]))
+
+
+class VistaEntidad(Mapping):
+    """Vista tipo dict de una entidad: ent['labels'], ent.get('relaciones', {}), ..."""
+    
+    __slots__ = ('_almacen', '_fila')
+    
+    CLAVES = ('uri', 'labels', 'descriptions', 'comments', 'type', 'propiedades',
+              'tokens_labels', 'tokens_comments', 'tokens_id',
+              'relaciones', 'relaciones_inversas')
+    
+    def __init__(self, almacen: 'AlmacenEntidades', fila: int):
+        self._almacen = almacen
+        self._fila = fila
+    
+    def __getitem__(self, clave: str):
+        if clave == 'relaciones':
+            return VistaRelaciones(self._almacen, self._fila, inversa=False)
+        if clave == 'relaciones_inversas':
+            return VistaRelaciones(self._almacen, self._fila, inversa=True)
+        if clave not in self.CLAVES:
+            raise KeyError(clave)
+        return getattr(self._almacen.registros[self._fila], clave)
+    
+    def __iter__(self):
+        return iter(self.CLAVES)
+    
+    def __len__(self) -> int:
+        return len(self.CLAVES)
+
+
+class AlmacenEntidades(Mapping):
+    """
+    Almacén compacto de entidades con IDs enteros
+    
+    Los IDs de texto se internan una sola vez y se asignan a enteros densos:
+    primero las entidades (sujetos, en orden de aparición) y después los
+    objetos que no son sujetos. Los datos escalares van en registros con
+    __slots__ y las relaciones en dos matrices CSR (directa e inversa) con
+    una columna de predicado, ordenada por predicado dentro de cada fila.
+    
+    Se accede como a un dict de solo lectura: almacen[ent_id] devuelve una
+    VistaEntidad con las mismas claves que el dict anterior.
+    """
+    
+    def __init__(self):
+        self.ids: List[str] = []
+        self.indice_ids: Dict[str, int] = {}
+        self.registros: List[RegistroEntidad] = []
+        self.predicados: List[str] = []
+        self.indice_predicados: Dict[str, int] = {}
+        self.uris_predicados: Dict[str, str] = {}  # prop -> URI completa (orden de predicados)
+        self._aristas = []  # (fila sujeto, prop, uri predicado, id objeto) hasta congelar
+        vacia = (np.zeros(1, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int16))
+        self._directa = vacia
+        self._inversa = vacia
+    
+    def registro(self, ent_id: str, uri: str) -> RegistroEntidad:
+        """Registro de la entidad, creándolo si es la primera vez que aparece como sujeto"""
+        fila = self.indice_ids.get(ent_id)
+        if fila is None:
+            fila = len(self.registros)
+            ent_id = sys.intern(ent_id)
+            self.indice_ids[ent_id] = fila
+            self.ids.append(ent_id)
+            self.registros.append(RegistroEntidad(uri))
+        return self.registros[fila]
+    
+    def agregar_registro(self, ent_id: str, registro: RegistroEntidad):
+        """Añade un registro ya construido (p. ej. reutilizado de otro almacén)"""
+        ent_id = sys.intern(ent_id)
+        self.indice_ids[ent_id] = len(self.registros)
+        self.ids.append(ent_id)
+        self.registros.append(registro)
+    
+    def aristas(self, fila: int) -> List[Tuple[str, str, str]]:
+        """(prop, URI del predicado, id objeto) de una entidad congelada, en orden"""
+        indptr, vecinos, preds = self._directa
+        a, b = int(indptr[fila]), int(indptr[fila + 1])
+        return [
+            (self.predicados[pid], self.uris_predicados[self.predicados[pid]], self.ids[vecino])
+            for vecino, pid in zip(vecinos[a:b].tolist(), preds[a:b].tolist())
+        ]
+    
+    def agregar_relacion(self, sujeto_id: str, prop: str, predicado_uri: str, obj_id: str):
+        """Anota una arista sujeto -prop-> objeto (el sujeto ya debe estar registrado)"""
+        self._aristas.append((self.indice_ids[sujeto_id], prop, predicado_uri, obj_id))
+    
+    def congelar(self):
+        """Interna los objetos restantes y construye la adyacencia CSR directa e inversa"""
+        n_entidades = len(self.registros)
+        
+        # Predicados numerados según su URI, que es el orden en que aparecen
+        # dentro de cada sujeto al recorrer el grafo ordenado
+        for uri, prop in sorted({(uri, prop) for _, prop, uri, _ in self._aristas}):
+            self.uris_predicados.setdefault(prop, uri)
+            if prop not in self.indice_predicados:
+                self.indice_predicados[prop] = len(self.predicados)
+                self.predicados.append(sys.intern(prop))
+        
+        origenes = np.empty(len(self._aristas), dtype=np.int32)
+        destinos = np.empty(len(self._aristas), dtype=np.int32)
+        preds = np.empty(len(self._aristas), dtype=np.int16)
+        for i, (fila, prop, _, obj_id) in enumerate(self._aristas):
+            destino = self.indice_ids.get(obj_id)
+            if destino is None:
+                destino = len(self.ids)
+                obj_id = sys.intern(obj_id)
+                self.indice_ids[obj_id] = destino
+                self.ids.append(obj_id)
+            origenes[i] = fila
+            destinos[i] = destino
+            preds[i] = self.indice_predicados[prop]
+        self._aristas = []
+        
+        # Directa: por (sujeto, predicado), conservando el orden de inserción
+        orden = np.lexsort((preds, origenes))
+        self._directa = self._csr(origenes[orden], destinos[orden], preds[orden], n_entidades)
+        
+        # Inversa: solo hacia entidades; sujetos en orden de entidad
+        solo_entidades = destinos < n_entidades
+        o, d, p = origenes[solo_entidades], destinos[solo_entidades], preds[solo_entidades]
+        orden = np.lexsort((o, p, d))
+        self._inversa = self._csr(d[orden], o[orden], p[orden], n_entidades)
+    
+    @staticmethod
+    def _csr(filas: np.ndarray, vecinos: np.ndarray, preds: np.ndarray, n_filas: int):
+        """(indptr, vecinos, predicados) de solo lectura a partir de aristas ya ordenadas por fila"""
+        indptr = np.zeros(n_filas + 1, dtype=np.int32)
+        np.cumsum(np.bincount(filas, minlength=n_filas), out=indptr[1:])
+        csr = (indptr, np.ascontiguousarray(vecinos), np.ascontiguousarray(preds))
+        for array in csr:
+            array.flags.writeable = False
+        return csr
+    
+    def exportar(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """(datos JSON, arrays) para guardar el almacén congelado sin pickle"""
+        datos = {
+            'ids': self.ids,
+            'predicados': self.predicados,
+            'uris_predicados': self.uris_predicados,
+            'registros': [
+                [r.uri, r.labels, r.descriptions, r.comments, r.type, r.propiedades,
+                 r.tokens_labels, r.tokens_comments, r.tokens_id]
+                for r in self.registros
+            ],
+        }
+        arrays = {}
+        for nombre, (indptr, vecinos, preds) in (('directa', self._directa), ('inversa', self._inversa)):
+            arrays[f'{nombre}_indptr'] = indptr
+            arrays[f'{nombre}_vecinos'] = vecinos
+            arrays[f'{nombre}_predicados'] = preds
+        return datos, arrays
+    
+    @classmethod
+    def importar(cls, datos: Dict, arrays: Dict[str, np.ndarray]) -> 'AlmacenEntidades':
+        """Reconstruye un almacén congelado a partir de exportar()"""
+        almacen = cls()
+        almacen.ids = [sys.intern(i) for i in datos['ids']]
+        almacen.indice_ids = {ent_id: i for i, ent_id in enumerate(almacen.ids)}
+        almacen.predicados = [sys.intern(p) for p in datos['predicados']]
+        almacen.indice_predicados = {p: i for i, p in enumerate(almacen.predicados)}
+        almacen.uris_predicados = datos['uris_predicados']
+        for (uri, labels, descriptions, comments, tipo, propiedades,
+             t_labels, t_comments, t_id) in datos['registros']:
+            registro = RegistroEntidad(uri)
+            registro.labels = labels
+            registro.descriptions = descriptions
+            registro.comments = comments
+            registro.type = tipo
+            registro.propiedades = propiedades
+            registro.tokens_labels = tuple(tuple(t) for t in t_labels)
+            registro.tokens_comments = tuple(t_comments)
+            registro.tokens_id = tuple(t_id)
+            almacen.registros.append(registro)
+        for nombre in ('directa', 'inversa'):
+            setattr(almacen, f'_{nombre}', tuple(
+                arrays[f'{nombre}_{parte}'] for parte in ('indptr', 'vecinos', 'predicados')
+            ))
+        return almacen
+    
+    def fila(self, ent_id: str) -> Optional[int]:
+        """ID entero de una entidad (None si no es sujeto de ninguna tripleta)"""
+        fila = self.indice_ids.get(ent_id)
+        return fila if fila is not None and fila < len(self.registros) else None
+    
+    def __getitem__(self, ent_id: str) -> VistaEntidad:
+        fila = self.fila(ent_id)
+        if fila is None:
+            raise KeyError(ent_id)
+        return VistaEntidad(self, fila)
+    
+    def __contains__(self, ent_id) -> bool:
+        return self.fila(ent_id) is not None
+    
+    def __iter__(self):
+        return iter(self.ids[:len(self.registros)])
+    
+    def __len__(self) -> int:
+        return len(self.registros)
+
+
+class IndiceBM25:
+    """
+    Índice invertido con puntuación BM25F sobre los campos label, comment e id
+    
+    La contribución de cada (término, entidad) se precalcula al congelar el
+    índice, así que una consulta solo recorre las listas de postings de sus
+    términos: el coste depende del tamaño de esas listas, no del grafo.
+    """
+    
+    def __init__(self, k1: float = 1.2, pesos: Optional[Dict[str, float]] = None,
+                 b: Optional[Dict[str, float]] = None, bonus_frase: float = 0.5):
+        """
+        Args:
+            k1: Saturación de frecuencia de término
+            pesos: Peso de cada campo (label pesa más que comment)
+            b: Normalización por longitud de cada campo (ids sin normalizar)
+            bonus_frase: Bonus relativo si la consulta completa aparece en un label
+        """
+        self.k1 = k1
+        self.pesos = pesos or {'label': 3.0, 'id': 2.0, 'comment': 1.0}
+        self.b = b or {'label': 0.75, 'id': 0.0, 'comment': 0.75}
+        self.bonus_frase = bonus_frase
+        
+        self.doc_ids: List[str] = []
+        self.labels_norm: List[List[str]] = []  # labels normalizados (bonus de frase)
+        self.longitudes: List[Dict[str, int]] = []
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._tf = defaultdict(dict)  # término -> {doc: {campo: tf}} (solo durante la construcción)
+    
+    def agregar(self, doc_id: str, campos: Dict[str, List[str]], labels_norm: List[str]):
+        """Añade una entidad con sus tokens normalizados por campo"""
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.labels_norm.append(labels_norm)
+        self.longitudes.append({campo: len(tokens) for campo, tokens in campos.items()})
+        for campo, tokens in campos.items():
+            for token in tokens:
+                tf_doc = self._tf[token].setdefault(doc, {})
+                tf_doc[campo] = tf_doc.get(campo, 0) + 1
+    
+    def congelar(self):
+        """Calcula idf, longitudes medias y el impacto precalculado de cada posting (de solo lectura)"""
+        n_docs = len(self.doc_ids)
+        medias = {}
+        for campo in self.pesos:
+            total = sum(l.get(campo, 0) for l in self.longitudes)
+            medias[campo] = (total / n_docs) if n_docs and total else 1.0
+        
+        for termino, docs in self._tf.items():
+            df = len(docs)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            ids = np.fromiter(docs.keys(), dtype=np.int32, count=df)
+            impactos = np.empty(df, dtype=np.float32)
+            for i, (doc, tfs) in enumerate(docs.items()):
+                # tf combinado BM25F: suma ponderada de tf normalizados por campo
+                tf = 0.0
+                for campo, frecuencia in tfs.items():
+                    b = self.b[campo]
+                    norm = 1.0 - b + b * self.longitudes[doc].get(campo, 0) / medias[campo]
+                    tf += self.pesos[campo] * frecuencia / norm
+                impactos[i] = idf * tf / (self.k1 + tf)
+            ids.flags.writeable = False
+            impactos.flags.writeable = False
+            self.postings[termino] = (ids, impactos)
+        self._tf = defaultdict(dict)
+    
+    def __len__(self) -> int:
+        return len(self.postings)
+    
+    def exportar(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """(datos JSON, arrays) del índice congelado: postings concatenados con offsets"""
+        terminos = list(self.postings)
+        tamanos = [len(self.postings[t][0]) for t in terminos]
+        offsets = np.zeros(len(terminos) + 1, dtype=np.int64)
+        np.cumsum(tamanos, out=offsets[1:])
+        vacio_i, vacio_f = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        datos = {
+            'k1': self.k1, 'pesos': self.pesos, 'b': self.b, 'bonus_frase': self.bonus_frase,
+            'doc_ids': self.doc_ids,
+            'labels_norm': self.labels_norm,
+            'longitudes': self.longitudes,
+            'terminos': terminos,
+        }
+        arrays = {
+            'offsets': offsets,
+            'ids': np.concatenate([self.postings[t][0] for t in terminos]) if terminos else vacio_i,
+            'impactos': np.concatenate([self.postings[t][1] for t in terminos]) if terminos else vacio_f,
+        }
+        return datos, arrays
+    
+    @classmethod
+    def importar(cls, datos: Dict, arrays: Dict[str, np.ndarray]) -> 'IndiceBM25':
+        """Reconstruye un índice congelado a partir de exportar() (postings como vistas)"""
+        indice = cls(datos['k1'], datos['pesos'], datos['b'], datos['bonus_frase'])
+        indice.doc_ids = datos['doc_ids']
+        indice.labels_norm = datos['labels_norm']
+        indice.longitudes = datos['longitudes']
+        offsets = arrays['offsets'].tolist()
+        ids, impactos = arrays['ids'], arrays['impactos']
+        for i, termino in enumerate(datos['terminos']):
+            a, b = offsets[i], offsets[i + 1]
+            indice.postings[termino] = (ids[a:b], impactos[a:b])
+        return indice
+    
+    def buscar(self, terminos: List[str], top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Puntúa las entidades que contienen algún término de la consulta
+        
+        Returns:
+            Lista de (entity_id, score BM25F) ordenada por relevancia
+        """
+        listas = [self.postings[t] for t in dict.fromkeys(terminos) if t in self.postings]
+        if not listas:
+            return []
+        
+        # Acumular impactos de todas las listas (coste ~ suma de sus longitudes)
+        ids = np.concatenate([l[0] for l in listas])
+        impactos = np.concatenate([l[1] for l in listas])
+        docs, inverso = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverso, weights=impactos)
+        
+        # Bonus si la consulta completa aparece en un label (solo candidatos)
+        frase = ' '.join(terminos)
+        for i, doc in enumerate(docs):
+            if any(frase in label for label in self.labels_norm[doc]):
+                scores[i] *= 1.0 + self.bonus_frase
+        
+        top = _top_k_indices(scores, top_k)
+        return [(self.doc_ids[docs[i]], float(scores[i])) for i in top]
+
+
+class IndiceTemporal:
+    """
+    Marcos temporales (días y noches) -> eventos ya ordenados
+    
+    Un marco es cualquier entidad con defineMarcoTemporal. Sus eventos se
+    ordenan por tieneOrdenEvento (los que no lo tienen van al final) y se
+    guardan con su nombre para mostrar; los marcos, por tieneOrden. El número
+    de día sale del propio grafo (label "Día N: ...", o ID "DiaN_..."), así
+    que un día nuevo en el TTL se puede consultar sin tocar el código.
+    """
+    
+    _RE_DIA_LABEL = re.compile(r'^\s*d[ií]a\s*(\d+)\b', re.IGNORECASE)
+    _RE_DIA_ID = re.compile(r'^dia_?(\d+)', re.IGNORECASE)
+    _RE_DIA_PREGUNTA = re.compile(r'\bd[ií]a\s*(\d+)\b')
+    
+    def __init__(self, entidades: Mapping):
+        self.eventos: Dict[str, List[Tuple[int, str, str]]] = {}  # marco -> [(orden, ev_id, nombre)]
+        self.nombres: Dict[str, str] = {}   # marco -> nombre para mostrar
+        self.dias: Dict[int, str] = {}      # número de día -> marco
+        marcos = []
+        for marco_id, ent in entidades.items():
+            eventos_def = ent['relaciones'].get('defineMarcoTemporal', [])
+            if not eventos_def:
+                continue
+            eventos = []
+            for ev_id in eventos_def:
+                if ev_id in entidades:
+                    ev_ent = entidades[ev_id]
+                    nombre = ev_ent['labels'][0] if ev_ent['labels'] else ev_id
+                    eventos.append((self._entero(ev_ent['propiedades'].get('tieneOrdenEvento')), ev_id, nombre))
+            eventos.sort(key=lambda e: e[0])  # estable: empates en el orden del grafo
+            self.eventos[marco_id] = eventos
+            
+            dia = self._numero_dia(marco_id, ent['labels'])
+            if dia is not None:
+                self.dias.setdefault(dia, marco_id)
+            self.nombres[marco_id] = ent['labels'][0] if ent['labels'] else (
+                f"Día {dia}" if dia is not None else marco_id)
+            marcos.append((self._entero(ent['propiedades'].get('tieneOrden')), marco_id))
+        self.marcos = [m for _, m in sorted(marcos)]  # en orden cronológico
+    
+    @staticmethod
+    def _entero(valor, defecto: int = 999) -> int:
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return defecto
+    
+    def _numero_dia(self, marco_id: str, labels: List[str]) -> Optional[int]:
+        for label in labels:
+            m = self._RE_DIA_LABEL.match(label)
+            if m:
+                return int(m.group(1))
+        m = self._RE_DIA_ID.match(marco_id)
+        return int(m.group(1)) if m else None
+    
+    def marco_de_pregunta(self, pregunta: str) -> Tuple[Optional[int], Optional[str]]:
+        """(número de día, marco) mencionados en la pregunta ("día 2", "dia2")"""
+        m = self._RE_DIA_PREGUNTA.search(pregunta.lower())
+        if not m:
+            return None, None
+        dia = int(m.group(1))
+        return dia, self.dias.get(dia)
+
+
+def _codificar_termino(termino) -> list:
+    """Término rdflib → lista JSON ['u', uri] / ['b', id] / ['l', texto, idioma, datatype]"""
+    if isinstance(termino, Literal):
+        return ['l', str(termino), termino.language, str(termino.datatype) if termino.datatype else None]
+    if isinstance(termino, BNode):
+        return ['b', str(termino)]
+    return ['u', str(termino)]
+
+
+def _decodificar_termino(codigo: list):
+    """Inversa de _codificar_termino"""
+    if codigo[0] == 'l':
+        return Literal(codigo[1], lang=codigo[2], datatype=URIRef(codigo[3]) if codigo[3] else None)
+    if codigo[0] == 'b':
+        return BNode(codigo[1])
+    return URIRef(codigo[1])
+
+
+class GrafoSnapshot:
+    """
+    Grafo de solo lectura respaldado por una instantánea (términos + tripletas enteras)
+    
+    Iterar produce tripletas rdflib, creando cada término una sola vez. Cualquier
+    otra operación de rdflib (objects, query, ...) materializa un Graph completo
+    la primera vez que se usa.
+    """
+    
+    def __init__(self, terminos: List[list], tripletas: np.ndarray):
+        self._codigos = terminos
+        self.tripletas = tripletas
+        self._terminos = None
+        self._grafo = None
+    
+    def terminos(self) -> list:
+        if self._terminos is None:
+            self._terminos = [_decodificar_termino(c) for c in self._codigos]
+        return self._terminos
+    
+    def __len__(self) -> int:
+        return len(self.tripletas)
+    
+    def __iter__(self):
+        terminos = self.terminos()
+        for s, p, o in self.tripletas.tolist():
+            yield terminos[s], terminos[p], terminos[o]
+    
+    def a_grafo(self) -> Graph:
+        """Graph de rdflib con las mismas tripletas (se construye una vez)"""
+        if self._grafo is None:
+            grafo = Graph()
+            for tripleta in self:
+                grafo.add(tripleta)
+            self._grafo = grafo
+        return self._grafo
+    
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        return getattr(self.a_grafo(), nombre)
+
+
+class SnapshotGrafo:
+    """
+    Instantánea binaria de un TTL para no parsear Turtle en cada arranque
+    
+    Directorio con:
+        meta.json              formato, sha1/mtime/tamaño del TTL y nº de tripletas
+        terminos.json          tabla de términos internados
+        tripletas.npy          tripletas int32 (n, 3), ordenadas, abiertas con mmap
+        <seccion>.json         índices precalculados de cada motor (entidades,
+        <seccion>.<array>.npy  postings, ...), ligados al sha1 del TTL
+    
+    Queda obsoleta cuando cambia el TTL: si mtime y tamaño coinciden se da por
+    vigente sin leerlo; si no, decide el hash del contenido.
+    """
+    
+    FORMATO = 1
+    
+    def __init__(self, ttl_path: str, directorio: str):
+        self.ttl_path = ttl_path
+        self.directorio = Path(directorio)
+        self.sha_ttl: Optional[str] = None
+        self._firma: Optional[Tuple[int, int]] = None  # (mtime, tamaño) del TTL ya validado
+    
+    def _escribir(self, nombre: str, escribir):
+        """Escritura atómica (archivo temporal + os.replace)"""
+        ruta = self.directorio / nombre
+        tmp = ruta.with_name(ruta.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            escribir(f)
+        os.replace(tmp, ruta)
+    
+    def _escribir_json(self, nombre: str, datos):
+        self._escribir(nombre, lambda f: f.write(json.dumps(datos, ensure_ascii=False).encode('utf-8')))
+    
+    def _leer_json(self, nombre: str):
+        try:
+            with open(self.directorio / nombre, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def vigente(self) -> bool:
+        """
+        True si la instantánea existe y corresponde al TTL actual
+        
+        Se comprueba en cada llamada (un stat del TTL): un SnapshotGrafo de
+        larga vida deja de darse por vigente en cuanto se reescribe el TTL.
+        """
+        stat = os.stat(self.ttl_path)
+        if self._firma == (stat.st_mtime_ns, stat.st_size):
+            return True
+        self._firma = self.sha_ttl = None
+        
+        meta = self._leer_json('meta.json')
+        if not meta or meta.get('formato') != self.FORMATO:
+            return False
+        
+        if meta['mtime'] != stat.st_mtime_ns or meta['tamano'] != stat.st_size:
+            if _hash_archivo(self.ttl_path) != meta['sha1']:
+                return False
+            # Mismo contenido con otro mtime (p. ej. tras un checkout): actualizar
+            meta.update(mtime=stat.st_mtime_ns, tamano=stat.st_size)
+            self._escribir_json('meta.json', meta)
+        
+        self.sha_ttl = meta['sha1']
+        self._firma = (stat.st_mtime_ns, stat.st_size)
+        return True
+    
+    def _borrar_secciones(self):
+        """
+        Borra los archivos de la instantánea anterior y nada más: el directorio
+        puede ser compartido, así que solo se tocan los nombres conocidos y las
+        secciones que se reconocen por su JSON (formato, sha1, arrays)
+        """
+        nombres = ['terminos.json', 'tripletas.npy']
+        for ruta in self.directorio.glob('*.json'):
+            seccion = self._leer_json(ruta.name)
+            if isinstance(seccion, dict) and {'formato', 'sha1', 'arrays', 'datos'} <= seccion.keys():
+                nombres += [f"{ruta.stem}.{clave}.npy" for clave in seccion['arrays']]
+                nombres.append(ruta.name)
+        for nombre in nombres:
+            for ruta in (self.directorio / nombre, self.directorio / f"{nombre}.tmp"):
+                if ruta.is_file():
+                    ruta.unlink()
+    
+    def compilar(self, g, firma: Optional[Tuple[str, os.stat_result]] = None) -> int:
+        """
+        Escribe la instantánea del grafo (descarta las secciones anteriores)
+        
+        Args:
+            g: Grafo parseado del TTL
+            firma: (sha1, stat) de los bytes de los que salió `g` (ver
+                _parsear_ttl); sin ella se lee el TTL actual
+        
+        Returns:
+            Número de tripletas escritas
+        """
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        (self.directorio / 'meta.json').unlink(missing_ok=True)
+        self._borrar_secciones()
+        
+        # Orden determinista: mismo TTL → mismos IDs y mismas tripletas
+        ids = {}
+        terminos = []
+        tripletas = []
+        for tripleta in sorted(g):
+            fila = []
+            for termino in tripleta:
+                tid = ids.get(termino)
+                if tid is None:
+                    tid = ids[termino] = len(terminos)
+                    terminos.append(_codificar_termino(termino))
+                fila.append(tid)
+            tripletas.append(fila)
+        
+        matriz = np.array(tripletas, dtype=np.int32).reshape(-1, 3)
+        self._escribir_json('terminos.json', terminos)
+        self._escribir('tripletas.npy', lambda f: np.save(f, matriz))
+        
+        if firma is None:
+            firma = (_hash_archivo(self.ttl_path), os.stat(self.ttl_path))
+        self.sha_ttl, stat = firma
+        # meta.json al final: su presencia marca la instantánea como completa
+        self._escribir_json('meta.json', {
+            'formato': self.FORMATO,
+            'ttl': str(self.ttl_path),
+            'sha1': self.sha_ttl,
+            'mtime': stat.st_mtime_ns,
+            'tamano': stat.st_size,
+            'tripletas': len(matriz),
+            'terminos': len(terminos),
+        })
+        self._firma = (stat.st_mtime_ns, stat.st_size)
+        return len(matriz)
+    
+    def grafo(self) -> GrafoSnapshot:
+        """Grafo de solo lectura sobre la instantánea (tripletas por mmap)"""
+        terminos = self._leer_json('terminos.json')
+        tripletas = np.load(self.directorio / 'tripletas.npy', mmap_mode='r')
+        return GrafoSnapshot(terminos, tripletas)
+    
+    def guardar_seccion(self, nombre: str, formato: int, datos: Dict,
+                        arrays: Optional[Dict[str, np.ndarray]] = None):
+        """Guarda índices precalculados de un motor (JSON + arrays .npy)"""
+        if not self.vigente():
+            return
+        for clave, array in (arrays or {}).items():
+            self._escribir(f"{nombre}.{clave}.npy", lambda f, a=array: np.save(f, np.ascontiguousarray(a)))
+        # El JSON va al final y lleva la lista de arrays: marca la sección como completa
+        self._escribir_json(f"{nombre}.json", {
+            'formato': formato,
+            'sha1': self.sha_ttl,
+            'arrays': sorted(arrays or {}),
+            'datos': datos,
+        })
+    
+    def cargar_seccion(self, nombre: str, formato: int) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+        """(datos, arrays mmap) de una sección vigente, o None si falta o está obsoleta"""
+        if not self.vigente():
+            return None
+        seccion = self._leer_json(f"{nombre}.json")
+        if not seccion or seccion.get('formato') != formato or seccion.get('sha1') != self.sha_ttl:
+            return None
+        try:
+            arrays = {
+                clave: np.load(self.directorio / f"{nombre}.{clave}.npy", mmap_mode='r')
+                for clave in seccion['arrays']
+            }
+        except (OSError, ValueError):
+            return None
+        return seccion['datos'], arrays
+
+
+def _parsear_ttl(ttl_path: str) -> Tuple[Graph, Tuple[str, os.stat_result]]:
+    """
+    Parsea el TTL y devuelve su firma (sha1, stat) calculada sobre los mismos
+    bytes parseados: una escritura posterior no puede colarse en la versión
+    """
+    stat = os.stat(ttl_path)
+    with open(ttl_path, 'rb') as f:
+        contenido = f.read()
+    grafo = Graph()
+    grafo.parse(data=contenido, format='turtle', publicID=Path(ttl_path).absolute().as_uri())
+    return grafo, (_hash_contenido(contenido), stat)
+
+
+def cargar_grafo(ttl_path: str, snapshot: Optional[SnapshotGrafo] = None, grafo=None,
+                 firma: Optional[Tuple[str, os.stat_result]] = None):
+    """
+    Grafo del TTL: desde la instantánea si está vigente; si no, parsea el Turtle
+    (o usa `grafo`, ya parseado, con su `firma` si se conoce) y recompila la instantánea
+    """
+    if snapshot is not None and snapshot.vigente() and (firma is None or firma[0] == snapshot.sha_ttl):
+        return grafo if grafo is not None else snapshot.grafo()
+    
+    if grafo is None:
+        grafo, firma = _parsear_ttl(ttl_path)
+    if snapshot is not None:
+        try:
+            snapshot.compilar(grafo, firma)
+        except OSError as e:
+            print(f"   ⚠️  No se pudo escribir la instantánea: {e}")
+    return grafo
+
+
+class EstadoConsulta:
+    """
+    Índices de una versión del grafo que las consultas leen juntos
+    
+    Se construye una vez y no se modifica después de publicarse: recargar(),
+    la carga del modelo, ajustar_indice() y materializar_fragmentos() trabajan
+    sobre una copia (los índices que no cambian se comparten) y la publican
+    sustituyendo una sola referencia. Una consulta fija el estado vigente al
+    empezar y lo usa hasta terminar, sin locks, aunque entretanto se publique otro.
+    """
+    
+    __slots__ = ('g', 'entidades', 'indice_lexico', 'index_propiedades', 'entity_texts', 'entity_ids',
+                 'hashes', 'embeddings', 'indice', 'version_grafo', 'sello', 'rasgos', 'temporal', 'fragmentos',
+                 'clasificador_intencion', 'pendientes', 'almacen_obsoleto')
+    
+    def __init__(self, **campos):
+        for campo in self.__slots__:
+            setattr(self, campo, campos.get(campo))
+    
+    def copia(self) -> 'EstadoConsulta':
+        return EstadoConsulta(**{campo: getattr(self, campo) for campo in self.__slots__})
+
+
+class _CampoEstado:
+    """
+    Atributo del motor guardado en el estado fijado por el hilo o, si no hay,
+    en el vigente; solo se puede asignar dentro de un borrador
+    """
+    
+    def __set_name__(self, propietario, nombre: str):
+        self.campo = nombre.lstrip('_')
+    
+    def __get__(self, motor, propietario=None):
+        if motor is None:
+            return self
+        return getattr(getattr(motor._local, 'estado', None) or motor._estado, self.campo)
+    
+    def __set__(self, motor, valor):
+        local = motor._local
+        if not getattr(local, 'borrador', False):
+            raise AttributeError(f"'{self.campo}' es parte del estado publicado: se asigna dentro de _borrador()")
+        setattr(local.estado, self.campo, valor)
+
+
+def _lectura_consistente(metodo):
+    """Fija el estado vigente durante la llamada (las llamadas anidadas usan el mismo)"""
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        local = self._local
+        if getattr(local, 'estado', None) is not None:
+            return metodo(self, *args, **kwargs)
+        local.estado = self._estado
+        try:
+            return metodo(self, *args, **kwargs)
+        finally:
+            local.estado = None
+    return envoltura
 
 
 class GraphRAG_v2:
@@ -29,153 +1887,632 @@ class GraphRAG_v2:
     - Comprende sinónimos y paráfrasis
     - Ranking por similitud semántica
     - Caché de embeddings
+    - Consultas concurrentes sin locks sobre índices inmutables (copy-on-write)
     """
     
-    def __init__(self, ttl_path: str, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"):
+    # Versión de los índices guardados en la instantánea: subirla si cambia
+    # cómo se construyen (normalización, campos, stopwords...)
+    FORMATO_INDICES = 4
+    
+    # Palabras de la pregunta ignoradas en la búsqueda léxica (forma normalizada)
+    STOPWORDS_BOOST = {'que', 'quien', 'donde', 'cuando', 'como', 'cual', 'son', 'esta', 'hay'}
+    RRF_K = 60  # constante de reciprocal rank fusion
+    PLANTILLAS_FRAGMENTO = ('donde', 'cuando', 'quien')  # materializables por entidad
+    STOPWORDS_CONSULTA = {'que', 'quien', 'donde', 'cuando', 'como', 'cual', 'son', 'esta',
+                          'hay', 'con', 'del', 'lo', 'la', 'una', 'uno', 'para', 'por'}
+    
+    # Índices de consulta: viven en el EstadoConsulta vigente (ver _borrador)
+    g = _CampoEstado()             # Grafo RDF del que salen los índices
+    entidades = _CampoEstado()
+    indice_lexico = _CampoEstado()
+    index_propiedades = _CampoEstado()
+    entity_texts = _CampoEstado()  # Textos para embeddings
+    entity_ids = _CampoEstado()    # IDs correspondientes
+    _hashes = _CampoEstado()       # Hash del texto de cada entidad
+    embeddings = _CampoEstado()    # Embeddings precalculados
+    indice = _CampoEstado()        # Índice vectorial sobre los embeddings
+    version_grafo = _CampoEstado()
+    _sello = _CampoEstado()        # version(): grafo + huella de los embeddings, calculado al publicar
+    _rasgos = _CampoEstado()       # (almacén, rasgos por entidad para los boosts híbridos)
+    _temporal = _CampoEstado()     # (almacén, IndiceTemporal)
+    _fragmentos = _CampoEstado()   # (almacén, {intención: {ent_id: fragmento}}) si se materializan
+    clasificador_intencion = _CampoEstado()  # Con centroides desde que se publica con el modelo
+    _pendientes = _CampoEstado()   # Filas sin embedding (se codifican al cargar el modelo)
+    _almacen_obsoleto = _CampoEstado()  # El almacén de embeddings no refleja estas filas
+    
+    def __init__(self, ttl_path: str, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2",
+                 cache_dir: Optional[str] = "cache_embeddings_v2", carga_modelo: str = "fondo",
+                 indice_vectorial: str = "exacto", parametros_indice: Optional[Dict] = None,
+                 cache_consultas: int = 1024, ttl_consultas: Optional[float] = None,
+                 persistir_consultas: bool = False,
+                 cache_respuestas: int = 512, ttl_respuestas: Optional[float] = None,
+                 grafo: Optional[Graph] = None, backend: str = "torch",
+                 dir_onnx: Optional[str] = None, fusion: str = "lineal",
+                 intencion: str = "reglas", materializar: bool = False):
         """
         Inicializa el sistema GraphRAG v2.0
         
         Args:
             ttl_path: Ruta al archivo TTL
             model_name: Modelo de embeddings (recomendado para español)
+            cache_dir: Directorio del almacén persistente de embeddings (None = desactivado)
+            carga_modelo: 'fondo' (hilo al iniciar), 'perezosa' (primera consulta
+                semántica) o 'inmediata' (bloquea hasta tener el modelo)
+            indice_vectorial: 'exacto', 'float16', 'int8' (cuantizados), 'hnsw' o 'ivfpq'
+                              (los aproximados requieren faiss)
+            parametros_indice: Parámetros del índice (p. ej. {'ef_search': 128}, {'nprobe': 32}
+                               o {'reordenar': 0})
+            cache_consultas: Máximo de embeddings de consulta en caché LRU (0 = sin caché)
+            ttl_consultas: Caducidad en segundos de esa caché (None = sin caducidad)
+            persistir_consultas: Guardar/cargar la caché de consultas en cache_dir
+            cache_respuestas: Máximo de respuestas completas en caché (0 = sin caché)
+            ttl_respuestas: Caducidad en segundos de las respuestas cacheadas
+            grafo: Grafo ya parseado de ttl_path (p. ej. de BaseConocimiento);
+                si se pasa, no se vuelve a parsear el TTL
+            backend: Codificador: 'torch' (SentenceTransformer), 'onnx' (ONNX Runtime
+                fp32), 'onnx-int8' (cuantizado dinámicamente) o 'estatico' (tabla de
+                palabras destilada del modelo; sin transformer al consultar)
+            dir_onnx: Modelo exportado con exportar_onnx (por defecto
+                cache_dir/onnx_<modelo>; se exporta la primera vez si falta)
+            fusion: Fusión híbrida: 'lineal' (alpha * semántico + léxico + boosts)
+                o 'rrf' (reciprocal rank fusion)
+            intencion: Detección de intención: 'reglas' (palabras clave compiladas),
+                'centroides' (centroide más cercano al vector de la consulta) o
+                'mixto' (reglas; centroides solo si ninguna regla se cumple)
+            materializar: Precalcular los fragmentos donde/cuando/quien de todas
+                las entidades (las plantillas pasan a ser una consulta a un dict)
+        
+        Con cache_dir, el grafo y los índices se guardan en una instantánea
+        binaria (cache_dir/snapshot_<ttl>) que evita parsear el Turtle en los
+        siguientes arranques mientras el TTL no cambie.
         """
         print("=" * 70)
         print("🚀 GraphRAG v2.0 - Embeddings Semánticos")
         print("=" * 70)
         
-        # Cargar grafo RDF
+        # Estado de consulta: se publica entero, nunca se modifica en sitio
+        self._estado = EstadoConsulta()
+        self._local = threading.local()
+        
+        # Cargar grafo RDF (desde la instantánea si está vigente)
         print("\n📚 Cargando grafo RDF...")
-        self.g = Graph()
+        self.ttl_path = ttl_path
+        self.cache_dir = cache_dir
+        self.snapshot = None
+        if cache_dir:
+            self.snapshot = SnapshotGrafo(ttl_path, Path(cache_dir) / f"snapshot_{Path(ttl_path).stem}")
         try:
-            self.g.parse(ttl_path, format='turtle')
-            print(f"   ✅ Grafo cargado: {len(self.g)} tripletas")
+            g = cargar_grafo(ttl_path, self.snapshot, grafo)
+            version_grafo = (self.snapshot and self.snapshot.sha_ttl) or _hash_archivo(ttl_path)
+            origen = " (instantánea)" if isinstance(g, GrafoSnapshot) else ""
+            print(f"   ✅ Grafo cargado: {len(g)} tripletas{origen}")
         except Exception as e:
             print(f"   ❌ Error: {e}")
             sys.exit(1)
         
-        # Cargar modelo de embeddings
-        print(f"\n🤖 Cargando modelo de embeddings: {model_name}")
-        print("   (Primera vez puede tardar, se descarga ~80-120MB)")
-        start_time = time.time()
-        self.model = SentenceTransformer(model_name)
-        print(f"   ✅ Modelo cargado en {time.time() - start_time:.2f}s")
-        
-        # Estructuras de datos
-        self.entidades = {}
-        self.entity_texts = []  # Textos para embeddings
-        self.entity_ids = []    # IDs correspondientes
-        self.embeddings = None  # Embeddings precalculados
-        
-        # Índices léxicos (mantener para fallback)
-        self.index_palabras = defaultdict(list)
-        self.index_propiedades = defaultdict(list)
-        
-        # Stemming (heredado de v1.5)
-        self.stem_rules = [
-            (r'es$', ''),
-            (r's$', ''),
-            (r'ón$', 'on'),
-            (r'í$', 'i'),
-        ]
-        
-        # Construir índices
-        print("\n🔨 Construyendo índices...")
-        self._build_index()
+        # Modelo de embeddings: se carga bajo demanda (ver _cargar_modelo)
+        if backend not in BACKENDS_CODIFICADOR:
+            raise ValueError(f"Backend de codificación desconocido: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self.dir_onnx = dir_onnx
+        # Los vectores de cada backend difieren ligeramente: cachés separadas
+        self.id_codificador = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self._model = None
+        self._model_lock = threading.RLock()  # también turna a los escritores (_borrador)
+        self._hilo_lock = threading.Lock()
+        self._modelo_listo = threading.Event()
+        self._hilo_modelo = None
+        self._error_modelo = None
+        
+        # Almacén persistente de embeddings
+        self.almacen = AlmacenEmbeddings(cache_dir, self.id_codificador) if cache_dir else None
+        
+        # Índice vectorial para la búsqueda semántica (se construye con los embeddings)
+        if indice_vectorial not in INDICES_VECTORIALES:
+            raise ValueError(f"Índice vectorial desconocido: {indice_vectorial}")
+        self.tipo_indice = indice_vectorial
+        if fusion not in ("lineal", "rrf"):
+            raise ValueError(f"Fusión híbrida desconocida: {fusion}")
+        self.fusion = fusion
+        if intencion not in ("reglas", "centroides", "mixto"):
+            raise ValueError(f"Detección de intención desconocida: {intencion}")
+        self.intencion = intencion
+        self.parametros_indice = parametros_indice or {}
+        
+        # Caché de embeddings de consulta (la codificación es el paso más caro)
+        self.cache_consultas = CacheEmbeddingsConsulta(self.id_codificador, cache_consultas, ttl_consultas)
+        self._ruta_consultas = None
+        if persistir_consultas and cache_dir:
+            slug = re.sub(r'[^\w.-]', '_', self.id_codificador)
+            self._ruta_consultas = Path(cache_dir) / f"consultas_{slug}.npz"
+            n = self.cache_consultas.cargar_disco(self._ruta_consultas)
+            if n:
+                print(f"   ♻️  {n} embeddings de consulta cargados desde caché")
+            atexit.register(self.guardar_cache_consultas)
+        
+        # Caché de respuestas completas: (pregunta normalizada, modo, versión)
+        self.cache_respuestas = CacheLRU(cache_respuestas, ttl_respuestas)
+        self._version_respuestas = None
+        
+        # Estado inicial: se construye en un borrador y se publica al terminar
+        with self._borrador():
+            self.g = g
+            self.version_grafo = version_grafo
+            self.clasificador_intencion = ClasificadorIntencion()
+            
+            # Estructuras de datos
+            self.entidades = AlmacenEntidades()
+            self.entity_texts = []
+            self.entity_ids = []
+            self._hashes = []
+            self._pendientes = []
+            self._almacen_obsoleto = False
+            
+            # Índices léxicos (mantener para fallback)
+            self.indice_lexico = IndiceBM25()
+            self.index_propiedades = defaultdict(list)
+            
+            # Construir índices
+            print("\n🔨 Construyendo índices...")
+            if not self._cargar_indices_snapshot():
+                self._build_index()
+                self._guardar_indices_snapshot()
+            if materializar:
+                self.materializar_fragmentos()
+            
+            # Embeddings desde el almacén; los pendientes esperan al modelo
+            print("\n🧮 Preparando embeddings...")
+            self._compute_embeddings()
         
-        # Computar embeddings
-        print("\n🧮 Computando embeddings...")
-        self._compute_embeddings()
+        if carga_modelo == "inmediata":
+            self._cargar_modelo()
+        elif carga_modelo == "fondo":
+            self.iniciar_carga_modelo()
         
         print("\n" + "=" * 70)
         print("✅ Sistema listo para consultas")
         print("=" * 70)
         print(f"📊 Estadísticas:")
         print(f"   - Entidades: {len(self.entidades)}")
-        print(f"   - Términos indexados: {len(self.index_palabras)}")
+        print(f"   - Términos indexados: {len(self.indice_lexico)}")
         print(f"   - Dimensiones embedding: {self.embeddings.shape[1] if self.embeddings is not None else 0}")
+        print(f"   - Modelo semántico: {'listo' if self.modelo_listo() else 'pendiente (' + carga_modelo + ')'}")
         print("=" * 70 + "\n")
     
+    @property
+    def model(self):
+        """SentenceTransformer; se carga en el primer acceso si aún no está listo"""
+        if not self._modelo_listo.is_set():
+            self._cargar_modelo()
+        return self._model
+    
+    def modelo_listo(self) -> bool:
+        """True si el modelo y todos los embeddings están disponibles"""
+        return self._modelo_listo.is_set()
+    
+    def iniciar_carga_modelo(self):
+        """Lanza la carga del modelo en un hilo de fondo (idempotente)"""
+        with self._hilo_lock:
+            if self._modelo_listo.is_set() or self._hilo_modelo is not None:
+                return
+            self._hilo_modelo = threading.Thread(
+                target=self._cargar_modelo_fondo, name="carga-modelo", daemon=True
+            )
+            self._hilo_modelo.start()
+    
+    def _cargar_modelo_fondo(self):
+        try:
+            self._cargar_modelo()
+        except Exception as e:
+            self._error_modelo = e
+            print(f"   ❌ Error cargando modelo de embeddings: {e}")
+    
+    def _cargar_modelo(self):
+        """
+        Importa y carga el SentenceTransformer una sola vez, y completa los
+        embeddings que no estaban en el almacén
+        
+        torch/transformers solo se importan aquí, de modo que los despliegues
+        que usan modo léxico no pagan su coste de arranque ni de memoria.
+        """
+        with self._model_lock:
+            if self._modelo_listo.is_set():
+                return
+            print(f"\n🤖 Cargando modelo de embeddings: {self.model_name} ({self.backend})")
+            print("   (Primera vez puede tardar, se descarga ~80-120MB)")
+            start_time = time.time()
+            self._model = CodificadorSerializado(self._crear_codificador())
+            print(f"   ✅ Modelo cargado en {time.time() - start_time:.2f}s")
+            
+            self._completar_embeddings()
+            self._modelo_listo.set()
+    
+    def _crear_codificador(self):
+        """SentenceTransformer (torch), CodificadorONNX o CodificadorEstatico según self.backend"""
+        if self.backend == "torch":
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(self.model_name)
+        
+        if self.backend == "estatico":
+            ruta = ruta_estatico(self.cache_dir, self.model_name)
+            if not ruta.exists():
+                print(f"   Destilando {self.model_name} a tabla estática en {ruta} (una sola vez)...")
+                from sentence_transformers import SentenceTransformer
+                destilar_estatico(SentenceTransformer(self.model_name), self.entity_texts, ruta)
+            return CodificadorEstatico(ruta)
+        
+        directorio = Path(self.dir_onnx or ruta_onnx(self.cache_dir, self.model_name))
+        if not (directorio / "codificador.json").exists():
+            print(f"   Exportando {self.model_name} a ONNX en {directorio} (una sola vez)...")
+            exportar_onnx(self.model_name, directorio)
+        elif self.backend == "onnx-int8" and not (directorio / "modelo_int8.onnx").exists():
+            cuantizar_onnx(directorio)
+        return CodificadorONNX(directorio, cuantizado=self.backend == "onnx-int8")
+    
+    def adoptar_modelo(self, otro: 'GraphRAG_v2') -> bool:
+        """
+        Reutiliza el modelo ya cargado de otro motor en vez de cargarlo de nuevo
+        
+        Solo se codifican los embeddings que este motor no encontró en el
+        almacén (p. ej. las entidades que cambiaron en el TTL).
+        
+        Returns:
+            True si se adoptó (mismo modelo y backend, y listo en `otro`)
+        """
+        if otro.id_codificador != self.id_codificador or not otro.modelo_listo():
+            return False
+        with self._model_lock:
+            if not self._modelo_listo.is_set():
+                self._model = otro._model
+                self._completar_embeddings()
+                self._modelo_listo.set()
+        return True
+    
+    @contextmanager
+    def _borrador(self):
+        """
+        Copia del estado vigente, fijada para este hilo, que se publica al salir
+        
+        Los índices se sustituyen en la copia (los que no cambian se comparten)
+        y, si no hubo errores, se publica sustituyendo una sola referencia: las
+        consultas ven el estado anterior o el nuevo, nunca una mezcla. Anidado,
+        se reutiliza el borrador en curso. El borrador externo toma _model_lock
+        (reentrante) antes de copiar: los escritores se turnan y ninguno
+        publica una copia de un estado que otro ya sustituyó. Las
+        cachés derivadas (índice temporal, rasgos híbridos, el sello de
+        version() y, con el modelo cargado, los centroides de intención) se
+        calculan aquí antes de publicar: las consultas solo las leen.
+        """
+        local = self._local
+        if getattr(local, 'borrador', False):
+            yield local.estado
+            return
+        with self._model_lock:
+            previo = self._estado
+            nuevo = previo.copia()
+            anterior = getattr(local, 'estado', None)
+            local.estado, local.borrador = nuevo, True
+            try:
+                yield nuevo
+                self.indice_temporal()
+                self._rasgos_hibrido()
+                if nuevo.sello is None or nuevo.hashes is not previo.hashes \
+                        or nuevo.version_grafo != previo.version_grafo:
+                    self._sello = f"{self.version_grafo}:{self._huella_embeddings()[:16]}"
+                if self.intencion != "reglas" and self._model is not None \
+                        and self.clasificador_intencion.centroides is None:
+                    entrenado = copy.copy(self.clasificador_intencion)
+                    entrenado.entrenar(self._model)
+                    self.clasificador_intencion = entrenado
+            finally:
+                local.estado, local.borrador = anterior, False
+            self._estado = nuevo
+    
+    def _en_borrador(self) -> bool:
+        """True si este hilo está construyendo un estado (dentro de _borrador)"""
+        return getattr(self._local, 'borrador', False)
+    
     def _stem(self, word: str) -> str:
         """Stemming básico en español"""
-        word = word.lower()
-        for pattern, replacement in self.stem_rules:
-            word = re.sub(pattern, replacement, word)
-        return word
+        return stem(word)
     
     def _normalize(self, text: str) -> str:
         """Normalización con stemming"""
-        if not isinstance(text, str):
-            return ""
-        text = text.lower()
-        text = re.sub(r'[^\w\sáéíóúüñ]', ' ', text)
-        replacements = {'á':'a', 'é':'e', 'í':'i', 'ó':'o', 'ú':'u', 'ü':'u', 'ñ':'n'}
-        for a, b in replacements.items():
-            text = text.replace(a, b)
-        words = text.split()
-        words = [self._stem(w) for w in words if len(w) > 2]
-        return ' '.join(words)
-    
-    def _index_text(self, text: str, entidad_id: str):
-        """Indexa texto para búsqueda léxica"""
-        palabras = set(self._normalize(text).split())
-        for palabra in palabras:
-            if len(palabra) > 2:
-                self.index_palabras[palabra].append(entidad_id)
+        return ' '.join(tokens_normalizados(text))
+    
+    def _tokenizar_registros(self, almacen: AlmacenEntidades) -> int:
+        """Tokeniza los registros que aún no tienen tokens; devuelve cuántos"""
+        n = 0
+        for ent_id, registro in zip(almacen.ids, almacen.registros):
+            if registro.tokens_labels is None:
+                registro.tokenizar(ent_id)
+                n += 1
+        return n
+    
+    @staticmethod
+    def _campos_entidad(ent) -> Tuple[Dict[str, List[str]], List[str]]:
+        """Tokens por campo (label, comment, id) y labels normalizados de una entidad"""
+        campos = {
+            'label': [t for tokens in ent['tokens_labels'] for t in tokens],
+            'comment': list(ent['tokens_comments']),
+            'id': list(ent['tokens_id']),
+        }
+        return campos, [' '.join(tokens) for tokens in ent['tokens_labels']]
+    
+    def _build_lexical_index(self):
+        """Indexa labels, comments e ID de cada entidad en el índice BM25F"""
+        for ent_id, ent in self.entidades.items():
+            self.indice_lexico.agregar(ent_id, *self._campos_entidad(ent))
+        self.indice_lexico.congelar()
+    
+    def _registrar_tripleta(self, almacen: AlmacenEntidades, index_propiedades: Dict, s, p, o):
+        """Incorpora una tripleta al registro de su sujeto"""
+        sujeto_uri = str(s)
+        sujeto_id = sujeto_uri.split('#')[-1] if '#' in sujeto_uri else sujeto_uri
+        
+        # Inicializar entidad
+        ent = almacen.registro(sujeto_id, sujeto_uri)
+        
+        # Extraer información
+        if p == RDFS.label and isinstance(o, Literal) and (o.language == 'es' or not o.language):
+            texto = str(o)
+            ent.labels.append(texto)
+        
+        elif p == RDFS.comment and isinstance(o, Literal) and (o.language == 'es' or not o.language):
+            texto = str(o)
+            ent.comments.append(texto)
+        
+        elif str(p).endswith('type'):
+            tipo = str(o).split('#')[-1] if '#' in str(o) else str(o)
+            # owl:NamedIndividual/owl:Thing no deben tapar el tipo del dominio
+            # (EventoRitual, Lugar...), que en orden determinista va antes
+            if tipo not in TIPOS_GENERICOS or ent.type is None:
+                ent.type = tipo
+        
+        else:
+            prop = str(p).split('#')[-1] if '#' in str(p) else str(p)
+            if isinstance(o, Literal):
+                valor = str(o)
+                ent.propiedades[prop] = valor
+                if prop in ['tieneOrden', 'tieneOrdenEvento', 'tieneFecha']:
+                    clave_index = f"{prop}:{valor}"
+                    index_propiedades[clave_index].append(sujeto_id)
+            else:
+                obj_id = str(o).split('#')[-1] if '#' in str(o) else str(o)
+                almacen.agregar_relacion(sujeto_id, prop, str(p), obj_id)
     
     def _build_index(self):
         """Construye índices del grafo"""
-        for s, p, o in self.g:
-            sujeto_uri = str(s)
-            sujeto_id = sujeto_uri.split('#')[-1] if '#' in sujeto_uri else sujeto_uri
-            
-            # Inicializar entidad
-            if sujeto_id not in self.entidades:
-                self.entidades[sujeto_id] = {
-                    'uri': sujeto_uri,
-                    'labels': [],
-                    'descriptions': [],
-                    'comments': [],
-                    'type': None,
-                    'propiedades': {},
-                    'relaciones': defaultdict(list),
-                    'relaciones_inversas': defaultdict(list)
-                }
+        # Orden determinista: el texto de cada entidad (y su hash en el
+        # almacén de embeddings) debe ser estable entre reinicios. Las
+        # entidades quedan en el orden de _orden_entidades (recargar lo reproduce)
+        almacen = AlmacenEntidades()
+        for s, p, o in sorted(self.g):
+            self._registrar_tripleta(almacen, self.index_propiedades, s, p, o)
+        
+        # IDs enteros y relaciones directas/inversas en CSR
+        almacen.congelar()
+        self._tokenizar_registros(almacen)
+        self.entidades = almacen
+        self.index_propiedades = dict(self.index_propiedades)
+        
+        self._build_lexical_index()
+    
+    def recargar(self, ttl_path: Optional[str] = None) -> Dict[str, float]:
+        """
+        Recarga el TTL recalculando solo lo que cambió y publica el resultado
+        
+        Args:
+            ttl_path: TTL a cargar (por defecto, el mismo archivo)
             
-            ent = self.entidades[sujeto_id]
+        Returns:
+            Resumen de lo recalculado
+        """
+        with self.recarga(ttl_path) as resumen:
+            pass
+        return resumen
+    
+    @contextmanager
+    def recarga(self, ttl_path: Optional[str] = None):
+        """
+        Recarga incremental del TTL que se publica al salir del bloque with
+        
+        Compara las tripletas viejas y nuevas y reconstruye únicamente los
+        registros de los sujetos afectados (el resto se reutiliza tal cual;
+        la adyacencia CSR se vuelve a congelar). En el índice BM25F solo se
+        re-tokenizan esos documentos (los impactos se recalculan porque idf y
+        longitudes medias son globales). El texto se recalcula para los
+        afectados y sus vecinos entrantes, cuyo texto menciona sus labels, y
+        solo se codifican los embeddings cuyo texto cambió.
+        
+        Todo se construye sobre un borrador del estado de consulta. Dentro del
+        bloque, el hilo que recarga ya ve el estado nuevo (self.g, entidades...)
+        y puede preparar lo que dependa de él (p. ej. los datos del mapa de
+        BaseConocimientoVigente); si el bloque lanza una excepción, el borrador
+        se descarta y el motor sigue en la versión anterior. Al salir sin
+        errores se publica de una vez: las consultas en curso terminan con la
+        versión anterior y ninguna ve una mezcla de las dos.
+        
+        Args:
+            ttl_path: TTL a cargar (por defecto, el mismo archivo)
             
-            # Extraer información
-            if p == RDFS.label and isinstance(o, Literal) and (o.language == 'es' or not o.language):
-                texto = str(o)
-                ent['labels'].append(texto)
-                self._index_text(texto, sujeto_id)
+        Yields:
+            Resumen de lo recalculado
+        """
+        ttl_path = ttl_path or self.ttl_path
+        start = time.time()
+        print(f"\n🔄 Recargando {ttl_path}...")
+        
+        # 1. Parseo fuera del borrador: las consultas siguen con el estado vigente
+        g_nuevo, firma = _parsear_ttl(ttl_path)
+        
+        with self._borrador():
+            # Diferencia contra el grafo del estado que se sustituye (dentro del
+            # borrador: ninguna otra recarga se publica entre medias)
+            viejas, nuevas = set(self.g), set(g_nuevo)
+            cambios = (nuevas - viejas) | (viejas - nuevas)
+            resumen = {
+                'tripletas_añadidas': len(nuevas - viejas),
+                'tripletas_eliminadas': len(viejas - nuevas),
+            }
             
-            elif p == RDFS.comment and isinstance(o, Literal) and (o.language == 'es' or not o.language):
-                texto = str(o)
-                ent['comments'].append(texto)
-                self._index_text(texto, sujeto_id)
+            # 2. Registros nuevos de los sujetos afectados
+            sujetos = {s for s, _, _ in cambios}
+            cambiados = {_id_local(s) for s in sujetos}
+            parcial = AlmacenEntidades()
+            props_parcial = defaultdict(list)
+            for s, p, o in sorted(t for s in sujetos for t in g_nuevo.triples((s, None, None))):
+                self._registrar_tripleta(parcial, props_parcial, s, p, o)
+            aristas_parcial = defaultdict(list)
+            for fila, prop, uri, obj_id in parcial._aristas:
+                aristas_parcial[parcial.ids[fila]].append((prop, uri, obj_id))
             
-            elif str(p).endswith('type'):
-                tipo = str(o).split('#')[-1] if '#' in str(o) else str(o)
-                ent['type'] = tipo
+            viejo = self.entidades
             
-            else:
-                prop = str(p).split('#')[-1] if '#' in str(p) else str(p)
-                if isinstance(o, Literal):
-                    valor = str(o)
-                    ent['propiedades'][prop] = valor
-                    if prop in ['tieneOrden', 'tieneOrdenEvento', 'tieneFecha']:
-                        clave_index = f"{prop}:{valor}"
-                        self.index_propiedades[clave_index].append(sujeto_id)
+            # 3. Almacén nuevo: registros reutilizados + reconstruidos, en el orden
+            # de _build_index (así las filas coinciden con las de un arranque en frío)
+            def registro_de(ent_id):
+                if ent_id in parcial.indice_ids:
+                    return parcial.registros[parcial.indice_ids[ent_id]]
+                return viejo.registros[viejo.fila(ent_id)]
+            
+            orden = _orden_entidades(g_nuevo.subjects())
+            ids_nuevos = [e for e in viejo if e not in cambiados] + parcial.ids
+            ids_nuevos.sort(key=orden.__getitem__)
+            almacen = AlmacenEntidades()
+            for ent_id in ids_nuevos:
+                if ent_id in parcial.indice_ids:
+                    aristas = aristas_parcial.get(ent_id, [])
+                else:
+                    aristas = viejo.aristas(viejo.fila(ent_id))
+                almacen.agregar_registro(ent_id, registro_de(ent_id))
+                for prop, uri, obj_id in aristas:
+                    almacen.agregar_relacion(ent_id, prop, uri, obj_id)
+            almacen.congelar()
+            
+            # 4. Índice de propiedades: se sustituyen las entradas de los afectados
+            index_propiedades = defaultdict(list)
+            for clave, ids in self.index_propiedades.items():
+                restantes = [e for e in ids if e not in cambiados]
+                if restantes:
+                    index_propiedades[clave] = restantes
+            for clave, ids in props_parcial.items():
+                index_propiedades[clave].extend(ids)
+                index_propiedades[clave].sort(key=almacen.fila)
+            
+            # 5. BM25F: solo se tokenizan los registros reconstruidos
+            retokenizados = self._tokenizar_registros(almacen)
+            lexico = IndiceBM25()
+            for ent_id, ent in almacen.items():
+                lexico.agregar(ent_id, *self._campos_entidad(ent))
+            lexico.congelar()
+            
+            # 6. Textos: afectados + entidades que los mencionan (antes o ahora)
+            afectados = set(cambiados)
+            for ent_id in cambiados:
+                for indice in (viejo, almacen):
+                    if ent_id in indice:
+                        for sujetos_rel in indice[ent_id]['relaciones_inversas'].values():
+                            afectados.update(sujetos_rel)
+            
+            # Fragmentos: afectados + vecinos en ambos sentidos (citan sus labels o relaciones)
+            vecinos = set(cambiados)
+            for ent_id in cambiados:
+                for indice in (viejo, almacen):
+                    if ent_id in indice:
+                        for clave in ('relaciones', 'relaciones_inversas'):
+                            for ids in indice[ent_id][clave].values():
+                                vecinos.update(ids)
+            
+            textos_viejos = dict(zip(self.entity_ids, self.entity_texts))
+            hashes_viejos, embeddings_viejos = self._hashes, self.embeddings
+            
+            self.entidades = almacen
+            self.index_propiedades = dict(index_propiedades)
+            self.indice_lexico = lexico
+            n_fragmentos = self.materializar_fragmentos(vecinos) if self._fragmentos is not None else 0
+            
+            recalculados = 0
+            entity_texts = []
+            for ent_id in almacen:
+                if ent_id in afectados or ent_id not in textos_viejos:
+                    entity_texts.append(self._build_entity_text(ent_id))
+                    recalculados += 1
                 else:
-                    obj_id = str(o).split('#')[-1] if '#' in str(o) else str(o)
-                    ent['relaciones'][prop].append(obj_id)
+                    entity_texts.append(textos_viejos[ent_id])
+            self.entity_ids = list(almacen)
+            self.entity_texts = entity_texts
+            self._hashes = [AlmacenEmbeddings.hash_texto(t) for t in entity_texts]
+            
+            # 7. Embeddings: se reutilizan por hash; solo se codifican los que cambiaron
+            self._alinear_embeddings(hashes_viejos, embeddings_viejos)
+            pendientes = len(self._pendientes)
+            self._almacen_obsoleto = True
+            if self.modelo_listo():
+                self._completar_embeddings()
+            else:
+                # Filas realineadas: el índice se reconstruye cuando cargue el modelo
+                self.indice = None
+            
+            # 8. Grafo, versión e instantánea
+            self.g = g_nuevo
+            self.ttl_path = ttl_path
+            self.version_grafo = firma[0]
+            if self.snapshot is not None:
+                self.snapshot = SnapshotGrafo(ttl_path, Path(self.cache_dir) / f"snapshot_{Path(ttl_path).stem}")
+                cargar_grafo(ttl_path, self.snapshot, g_nuevo, firma)
+                self._guardar_indices_snapshot()
+            
+            resumen.update({
+                'entidades_nuevas': len(set(almacen) - set(viejo)),
+                'entidades_eliminadas': len(set(viejo) - set(almacen)),
+                'registros_reconstruidos': len(parcial.registros),
+                'documentos_retokenizados': retokenizados,
+                'textos_recalculados': recalculados,
+                'fragmentos_recalculados': n_fragmentos,
+                'embeddings_codificados': pendientes if self.modelo_listo() else 0,
+                'embeddings_pendientes': len(self._pendientes),
+                'segundos': time.time() - start,
+            })
+            yield resumen
+        
+        print(f"   ✅ Recarga en {resumen['segundos']:.2f}s: "
+              f"+{resumen['tripletas_añadidas']}/-{resumen['tripletas_eliminadas']} tripletas, "
+              f"{resumen['registros_reconstruidos']} registros, "
+              f"{resumen['documentos_retokenizados']} documentos léxicos, "
+              f"{resumen['textos_recalculados']} textos, "
+              f"{resumen['embeddings_codificados']} embeddings codificados")
+    
+    def _guardar_indices_snapshot(self):
+        """Guarda entidades, postings BM25F e índice de propiedades en la instantánea"""
+        if self.snapshot is None:
+            return
+        ent_datos, ent_arrays = self.entidades.exportar()
+        lex_datos, lex_arrays = self.indice_lexico.exportar()
+        arrays = {f'entidades_{k}': v for k, v in ent_arrays.items()}
+        arrays.update({f'lexico_{k}': v for k, v in lex_arrays.items()})
+        datos = {'entidades': ent_datos, 'lexico': lex_datos, 'propiedades': self.index_propiedades}
+        try:
+            self.snapshot.guardar_seccion('graphrag_v2', self.FORMATO_INDICES, datos, arrays)
+        except OSError as e:
+            print(f"   ⚠️  No se pudieron guardar los índices en la instantánea: {e}")
+    
+    def _cargar_indices_snapshot(self) -> bool:
+        """Carga los índices precalculados de la instantánea (False si faltan u obsoletos)"""
+        seccion = self.snapshot.cargar_seccion('graphrag_v2', self.FORMATO_INDICES) if self.snapshot else None
+        if seccion is None:
+            return False
+        datos, arrays = seccion
+        
+        def parte(prefijo):
+            return {k[len(prefijo) + 1:]: v for k, v in arrays.items() if k.startswith(prefijo + '_')}
         
-        # Construir relaciones inversas
-        for ent_id, ent_data in self.entidades.items():
-            for prop, objetos in ent_data['relaciones'].items():
-                for obj_id in objetos:
-                    if obj_id in self.entidades:
-                        self.entidades[obj_id]['relaciones_inversas'][prop].append(ent_id)
+        self.entidades = AlmacenEntidades.importar(datos['entidades'], parte('entidades'))
+        self.indice_lexico = IndiceBM25.importar(datos['lexico'], parte('lexico'))
+        self.index_propiedades = dict(datos['propiedades'])
+        print("   ⚡ Índices cargados desde la instantánea")
+        return True
     
     def _build_entity_text(self, ent_id: str) -> str:
         """
@@ -213,7 +2550,13 @@ class GraphRAG_v2:
         return " ".join(parts)
     
     def _compute_embeddings(self):
-        """Precomputa embeddings de todas las entidades"""
+        """
+        Prepara los embeddings de todas las entidades
+        
+        Reutiliza los vectores del almacén persistente cuyo texto no cambió;
+        las entidades nuevas o modificadas quedan pendientes hasta que el
+        modelo esté cargado (_completar_embeddings).
+        """
         print("   Construyendo textos de entidades...")
         
         for ent_id in self.entidades.keys():
@@ -221,20 +2564,287 @@ class GraphRAG_v2:
             self.entity_texts.append(text)
             self.entity_ids.append(ent_id)
         
-        print(f"   Generando {len(self.entity_texts)} embeddings...")
+        self._hashes = [AlmacenEmbeddings.hash_texto(t) for t in self.entity_texts]
+        hashes, vectores = self.almacen.cargar() if self.almacen else ([], None)
+        self._alinear_embeddings(hashes, vectores)
+        self._almacen_obsoleto = len(hashes) != len(set(self._hashes)) or \
+            (vectores is not None and self.embeddings is not vectores)
+        print(f"   ♻️  Reutilizados del almacén: {len(self._hashes) - len(self._pendientes)}")
+        
+        if self._pendientes:
+            print(f"   ⏳ {len(self._pendientes)} embeddings pendientes del modelo")
+    
+    def _alinear_embeddings(self, hashes: List[str], vectores: Optional[np.ndarray]):
+        """
+        Asigna self.embeddings a partir de vectores guardados (hashes → filas)
+        
+        Si los hashes coinciden en orden con las entidades actuales se usa la
+        matriz mapeada tal cual (sin copia, páginas compartidas entre procesos);
+        si no, se copian las filas reutilizables y el resto queda pendiente.
+        """
+        if vectores is not None and hashes == self._hashes:
+            self.embeddings = vectores
+            self._pendientes = []
+            return
+        
+        posicion = {h: i for i, h in enumerate(hashes)}
+        self._pendientes = [i for i, h in enumerate(self._hashes) if h not in posicion]
+        if vectores is not None and posicion:
+            destino = [i for i, h in enumerate(self._hashes) if h in posicion]
+            embeddings = np.zeros((len(self._hashes), vectores.shape[1]), dtype=np.float32)
+            # Las filas guardadas ya están normalizadas: se copian sin recalcular
+            embeddings[destino] = vectores[[posicion[self._hashes[i]] for i in destino]]
+            embeddings.flags.writeable = False
+            self.embeddings = embeddings
+        else:
+            self.embeddings = None
+    
+    def _completar_embeddings(self):
+        """Codifica los embeddings pendientes (requiere self._model cargado) y publica el estado"""
+        with self._borrador():
+            dim = self._model.get_sentence_embedding_dimension()
+            n = len(self._hashes)
+            
+            if self.embeddings is None or self.embeddings.shape[1] != dim:
+                if self.embeddings is not None:
+                    print(f"   ⚠️  Dimensión del almacén distinta a la del modelo ({dim}), se regenera")
+                embeddings = np.zeros((n, dim), dtype=np.float32)
+                pendientes = list(range(n))
+                self._almacen_obsoleto = True
+            else:
+                # Sin pendientes se conserva la matriz tal cual (puede estar mapeada)
+                embeddings = self.embeddings
+                pendientes = self._pendientes
+            
+            if pendientes:
+                print(f"   Generando {len(pendientes)} embeddings...")
+                start_time = time.time()
+                # Computar en batch para eficiencia
+                nuevos = self._model.encode(
+                    [self.entity_texts[i] for i in pendientes],
+                    batch_size=32,
+                    show_progress_bar=True,
+                    convert_to_numpy=True
+                )
+                embeddings = np.array(embeddings, dtype=np.float32)  # copia escribible
+                # Normalizar solo las filas nuevas, una vez: la similitud coseno pasa a
+                # ser un producto punto y las reutilizadas no cambian ni en el último bit
+                embeddings[pendientes] = _normalizar_filas(nuevos)
+                embeddings.flags.writeable = False
+                print(f"   ✅ Embeddings generados en {time.time() - start_time:.2f}s")
+            self.embeddings = embeddings
+            self._pendientes = []
+            
+            # Reescribir si hubo cambios (nuevas entidades o entradas obsoletas) y
+            # volver a abrirla mapeada: la copia en memoria se libera y los índices
+            # cuantizados no conviven con otra matriz float32 residente
+            if self.almacen and (pendientes or self._almacen_obsoleto):
+                self.almacen.guardar(self._hashes, self.embeddings)
+                self._almacen_obsoleto = False
+                hashes, mapeados = self.almacen.cargar()
+                if mapeados is not None and hashes == self._hashes:
+                    self.embeddings = mapeados
+            self._construir_indice_vectorial()
+            print(f"   📊 Shape: {self.embeddings.shape}")
+    
+    def _huella_embeddings(self) -> str:
+        """Identifica el contenido de la matriz de embeddings (modelo + textos en orden)"""
+        h = hashlib.sha1(self.id_codificador.encode('utf-8'))
+        for text_hash in self._hashes:
+            h.update(text_hash.encode('ascii'))
+        return h.hexdigest()
+    
+    def _ruta_indice(self) -> Optional[Path]:
+        if not self.cache_dir:
+            return None
+        return Path(self.cache_dir) / f"indice_{self.tipo_indice}"
+    
+    def _construir_indice_vectorial(self):
+        """
+        Carga el índice vectorial guardado si corresponde a los embeddings
+        actuales; si no, lo construye y lo guarda en disco
+        """
+        ruta = self._ruta_indice()
+        huella = self._huella_embeddings()
         start_time = time.time()
+        try:
+            indice = INDICES_VECTORIALES[self.tipo_indice](**self.parametros_indice)
+            if (indice.PERSISTENTE and ruta is not None and (ruta / "huella.txt").exists()
+                    and (ruta / "huella.txt").read_text().strip() == huella and indice.cargar(ruta)):
+                indice.ajustar(**self.parametros_indice)
+                self.indice = indice
+                print(f"   ✅ Índice {indice.tipo} cargado desde {ruta}")
+                return
+            indice.construir(self.embeddings)
+        except (ImportError, ValueError) as e:
+            print(f"   ⚠️  {e}; se usa búsqueda exacta")
+            indice = IndiceExacto()
+            indice.construir(self.embeddings)
+        
+        if indice.PERSISTENTE and ruta is not None:
+            indice.guardar(ruta)
+            (ruta / "huella.txt").write_text(huella)
+            print(f"   ✅ Índice {indice.tipo} construido en {time.time() - start_time:.2f}s y guardado en {ruta}")
+        self.indice = indice
+    
+    def ajustar_indice(self, **params):
+        """
+        Ajusta el compromiso recall/latencia del índice vectorial
         
-        # Computar en batch para eficiencia
-        self.embeddings = self.model.encode(
-            self.entity_texts,
-            batch_size=32,
-            show_progress_bar=True,
-            convert_to_numpy=True
-        )
+        Ejemplos: ajustar_indice(ef_search=128) para HNSW,
+        ajustar_indice(nprobe=32) para IVF-PQ, ajustar_indice(reordenar=0)
+        para float16/int8
+        
+        El índice ajustado es una copia que comparte los datos del anterior y
+        se publica como el resto del estado: las consultas en curso terminan
+        con los parámetros anteriores.
+        """
+        with self._borrador():
+            self.parametros_indice = {**self.parametros_indice, **params}
+            if self.indice is not None:
+                indice = self.indice.con_parametros(**params)
+                if indice.faltan_vectores():
+                    # p. ej. reordenar > 0 sobre un índice construido sin los float32
+                    indice.construir(self.embeddings)
+                self.indice = indice
+    
+    @_lectura_consistente
+    def verificar_recall(self, queries: List[str], top_k: int = 10, indice=None) -> Dict[str, float]:
+        """
+        Recall@k del índice vectorial frente a la búsqueda exacta en float32
+        
+        Args:
+            queries: Consultas de evaluación
+            top_k: k del recall
+            indice: Índice a verificar (por defecto, el del motor)
+            
+        Returns:
+            {'recall', 'memoria_mb' (estructura del índice), 'residente_mb' (memoria
+            propia del índice y de los embeddings del motor; la matriz mapeada
+            desde el almacén no cuenta), 'memoria_float32_mb' (matriz float32)}
+        """
+        consultas = self._codificar_consultas(queries)
+        indice = indice or self.indice
+        exacto = IndiceExacto()
+        exacto.construir(self.embeddings)
+        _, verdad = exacto.buscar(consultas, top_k)
+        _, obtenidos = indice.buscar(consultas, top_k)
+        aciertos = sum(len(set(v.tolist()) & set(o.tolist())) for v, o in zip(verdad, obtenidos))
+        residente = indice.residente()
+        if getattr(indice, 'vectores', None) is not self.embeddings:
+            residente += _bytes_en_memoria(self.embeddings)  # la matriz que conserva el motor
+        return {
+            'recall': aciertos / verdad.size if verdad.size else 1.0,
+            'memoria_mb': indice.memoria() / 1e6,
+            'residente_mb': residente / 1e6,
+            'memoria_float32_mb': self.embeddings.nbytes / 1e6,
+        }
+    
+    @_lectura_consistente
+    def codificar_consultas(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings normalizados de varias consultas en una sola llamada al modelo
+        
+        Quedan en la caché de consultas: quien agrupa preguntas de varios modos
+        (p. ej. el servidor con sus micro-lotes) las codifica juntas una vez y
+        las búsquedas posteriores de cada modo reutilizan los vectores.
+        
+        Returns:
+            Matriz (len(queries), dim) de solo lectura
+        """
+        return self._codificar_consultas(queries)
+    
+    def _asegurar_indice(self):
+        """
+        Carga el modelo si aún no está listo (sin él faltan embeddings, índice
+        vectorial o centroides) y, si la consulta había fijado el estado
+        anterior a la carga, pasa al que publicó: es lo primero que lee una
+        consulta semántica, así que no mezcla versiones
+        """
+        if self.indice is not None and self._modelo_listo.is_set():
+            return
+        self.model
+        local = self._local
+        if getattr(local, 'estado', None) is not None and not self._en_borrador():
+            local.estado = self._estado
+    
+    def _codificar_consultas(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings normalizados de varias consultas, usando la caché LRU
+        
+        Las consultas que no están en caché se codifican juntas en una sola
+        llamada a model.encode. Se codifica la forma normalizada de la
+        pregunta para que todas sus variantes compartan vector.
+        """
+        self._asegurar_indice()
+        claves = [normalizar_consulta(q) for q in queries]
+        vectores = [self.cache_consultas.obtener(c) for c in claves]
+        
+        faltantes = list(dict.fromkeys(c for c, v in zip(claves, vectores) if v is None))
+        if faltantes:
+            nuevos = _normalizar_filas(self.model.encode(faltantes, convert_to_numpy=True))
+            nuevos.flags.writeable = False
+            por_clave = dict(zip(faltantes, nuevos))
+            for clave, vector in por_clave.items():
+                self.cache_consultas.guardar(clave, vector)
+            vectores = [v if v is not None else por_clave[c] for c, v in zip(claves, vectores)]
+        
+        return np.stack(vectores)
+    
+    def guardar_cache_consultas(self):
+        """Persiste la caché de embeddings de consulta (si persistir_consultas=True)"""
+        if self._ruta_consultas is not None:
+            self.cache_consultas.guardar_disco(self._ruta_consultas)
+    
+    def estadisticas_cache(self) -> Dict[str, Dict]:
+        """Métricas de las cachés (aciertos, fallos, desalojos, ocupación)"""
+        return {
+            'consultas': self.cache_consultas.estadisticas(),
+            'respuestas': self.cache_respuestas.estadisticas(),
+        }
+    
+    def version(self) -> str:
+        """
+        Sello de versión del grafo y de los embeddings (modelo + textos de entidades)
+        
+        Se calcula una vez al publicar cada estado (la huella recorre todas las
+        entidades); aquí solo se lee.
+        """
+        return self._sello
+    
+    def _clave_respuesta(self, pregunta: str, modo: str) -> Tuple[str, str, str]:
+        """Clave de la caché de respuestas; vacía la caché si cambió la versión"""
+        version = self.version()
+        # Solo vacía la caché una consulta sobre el estado publicado, no una que aún usa el anterior
+        publicado = getattr(self._local, 'estado', None) in (None, self._estado)
+        if version != self._version_respuestas and publicado:
+            self.cache_respuestas.limpiar()
+            self._version_respuestas = version
+        return (normalizar_consulta(pregunta), modo, version)
+    
+    def precalcular_respuestas(self, preguntas: List[str], modo: str = "hibrido",
+                               en_segundo_plano: bool = False):
+        """
+        Calcula y cachea las respuestas de una lista de preguntas frecuentes
+        
+        Espera al modelo si el modo lo necesita, de modo que las respuestas
+        cacheadas son las definitivas (no las léxicas de arranque).
         
-        elapsed = time.time() - start_time
-        print(f"   ✅ Embeddings generados en {elapsed:.2f}s")
-        print(f"   📊 Shape: {self.embeddings.shape}")
+        Args:
+            preguntas: Preguntas a precalcular (p. ej. TOP_10_PREGUNTAS)
+            modo: Modo de búsqueda con el que se responderán
+            en_segundo_plano: Ejecutar en un hilo sin bloquear al llamador
+        """
+        def _precalcular():
+            if modo != "lexico":
+                self.model
+            for pregunta in preguntas:
+                self.responder(pregunta, modo=modo)
+        
+        if en_segundo_plano:
+            threading.Thread(target=_precalcular, name="precalculo-respuestas", daemon=True).start()
+        else:
+            _precalcular()
     
     def buscar_semantico(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """
@@ -247,77 +2857,76 @@ class GraphRAG_v2:
         Returns:
             Lista de (entity_id, score) ordenada por relevancia
         """
-        # Generar embedding de la query
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
-        
-        # Calcular similitud coseno
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        return self.buscar_semantico_batch([query], top_k=top_k)[0]
+    
+    @_lectura_consistente
+    def buscar_semantico_batch(self, queries: List[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """
+        Búsqueda semántica de varias queries a la vez
         
-        # Obtener top-k índices
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        Codifica todas las queries en una sola llamada al modelo y las puntúa
+        con un único producto matriz-matriz contra los embeddings.
         
-        # Construir resultados
-        results = [
-            (self.entity_ids[idx], float(similarities[idx]))
-            for idx in top_indices
+        Args:
+            queries: Preguntas del usuario
+            top_k: Número de resultados por query
+            
+        Returns:
+            Una lista de (entity_id, score) por query, en el mismo orden
+        """
+        return self._buscar_semantico_lote(queries, top_k)[0]
+    
+    def _buscar_semantico_lote(self, queries: List[str],
+                               top_k: int) -> Tuple[List[List[Tuple[str, float]]], Optional[np.ndarray]]:
+        """Resultados semánticos y la matriz de embeddings de las queries con que se buscaron"""
+        if not queries:
+            return [], None
+        
+        # Embeddings de las queries (normalizados, desde caché si se repiten)
+        query_embeddings = self._codificar_consultas(queries)
+        
+        # Similitud coseno vía el índice vectorial (filas ya normalizadas)
+        scores, indices = self.indice.buscar(query_embeddings, top_k)
+        entity_ids = self.entity_ids
+        
+        resultados = [
+            [
+                (entity_ids[idx], float(score))
+                for score, idx in zip(fila_scores, fila_idx)
+                if idx >= 0
+            ]
+            for fila_scores, fila_idx in zip(scores, indices)
         ]
-        
-        return results
+        return resultados, query_embeddings
     
+    @_lectura_consistente
     def buscar_lexico(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """
-        Búsqueda léxica mejorada (fallback de v1.5)
+        Búsqueda léxica BM25F sobre labels, comments e IDs
         
         Args:
             query: Pregunta del usuario
             top_k: Número de resultados
             
         Returns:
-            Lista de (entity_id, score) ordenada por relevancia
+            Lista de (entity_id, score) ordenada por relevancia, con score en [0, 1]
         """
-        palabras = self._normalize(query).split()
+        palabras = tokens_normalizados(query)
         if not palabras:
             return []
         
-        scores = defaultdict(int)
-        
-        # Búsqueda en índice de palabras
-        for palabra in palabras:
-            if palabra in self.index_palabras:
-                for ent_id in self.index_palabras[palabra]:
-                    scores[ent_id] += 1
-        
-        # Bonus por coincidencia exacta en labels
-        for ent_id, ent in self.entidades.items():
-            for label in ent['labels']:
-                label_lower = label.lower()
-                
-                # Bonus grande si label completo contiene la query
-                if query.lower() in label_lower:
-                    scores[ent_id] += 5
-                
-                # Bonus por cada palabra que coincida
-                for palabra in palabras:
-                    if len(palabra) > 3 and palabra in self._normalize(label):
-                        scores[ent_id] += 2
-        
-        # NUEVO: Bonus si el ID de la entidad contiene palabras clave
-        for palabra in palabras:
-            if len(palabra) > 3:
-                for ent_id in self.entidades.keys():
-                    if palabra in ent_id.lower():
-                        scores[ent_id] += 3  # Bonus importante
-        
-        # Normalizar scores
-        max_score = max(scores.values()) if scores else 1
-        results = [
-            (ent_id, score / max_score)
-            for ent_id, score in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        ]
+        # Los interrogativos aparecen en muchos comments y solo añaden ruido
+        palabras = [p for p in palabras if p not in self.STOPWORDS_CONSULTA] or palabras
+        resultados = self.indice_lexico.buscar(palabras, top_k=top_k)
+        if not resultados:
+            return []
         
-        return results
+        # Normalizar scores (el mejor resultado vale 1.0)
+        max_score = resultados[0][1] or 1.0
+        return [(ent_id, score / max_score) for ent_id, score in resultados]
     
-    def buscar_hibrido(self, query: str, top_k: int = 10, alpha: float = 0.6) -> List[Tuple[str, float]]:
+    def buscar_hibrido(self, query: str, top_k: int = 10, alpha: float = 0.6,
+                       fusion: Optional[str] = None) -> List[Tuple[str, float]]:
         """
         Búsqueda híbrida mejorada: combina semántica y léxica con boosting inteligente
         
@@ -325,174 +2934,312 @@ class GraphRAG_v2:
             query: Pregunta
             top_k: Resultados a retornar
             alpha: Peso de búsqueda semántica (default 0.6, más bajo = más peso a léxico)
+            fusion: 'lineal' o 'rrf' (por defecto, la del motor)
             
         Returns:
             Lista combinada y reordenada
         """
-        # Búsquedas independientes
-        sem_results = self.buscar_semantico(query, top_k=top_k*3)  # Más candidatos
-        lex_results = self.buscar_lexico(query, top_k=top_k*3)
+        return self.buscar_hibrido_batch([query], top_k=top_k, alpha=alpha, fusion=fusion)[0]
+    
+    @_lectura_consistente
+    def buscar_hibrido_batch(self, queries: List[str], top_k: int = 10, alpha: float = 0.6,
+                             fusion: Optional[str] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Búsqueda híbrida de varias queries: semántica en lote + léxica por query
+        
+        Args:
+            queries: Preguntas
+            top_k: Resultados a retornar por query
+            alpha: Peso de búsqueda semántica
+            fusion: 'lineal' o 'rrf' (por defecto, la del motor)
+            
+        Returns:
+            Una lista combinada y reordenada por query, en el mismo orden
+        """
+        return self._buscar_hibrido_lote(queries, top_k, alpha, fusion)[0]
+    
+    def _buscar_hibrido_lote(self, queries: List[str], top_k: int, alpha: float = 0.6,
+                             fusion: Optional[str] = None) -> Tuple[List[List[Tuple[str, float]]],
+                                                                     Optional[np.ndarray]]:
+        """Resultados híbridos y los embeddings de las queries (None si aún no hay modelo)"""
+        # Mientras el modelo carga, solo léxica
+        if self.modelo_listo():
+            sem_batch, vectores = self._buscar_semantico_lote(queries, top_k*3)  # Más candidatos
+        else:
+            self.iniciar_carga_modelo()
+            sem_batch, vectores = [[] for _ in queries], None
+        
+        resultados = [
+            self._combinar_hibrido(query, sem_results, top_k, alpha, fusion)
+            for query, sem_results in zip(queries, sem_batch)
+        ]
+        return resultados, vectores
+    
+    @_lectura_consistente
+    def buscar_batch(self, queries: List[str], modo: str = "hibrido",
+                     top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """Búsqueda en lote según modo ('semantico', 'lexico' o 'hibrido')"""
+        return self._buscar_lote(queries, modo, top_k)[0]
+    
+    def _buscar_lote(self, queries: List[str], modo: str,
+                     top_k: int) -> Tuple[List[List[Tuple[str, float]]], Optional[np.ndarray]]:
+        """
+        Resultados según modo y los embeddings de las queries usados en la
+        búsqueda (None en modo léxico o sin modelo): la detección de intención
+        por centroides los reutiliza sin volver a la caché de consultas
+        """
+        if modo == "semantico":
+            return self._buscar_semantico_lote(queries, top_k)
+        if modo == "lexico":
+            return [self.buscar_lexico(query, top_k=top_k) for query in queries], None
+        return self._buscar_hibrido_lote(queries, top_k)
+    
+    def _rasgos_hibrido(self) -> Dict[str, np.ndarray]:
+        """
+        Rasgos por entidad para los boosts híbridos, calculados una vez por almacén
         
-        # Combinar scores
-        combined_scores = {}
+        ids en minúsculas, número de labels y, aplanados con offsets por
+        entidad, los labels normalizados y los labels en minúsculas con
+        'día' -> 'dia' (así 'día N' y 'dia N' se buscan con un solo patrón).
+        """
+        almacen = self.entidades
+        if self._rasgos is not None and self._rasgos[0] is almacen:
+            return self._rasgos[1]
+        # Fuera de un borrador (no debería ocurrir: se calculan al publicar) no se guardan
+        
+        registros = almacen.registros
+        labels = [r.labels for r in registros]
+        n_labels = np.fromiter((len(l) for l in labels), dtype=np.int64, count=len(labels))
+        indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(n_labels, out=indptr[1:])
+        planos = [label for ls in labels for label in ls]
+        rasgos = {
+            'ids': np.array([ent_id.lower() for ent_id in almacen.ids], dtype=str),
+            'n_labels': n_labels,
+            'indptr': indptr,
+            'labels_norm': np.array([' '.join(t) for r in registros for t in r.tokens_labels] or [''],
+                                    dtype=str),
+            'labels_dia': np.array([l.lower().replace('día', 'dia') for l in planos] or [''], dtype=str),
+        }
+        if self._en_borrador():
+            self._rasgos = (almacen, rasgos)
+        return rasgos
+    
+    def _boosts(self, query: str, filas: np.ndarray) -> np.ndarray:
+        """
+        Boost de cada candidato (filas del almacén) por coincidencias con la query
         
-        for ent_id, score in sem_results:
-            combined_scores[ent_id] = alpha * score
+        - +0.5 por cada label que contiene una palabra importante de la query
+        - +0.3 por label si la palabra está en el ID de la entidad
+        - +0.8 si el ID contiene 'dia{N}' y +0.8 por label con 'día N' / 'dia N'
         
-        for ent_id, score in lex_results:
-            if ent_id in combined_scores:
-                combined_scores[ent_id] += (1 - alpha) * score
-            else:
-                combined_scores[ent_id] = (1 - alpha) * score
+        Los rasgos de la query se calculan una vez y cada regla es una
+        operación vectorial sobre los candidatos.
+        """
+        rasgos = self._rasgos_hibrido()
+        boost = np.zeros(len(filas))
+        if not len(filas):
+            return boost
+        
+        # Labels de los candidatos (posiciones en los arrays aplanados) y su dueño
+        n_labels = rasgos['n_labels'][filas]
+        dueno = np.repeat(np.arange(len(filas)), n_labels)
+        inicio = np.repeat(rasgos['indptr'][filas] - np.cumsum(n_labels) + n_labels, n_labels)
+        posiciones = inicio + np.arange(len(dueno))
+        ids = rasgos['ids'][filas]
+        labels_norm = rasgos['labels_norm'][posiciones]
+        labels_dia = rasgos['labels_dia'][posiciones]
+        
+        def por_candidato(aciertos: np.ndarray) -> np.ndarray:
+            return np.bincount(dueno, weights=aciertos, minlength=len(filas))
+        
+        # Palabras importantes (más de 3 letras, no stopwords), con repetición
+        palabras = [p for p in tokens_normalizados(query)
+                    if len(p) > 3 and p not in self.STOPWORDS_BOOST]
+        for palabra, veces in Counter(palabras).items():
+            boost += veces * 0.5 * por_candidato(np.char.find(labels_norm, palabra) >= 0)
+            boost += veces * 0.3 * n_labels * (np.char.find(ids, palabra) >= 0)
+        
+        # Números de la query (días)
+        for num, veces in Counter(re.findall(r'\d+', query)).items():
+            boost += veces * 0.8 * (np.char.find(ids, f'dia{num}') >= 0)
+            boost += veces * 0.8 * por_candidato(np.char.find(labels_dia, f'dia {num}') >= 0)
+        return boost
+    
+    def _combinar_hibrido(self, query: str, sem_results: List[Tuple[str, float]],
+                          top_k: int, alpha: float, fusion: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Fusiona resultados semánticos ya calculados con la búsqueda léxica y los boosts
         
-        # BOOST MEJORADO: Términos clave exactos
-        query_lower = query.lower()
-        palabras_clave = self._normalize(query).split()
+        'lineal': alpha * semántico + (1 - alpha) * léxico + boost.
+        'rrf': reciprocal rank fusion, suma de 1 / (RRF_K + posición) en el
+        ranking semántico, el léxico y el de boosts (sin depender de la
+        escala de cada score).
+        """
+        fusion = fusion or self.fusion
+        lex_results = self.buscar_lexico(query, top_k=top_k*3)
         
-        # Extraer palabras importantes (más de 3 letras, no stopwords)
-        stopwords = {'que', 'quien', 'donde', 'cuando', 'como', 'cual', 'son', 'esta', 'hay'}
-        palabras_importantes = [p for p in palabras_clave if len(p) > 3 and p not in stopwords]
+        # Candidatos: semánticos y después léxicos nuevos (orden de desempate)
+        candidatos = {}
+        for ent_id, _ in sem_results:
+            candidatos.setdefault(ent_id, len(candidatos))
+        for ent_id, _ in lex_results:
+            candidatos.setdefault(ent_id, len(candidatos))
+        if not candidatos:
+            return []
+        ids = list(candidatos)
+        fila = self.entidades.fila
+        filas = np.fromiter((fila(e) for e in ids), dtype=np.int64, count=len(ids))
+        pos_sem = np.fromiter((candidatos[e] for e, _ in sem_results), dtype=np.int64, count=len(sem_results))
+        pos_lex = np.fromiter((candidatos[e] for e, _ in lex_results), dtype=np.int64, count=len(lex_results))
+        boost = self._boosts(query, filas)
+        
+        scores = np.zeros(len(ids))
+        if fusion == "rrf":
+            scores[pos_sem] += 1.0 / (self.RRF_K + 1 + np.arange(len(pos_sem)))
+            scores[pos_lex] += 1.0 / (self.RRF_K + 1 + np.arange(len(pos_lex)))
+            con_boost = np.flatnonzero(boost > 0)
+            orden_boost = con_boost[np.argsort(-boost[con_boost], kind='stable')]
+            scores[orden_boost] += 1.0 / (self.RRF_K + 1 + np.arange(len(orden_boost)))
+        else:
+            scores[pos_sem] = alpha * np.array([score for _, score in sem_results])
+            scores[pos_lex] += (1 - alpha) * np.array([score for _, score in lex_results])
+            scores += boost
         
-        for ent_id in combined_scores:
-            ent = self.entidades[ent_id]
-            boost = 0.0
-            
-            # Boost FUERTE si el label contiene palabra clave exacta
-            for label in ent.get('labels', []):
-                label_lower = label.lower()
-                label_norm = self._normalize(label)
-                
-                # Cada palabra importante que coincida
-                for palabra in palabras_importantes:
-                    if palabra in label_norm:
-                        boost += 0.5  # Aumentado de 0.1 a 0.5
-                    
-                    # Boost EXTRA si está en el ID de la entidad
-                    if palabra in ent_id.lower():
-                        boost += 0.3  # Aumentado de 0.05 a 0.3
-            
-            # Boost especial para números (días)
-            import re
-            numeros_query = re.findall(r'\d+', query)
-            for num in numeros_query:
-                # Buscar "Dia{num}" o "día {num}"
-                if f'dia{num}' in ent_id.lower():
-                    boost += 0.8  # GRAN boost para días
-                for label in ent.get('labels', []):
-                    if f'día {num}' in label.lower() or f'dia {num}' in label.lower():
-                        boost += 0.8
-            
-            combined_scores[ent_id] += boost
-        
-        # Ordenar y retornar top-k
-        results = sorted(
-            combined_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_k]
-        
-        return results
+        # Ordenar (estable: a igual score, el orden de llegada) y retornar top-k
+        top = np.argsort(-scores, kind='stable')[:top_k]
+        return [(ids[i], float(scores[i])) for i in top]
+    
+    def indice_temporal(self) -> IndiceTemporal:
+        """Índice marco temporal -> eventos ordenados (se construye al publicar cada almacén)"""
+        almacen = self.entidades
+        temporal = self._temporal
+        if temporal is None or temporal[0] is not almacen:
+            temporal = (almacen, IndiceTemporal(almacen))
+            if self._en_borrador():
+                self._temporal = temporal
+        return temporal[1]
     
     def responder_que_eventos(self, pregunta: str, entidad_principal: str) -> Optional[str]:
         """Plantilla mejorada para preguntas sobre eventos de un día"""
-        # Detectar número de día de múltiples formas
-        dias_map = {
-            '1': ['Dia1_SabadoPreparacion', 'dia1', 'día 1', 'dia 1'],
-            '2': ['Dia2_DomingoPartida', 'dia2', 'día 2', 'dia 2'],
-            '3': ['Dia3_LunesAscenso', 'dia3', 'día 3', 'dia 3'],
-            '4': ['Dia4_MartesDescensoYLomada', 'dia4', 'día 4', 'dia 4'],
-            '5': ['Dia5_MiercolesAlba', 'dia5', 'día 5', 'dia 5'],
-        }
+        indice = self.indice_temporal()
         
-        p = pregunta.lower()
-        dia_num = None
-        dia_id = None
-        
-        # Buscar en la pregunta
-        for num, variantes in dias_map.items():
-            dia_id_candidato = variantes[0]
-            for variante in variantes[1:]:
-                if variante in p:
-                    dia_num = num
-                    dia_id = dia_id_candidato
-                    break
-            if dia_id:
-                break
+        # Día mencionado en la pregunta; si no existe, la entidad principal si es un marco
+        _, marco_id = indice.marco_de_pregunta(pregunta)
+        if marco_id is None:
+            marco_id = entidad_principal
         
-        # Si no encontró en la pregunta, ver si la entidad principal es un día
-        if not dia_id:
-            for num, variantes in dias_map.items():
-                if variantes[0] == entidad_principal or entidad_principal in variantes:
-                    dia_num = num
-                    dia_id = variantes[0]
-                    break
+        eventos = indice.eventos.get(marco_id)
+        if not eventos:
+            return None
         
-        # Si encontró el día, buscar sus eventos
-        if dia_id and dia_id in self.entidades:
-            dia_ent = self.entidades[dia_id]
-            eventos_def = dia_ent.get('relaciones', {}).get('defineMarcoTemporal', [])
-            
-            if eventos_def:
-                # Recopilar eventos con su orden
-                eventos_lista = []
-                for ev_id in eventos_def:
-                    if ev_id in self.entidades:
-                        ev_ent = self.entidades[ev_id]
-                        nombre = ev_ent['labels'][0] if ev_ent['labels'] else ev_id
-                        orden = ev_ent['propiedades'].get('tieneOrdenEvento', 999)
-                        try:
-                            orden_num = int(orden)
-                        except:
-                            orden_num = 999
-                        eventos_lista.append((orden_num, nombre))
-                
-                if eventos_lista:
-                    # Ordenar por número de orden
-                    eventos_lista.sort(key=lambda x: x[0])
-                    
-                    dia_nombre = dia_ent['labels'][0] if dia_ent['labels'] else f"Día {dia_num}"
-                    
-                    # Formatear respuesta
-                    eventos_texto = '\n'.join([
-                        f"   • **{nombre}** (evento #{orden})" 
-                        for orden, nombre in eventos_lista
-                    ])
-                    
-                    return f"📅 **{dia_nombre}** incluye estos eventos:\n\n{eventos_texto}"
+        eventos_texto = '\n'.join(
+            f"   • **{nombre}** (evento #{orden})" for orden, _, nombre in eventos
+        )
+        return f"📅 **{indice.nombres[marco_id]}** incluye estos eventos:\n\n{eventos_texto}"
+    
+    def identificar_intencion(self, pregunta: str, vector: Optional[np.ndarray] = None) -> str:
+        """
+        Detecta tipo de pregunta (reglas heredadas de v1.5, compiladas)
         
-        return None
+        Con intencion='centroides' o 'mixto' y el vector de la consulta ya
+        calculado, se usa el centroide de intención más cercano; sin vector
+        (p. ej. en modo léxico) se aplican las reglas.
+        """
+        clasificador = self.clasificador_intencion
+        intencion = clasificador.por_reglas(pregunta)
+        if vector is None or self.intencion == "reglas":
+            return intencion
+        if self.intencion == "mixto" and intencion != 'general':
+            return intencion
+        # Los centroides se entrenan al publicar el estado con el modelo cargado
+        if clasificador.centroides is None:
+            return intencion
+        return clasificador.por_centroide(vector)[0]
     
-    def identificar_intencion(self, pregunta: str) -> str:
-        """Detecta tipo de pregunta (heredado de v1.5 con mejoras)"""
-        p = pregunta.lower()
-        
-        # Detección específica de "día X"
-        if any(x in p for x in ['día 1', 'día 2', 'día 3', 'día 4', 'día 5', 
-                                 'dia 1', 'dia 2', 'dia 3', 'dia 4', 'dia 5',
-                                 'dia1', 'dia2', 'dia3', 'dia4', 'dia5']):
-            if any(w in p for w in ['qué', 'que', 'cuales', 'cuáles', 'eventos', 'actividades']):
-                return 'que_eventos'
-        
-        if any(w in p for w in ['dónde', 'donde', 'lugar', 'ubicación', 'sitio', 'está', 'esta']):
-            return 'donde'
-        elif any(w in p for w in ['cuándo', 'cuando', 'fecha', 'día', 'hora']):
-            return 'cuando'
-        elif any(w in p for w in ['quién', 'quien', 'quiénes', 'quienes', 'participa', 'realiza']):
-            return 'quien'
-        elif any(w in p for w in ['qué', 'que', 'cómo', 'como', 'cuál', 'cual']):
-            if 'evento' in p or 'actividad' in p or 'hito' in p:
-                return 'que_eventos'
-            elif 'danza' in p or 'baile' in p:
-                return 'que_danzas'
+    def materializar_fragmentos(self, ent_ids: Optional[set] = None) -> int:
+        """
+        Precalcula los fragmentos donde/cuando/quien de las entidades
+        
+        Solo se guardan los fragmentos que existen. Con ent_ids se recalculan
+        únicamente esas entidades y se conservan los demás fragmentos (los de
+        entidades que ya no existen se descartan); recargar() lo usa con las
+        entidades cambiadas y sus vecinas. Devuelve cuántas se calcularon.
+        El resultado se publica con el resto del estado (copy-on-write).
+        """
+        with self._borrador():
+            almacen = self.entidades
+            if ent_ids is None or self._fragmentos is None:
+                fragmentos = {intencion: {} for intencion in self.PLANTILLAS_FRAGMENTO}
+                ent_ids = almacen
             else:
-                return 'que'
-        elif 'cuántos' in p or 'cuantos' in p or 'número' in p or 'cantidad' in p:
-            return 'cuantos'
-        else:
-            return 'general'
+                fragmentos = {
+                    intencion: {e: f for e, f in anteriores.items() if e in almacen and e not in ent_ids}
+                    for intencion, anteriores in self._fragmentos[1].items()
+                }
+                ent_ids = [e for e in ent_ids if e in almacen]
+            
+            for ent_id in ent_ids:
+                for intencion in self.PLANTILLAS_FRAGMENTO:
+                    fragmento = getattr(self, f'_fragmento_{intencion}')(ent_id)
+                    if fragmento:
+                        fragmentos[intencion][ent_id] = fragmento
+            self._fragmentos = (almacen, fragmentos)
+            return len(ent_ids)
+    
+    def _fragmento(self, intencion: str, ent_id: str) -> Optional[str]:
+        """Fragmento materializado (si está al día con el almacén) o calculado sobre el grafo"""
+        fragmentos = self._fragmentos
+        if fragmentos is not None and fragmentos[0] is self.entidades:
+            return fragmentos[1][intencion].get(ent_id)
+        return getattr(self, f'_fragmento_{intencion}')(ent_id)
+    
+    @_lectura_consistente
+    def exportar_faq(self, ruta: str) -> int:
+        """
+        Exporta los fragmentos como paquete FAQ estático (JSON) para kioscos sin conexión
+        
+        Una entrada por entidad con algún fragmento (donde, cuando, quien y,
+        para los marcos temporales, sus eventos). Devuelve cuántas entradas.
+        """
+        indice = self.indice_temporal()
+        entradas = []
+        for ent_id, ent in self.entidades.items():
+            entrada = {intencion: self._fragmento(intencion, ent_id) for intencion in self.PLANTILLAS_FRAGMENTO}
+            if ent_id in indice.eventos:
+                entrada['eventos'] = self.responder_que_eventos("", ent_id)
+            entrada = {k: v for k, v in entrada.items() if v}
+            if entrada:
+                entradas.append({'id': ent_id, 'nombre': ent['labels'][0] if ent['labels'] else ent_id,
+                                 'labels': list(ent['labels']), 'tipo': ent['type'], **entrada})
+        paquete = {
+            'version_grafo': self.version_grafo,
+            'generado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dias': {str(n): marco for n, marco in sorted(indice.dias.items())},
+            'entradas': entradas,
+        }
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(paquete, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, ruta)
+        return len(entradas)
     
     def responder_donde(self, pregunta: str, entidad_principal: str) -> Optional[str]:
         """Plantilla para preguntas de ubicación"""
+        return self._fragmento('donde', entidad_principal)
+    
+    def responder_cuando(self, pregunta: str, entidad_principal: str) -> Optional[str]:
+        """Plantilla para preguntas temporales"""
+        return self._fragmento('cuando', entidad_principal)
+    
+    def responder_quien(self, pregunta: str, entidad_principal: str) -> Optional[str]:
+        """Plantilla para preguntas sobre participantes"""
+        return self._fragmento('quien', entidad_principal)
+    
+    def _fragmento_donde(self, entidad_principal: str) -> Optional[str]:
+        """Ubicación: ocurreEnLugar o estaEn"""
         ent = self.entidades.get(entidad_principal, {})
         if not ent:
             return None
@@ -524,8 +3271,8 @@ class GraphRAG_v2:
         
         return None
     
-    def responder_cuando(self, pregunta: str, entidad_principal: str) -> Optional[str]:
-        """Plantilla para preguntas temporales"""
+    def _fragmento_cuando(self, entidad_principal: str) -> Optional[str]:
+        """Tiempo: tieneFecha, tieneOrden y tieneOrdenEvento"""
         ent = self.entidades.get(entidad_principal, {})
         if not ent:
             return None
@@ -547,8 +3294,8 @@ class GraphRAG_v2:
         
         return ' '.join(respuestas) if respuestas else None
     
-    def responder_quien(self, pregunta: str, entidad_principal: str) -> Optional[str]:
-        """Plantilla para preguntas sobre participantes"""
+    def _fragmento_quien(self, entidad_principal: str) -> Optional[str]:
+        """Participantes: realizadoPor (directo e inverso) y participaEn inverso"""
         ent = self.entidades.get(entidad_principal, {})
         if not ent:
             return None
@@ -596,37 +3343,101 @@ class GraphRAG_v2:
         
         return None
     
-    def responder(self, pregunta: str, modo: str = "hibrido", verbose: bool = False) -> str:
+    @_lectura_consistente
+    def responder(self, pregunta: str, modo: str = "hibrido", verbose: bool = False,
+                  usar_cache: bool = True) -> str:
         """
         Responde una pregunta usando búsqueda semántica + plantillas
         
+        Las respuestas se cachean por (pregunta normalizada, modo, versión);
+        en modo verbose se recalculan siempre para mostrar el detalle.
+        
         Args:
             pregunta: Pregunta del usuario
             modo: 'semantico', 'lexico', o 'hibrido' (recomendado)
             verbose: Mostrar información de debug
+            usar_cache: Consultar y guardar en la caché de respuestas
             
         Returns:
             Respuesta generada
         """
+        # Las respuestas híbridas de arranque (solo léxicas) no se cachean
+        cacheable = usar_cache and not verbose and (modo != "hibrido" or self.modelo_listo())
+        if cacheable:
+            clave = self._clave_respuesta(pregunta, modo)
+            respuesta = self.cache_respuestas.obtener(clave)
+            if respuesta is not None:
+                return respuesta
+        
+        respuesta = self._responder(pregunta, modo, verbose)
+        if cacheable:
+            self.cache_respuestas.guardar(clave, respuesta)
+        return respuesta
+    
+    @_lectura_consistente
+    def responder_batch(self, preguntas: List[str], modo: str = "hibrido",
+                        usar_cache: bool = True) -> List[str]:
+        """
+        Responde varias preguntas a la vez
+        
+        Las preguntas que no están en caché se buscan juntas (una sola llamada
+        al modelo y un único producto matriz-matriz); la búsqueda léxica, la
+        selección de entidad y las plantillas se aplican pregunta a pregunta.
+        
+        Args:
+            preguntas: Preguntas del usuario
+            modo: 'semantico', 'lexico', o 'hibrido' (recomendado)
+            usar_cache: Consultar y guardar en la caché de respuestas
+            
+        Returns:
+            Respuestas en el mismo orden que las preguntas
+        """
+        cacheable = usar_cache and (modo != "hibrido" or self.modelo_listo())
+        respuestas: List[Optional[str]] = [None] * len(preguntas)
+        claves = {}
+        pendientes = []
+        
+        for i, pregunta in enumerate(preguntas):
+            if cacheable:
+                claves[i] = self._clave_respuesta(pregunta, modo)
+                respuestas[i] = self.cache_respuestas.obtener(claves[i])
+            if respuestas[i] is None:
+                pendientes.append(i)
+        
+        if pendientes:
+            lote, vectores = self._buscar_lote([preguntas[i] for i in pendientes], modo, top_k=10)
+            for j, (i, resultados) in enumerate(zip(pendientes, lote)):
+                vector = vectores[j] if vectores is not None else None
+                respuestas[i] = self._responder(preguntas[i], modo, False, resultados=resultados, vector=vector)
+                if cacheable:
+                    self.cache_respuestas.guardar(claves[i], respuestas[i])
+        
+        return respuestas
+    
+    def _responder(self, pregunta: str, modo: str, verbose: bool,
+                   resultados: Optional[List[Tuple[str, float]]] = None,
+                   vector: Optional[np.ndarray] = None) -> str:
+        """
+        Pipeline completo sin caché: intención, búsqueda (si no viene dada), selección y plantilla
+        
+        responder_batch pasa los resultados y el embedding de la pregunta ya
+        calculados en lote; si no, se buscan aquí según el modo.
+        """
         if verbose:
             print(f"\n🔍 Procesando: '{pregunta}'")
             print(f"   Modo: {modo}")
         
-        # 1. Identificar tipo de pregunta PRIMERO
-        intencion = self.identificar_intencion(pregunta)
-        
-        if verbose:
-            print(f"   🎯 Intención detectada: {intencion}")
+        # 1. Búsqueda según modo
+        if resultados is None:
+            lote, vectores = self._buscar_lote([pregunta], modo, top_k=10)
+            resultados = lote[0]
+            vector = vectores[0] if vectores is not None else None
         
-        # 2. Búsqueda según modo
-        if modo == "semantico":
-            resultados = self.buscar_semantico(pregunta, top_k=10)
-        elif modo == "lexico":
-            resultados = self.buscar_lexico(pregunta, top_k=10)
-        else:  # hibrido
-            resultados = self.buscar_hibrido(pregunta, top_k=10)
+        # 2. Tipo de pregunta (con centroides, sobre el vector con el que se buscó)
+        intencion = self.identificar_intencion(pregunta, vector)
         
         if verbose:
+            print(f"   🎯 Intención detectada: {intencion}")
             print(f"\n   📊 Top resultados:")
             for i, (ent_id, score) in enumerate(resultados[:5], 1):
                 ent = self.entidades[ent_id]
@@ -641,7 +3452,7 @@ class GraphRAG_v2:
         mejor_score = 0
         
         # Palabras clave de la query (sin stopwords)
-        palabras_query = self._normalize(pregunta).split()
+        palabras_query = tokens_normalizados(pregunta)
         stopwords = {'quien', 'quién', 'que', 'qué', 'donde', 'dónde', 'cuando', 'cuándo',
                      'realiza', 'hace', 'ejecuta', 'participa', 'hay', 'esta', 'está',
                      'son', 'como', 'cómo', 'cual', 'cuál', 'eventos', 'día', 'dia'}
@@ -676,9 +3487,10 @@ class GraphRAG_v2:
                 # ALTA prioridad: palabra clave en el PRIMER label (nombre principal)
                 if ent.get('labels'):
                     primer_label = ent['labels'][0].lower()
+                    primer_label_norm = ' '.join(ent['tokens_labels'][0])
                     for palabra in palabras_importantes:
                         # Coincidencia como palabra completa en el nombre
-                        if palabra in self._normalize(primer_label):
+                        if palabra in primer_label_norm:
                             # Bonus extra si está al inicio del nombre
                             if primer_label.startswith(palabra):
                                 puntuacion += 8
@@ -760,37 +3572,396 @@ class GraphRAG_v2:
         
         return "\n".join(lines)
     
-    def guardar_cache(self, filepath: str = "cache_embeddings_v2.pkl"):
-        """Guarda embeddings en caché para carga rápida"""
-        cache_data = {
-            'embeddings': self.embeddings,
+    def guardar_cache(self, filepath: str = "cache_embeddings_v2.npy"):
+        """
+        Guarda embeddings en caché para carga rápida
+        
+        La matriz va en un .npy (float32 normalizado) y los IDs y metadatos en
+        un sidecar JSON con el mismo nombre; no se usa pickle.
+        """
+        if self.embeddings is None:
+            print("⚠️  No hay embeddings que guardar")
+            return
+        
+        meta = {
+            'model_name': self.id_codificador,
+            'dim': int(self.embeddings.shape[1]),
+            'version_grafo': self.version_grafo,
             'entity_ids': self.entity_ids,
-            'entity_texts': self.entity_texts,
-            'entidades': self.entidades,
-            'model_name': self.model.get_sentence_embedding_dimension()
+            'hashes': self._hashes,
         }
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump(cache_data, f)
+        _guardar_npy(Path(filepath), self.embeddings, meta)
         
         print(f"💾 Caché guardado en: {filepath}")
     
-    def cargar_cache(self, filepath: str = "cache_embeddings_v2.pkl") -> bool:
-        """Carga embeddings desde caché"""
+    def cargar_cache(self, filepath: str = "cache_embeddings_v2.npy") -> bool:
+        """
+        Carga embeddings desde caché (mmap de solo lectura, compartido entre procesos)
+        
+        Las filas se asignan a las entidades actuales por el hash de su texto:
+        si el grafo cambió, las entidades nuevas quedan pendientes del modelo.
+        """
+        try:
+            meta, vectores = _cargar_npy(Path(filepath))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  No se pudo leer la caché {filepath}: {e}")
+            return False
+        if meta is None:
+            print(f"⚠️  No se encontró caché en: {filepath}")
+            return False
+        if meta.get('model_name') != self.id_codificador:
+            print(f"⚠️  Caché de otro modelo ({meta.get('model_name')}), se ignora")
+            return False
+        
+        with self._borrador():
+            self._alinear_embeddings(meta['hashes'], vectores)
+            if self._pendientes:
+                print(f"   ⏳ {len(self._pendientes)} embeddings pendientes del modelo")
+                if self.modelo_listo():
+                    self._completar_embeddings()
+                else:
+                    # El índice anterior no corresponde a las filas nuevas: sin índice,
+                    # la próxima consulta semántica carga el modelo y las completa
+                    self.indice = None
+            else:
+                self._construir_indice_vectorial()
+        
+        print(f"✅ Caché cargado desde: {filepath}")
+        return True
+
+
+def _id_local(uri) -> str:
+    """Parte local de una URI (tras '#')"""
+    uri = str(uri)
+    return uri.split('#')[-1] if '#' in uri else uri
+
+
+def _orden_entidades(sujetos) -> Dict[str, int]:
+    """
+    Posición de cada entidad en el almacén que construye _build_index: el
+    de la primera aparición de su sujeto al recorrer sorted(g), es decir,
+    los sujetos en el orden de términos de rdflib (nodos en blanco primero)
+    """
+    orden = {}
+    for sujeto in sorted(set(sujetos)):
+        orden.setdefault(_id_local(sujeto), len(orden))
+    return orden
+
+
+def _es_literal_es(o) -> bool:
+    """Literal en español o sin idioma"""
+    return isinstance(o, Literal) and (o.language == 'es' or not o.language)
+
+
+def extraer_datos_mapa(g: Graph) -> Tuple[Dict, List, Dict]:
+    """
+    Extrae del grafo los datos del mapa y la cronología:
+    1. Lugares con coordenadas
+    2. Eventos ordenados por marco temporal y orden de evento
+    3. Relaciones entre eventos y lugares
+    
+    Hace un único recorrido de las tripletas, despachando por predicado, y
+    construye las tres estructuras a partir de lo recogido: el coste es
+    lineal en el número de tripletas.
+    
+    Returns:
+        (lugares, eventos_ordenados, marcos_temporales)
+    """
+    # ===== Recorrido único: predicado → campo =====
+    campos = {
+        GEO.lat: 'lat',
+        GEO.long: 'lon',
+        RDFS.label: 'label',
+        RDFS.comment: 'comment',
+        RDF.type: 'tipo',
+        FESTIVIDAD.tieneOrden: 'orden',
+        FESTIVIDAD.tieneOrdenEvento: 'orden_evento',
+        FESTIVIDAD.ocurreEnLugar: 'lugar',
+        FESTIVIDAD.defineMarcoTemporal: 'marco',
+    }
+    orden_sujetos = {}
+    lat, lon, orden, orden_evento = {}, {}, {}, {}
+    label, label_es, comment, comment_es = {}, {}, {}, {}
+    tipos = defaultdict(list)
+    lugares_de = defaultdict(list)
+    marcos_de = defaultdict(list)
+    marcos = {}
+    eventos = []
+    
+    for s, p, o in g:
+        orden_sujetos.setdefault(s, None)
+        campo = campos.get(p)
+        if campo is None:
+            continue
+        
+        if campo == 'lat' or campo == 'lon':
+            try:
+                (lat if campo == 'lat' else lon)[s] = float(o)
+            except (TypeError, ValueError):
+                pass
+        elif campo == 'label':
+            if isinstance(o, Literal):
+                label.setdefault(s, str(o))
+                if _es_literal_es(o):
+                    label_es.setdefault(s, str(o))
+        elif campo == 'comment':
+            if isinstance(o, Literal):
+                comment.setdefault(s, str(o))
+                if _es_literal_es(o):
+                    comment_es.setdefault(s, str(o))
+        elif campo == 'tipo':
+            tipos[s].append(_id_local(o))
+            if o == FESTIVIDAD.EventoRitual:
+                eventos.append(s)
+        elif campo == 'orden' or campo == 'orden_evento':
+            try:
+                (orden if campo == 'orden' else orden_evento)[s] = int(o)
+            except (TypeError, ValueError):
+                pass
+        elif campo == 'lugar':
+            lugares_de[s].append(o)
+        else:  # marco
+            marcos.setdefault(s, None)
+            marcos_de[o].append(s)
+    
+    # ===== PASO 1: Lugares con coordenadas =====
+    lugares = {}
+    for s in orden_sujetos:
+        if lat.get(s) and lon.get(s):
+            uri = _id_local(s)
+            lugares[uri] = {
+                "uri": uri,
+                "lat": lat[s],
+                "lon": lon[s],
+                "nombre": label_es.get(s) or str(s).split('#')[-1].replace('_', ' '),
+                "descripcion": comment_es.get(s) or "Sin descripción disponible",
+                "tipos": [t for t in tipos.get(s, []) if t not in ['NamedIndividual']]
+            }
+    
+    # ===== PASO 2: Marcos temporales (días) =====
+    marcos_temporales = {}
+    for s in marcos:
+        marco_uri = _id_local(s)
+        marcos_temporales[marco_uri] = {
+            "uri": marco_uri,
+            "nombre": label.get(s) or marco_uri,
+            "orden": orden.get(s) or 999,
+            "eventos": []
+        }
+    
+    # ===== PASO 3: Eventos asociados a marcos temporales =====
+    for s in eventos:
+        evento_uri = _id_local(s)
+        # Un evento puede abarcar varios marcos (p. ej. la Lomada): se asigna
+        # al más temprano, de forma determinista
+        candidatos = marcos_de.get(s)
+        marco_del_evento = None
+        if candidatos:
+            marco_del_evento = _id_local(min(candidatos, key=lambda m: (orden.get(m) or 999, str(m))))
+        
+        evento_data = {
+            "uri": evento_uri,
+            "nombre": label.get(s) or evento_uri,
+            "descripcion": comment.get(s) or "Sin descripción",
+            "orden_evento": orden_evento.get(s) or 999,
+            "lugares": [l for l in map(_id_local, lugares_de.get(s, [])) if l in lugares],
+            "marco": marco_del_evento
+        }
+        
+        if marco_del_evento and marco_del_evento in marcos_temporales:
+            marcos_temporales[marco_del_evento]["eventos"].append(evento_data)
+    
+    # ===== PASO 4: Ordenar eventos por marco temporal y orden de evento =====
+    marcos_ordenados = sorted(marcos_temporales.values(), key=lambda x: x["orden"])
+    
+    eventos_ordenados = []
+    for marco in marcos_ordenados:
+        marco["eventos"].sort(key=lambda x: x["orden_evento"])
+        eventos_ordenados.extend(marco["eventos"])
+    
+    return lugares, eventos_ordenados, marcos_temporales
+
+
+class BaseConocimiento:
+    """
+    Base de conocimiento compartida: parsea el TTL una sola vez
+    
+    El mismo grafo en memoria alimenta los datos del mapa/cronología
+    (lugares, eventos_ordenados, marcos_temporales) y el motor de
+    preguntas GraphRAG_v2, en vez de que cada uno parsee su propia copia.
+    """
+    
+    def __init__(self, ttl_path: str, cache_dir: Optional[str] = "cache_embeddings_v2", grafo=None):
+        """
+        Args:
+            ttl_path: Ruta al archivo TTL (lanza excepción si no se puede parsear)
+            cache_dir: Directorio de la instantánea binaria y de los cachés del motor
+            grafo: Grafo ya parseado del mismo TTL (p. ej. el del motor tras recargar)
+        """
+        self.ttl_path = ttl_path
+        self.cache_dir = cache_dir
+        self.snapshot = None
+        if cache_dir:
+            self.snapshot = SnapshotGrafo(ttl_path, Path(cache_dir) / f"snapshot_{Path(ttl_path).stem}")
+        self.g = cargar_grafo(ttl_path, self.snapshot, grafo)
+        self.version_grafo = (self.snapshot and self.snapshot.sha_ttl) or _hash_archivo(ttl_path)
+        self._datos_mapa = None
+        self._motor = None
+        self._lock = threading.Lock()
+    
+    def datos_mapa(self) -> Tuple[Dict, List, Dict]:
+        """(lugares, eventos_ordenados, marcos_temporales), calculados una vez"""
+        with self._lock:
+            if self._datos_mapa is None:
+                self._datos_mapa = extraer_datos_mapa(self.g)
+            return self._datos_mapa
+    
+    def motor(self, **kwargs) -> GraphRAG_v2:
+        """
+        Motor GraphRAG_v2 construido sobre el grafo compartido (uno por base)
+        
+        Args:
+            **kwargs: Parámetros de GraphRAG_v2 (solo se usan en la primera llamada)
+        """
+        with self._lock:
+            if self._motor is None:
+                kwargs.setdefault('cache_dir', self.cache_dir)
+                self._motor = GraphRAG_v2(self.ttl_path, grafo=self.g, **kwargs)
+            return self._motor
+
+
+class BaseConocimientoVigente:
+    """
+    BaseConocimiento que se reconstruye sola cuando cambia el TTL
+    
+    Un hilo vigila el archivo por polling (mtime/tamaño, sin dependencias y
+    válido en cualquier sistema de archivos). Ante un cambio, si ya había
+    motor se recarga de forma incremental en un borrador (GraphRAG_v2.recarga)
+    y la BaseConocimiento nueva y sus datos del mapa se construyen en ese
+    hilo sobre el grafo del borrador. Solo si todo se construyó se publican
+    el estado del motor y la base, uno tras otro sin trabajo entre medias;
+    si algo falla, el borrador se descarta y motor y mapa siguen en la
+    versión anterior. Quien obtuvo la base con actual() sigue usando los
+    datos del mapa anteriores hasta que la vuelva a pedir; el motor es el
+    mismo objeto.
+    """
+    
+    def __init__(self, ttl_path: str, cache_dir: Optional[str] = "cache_embeddings_v2",
+                 intervalo: float = 2.0, motor_kwargs: Optional[Dict] = None,
+                 al_preparar_motor=None):
+        """
+        Args:
+            ttl_path: Ruta al archivo TTL vigilado
+            cache_dir: Directorio de la instantánea y cachés (compartido entre versiones)
+            intervalo: Segundos entre comprobaciones del archivo
+            motor_kwargs: Parámetros de GraphRAG_v2 para cada motor
+            al_preparar_motor: Función llamada con cada motor nuevo antes de devolverlo
+                               y tras cada recarga publicada (p. ej. precalcular
+                               las preguntas frecuentes)
+        """
+        self.ttl_path = ttl_path
+        self.cache_dir = cache_dir
+        self.intervalo = intervalo
+        self.motor_kwargs = motor_kwargs or {}
+        self.al_preparar_motor = al_preparar_motor
+        self.recargas = 0
+        self.ultimo_error: Optional[Exception] = None
+        self._base = BaseConocimiento(ttl_path, cache_dir)
+        self._firma = self._firma_archivo()
+        self._lock_recarga = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+    
+    def actual(self) -> BaseConocimiento:
+        """Base vigente (tomarla una vez por petición para usar una versión coherente)"""
+        return self._base
+    
+    def motor(self, base: Optional[BaseConocimiento] = None) -> GraphRAG_v2:
+        """
+        Motor de `base` (por defecto, la vigente), creado con motor_kwargs si aún no existía
+        
+        Args:
+            base: Versión obtenida antes con actual(), para que el motor
+                  corresponda a los mismos datos que el mapa de esa petición
+        """
+        base = base or self._base
+        nuevo = base._motor is None
+        motor = base.motor(**self.motor_kwargs)
+        if nuevo and self.al_preparar_motor:
+            self.al_preparar_motor(motor)
+        return motor
+    
+    def _firma_archivo(self) -> Optional[Tuple[int, int]]:
         try:
-            with open(filepath, 'rb') as f:
-                cache_data = pickle.load(f)
+            stat = os.stat(self.ttl_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def iniciar(self):
+        """Lanza el hilo vigilante (idempotente)"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._vigilar, name="vigilante-ttl", daemon=True)
+            self._hilo.start()
+    
+    def detener(self):
+        """Detiene el hilo vigilante"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+    
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo):
+            firma = self._firma_archivo()
+            if firma is not None and firma != self._firma:
+                self._firma = firma
+                self.recargar()
+    
+    def recargar(self) -> bool:
+        """
+        Reconstruye la base si el contenido del TTL cambió y la publica
+        
+        Returns:
+            True si se publicó una versión nueva. Si el TTL no se puede
+            parsear (p. ej. a medio escribir) se conserva la versión actual
+            y el error queda en ultimo_error.
+        """
+        with self._lock_recarga:
+            anterior = self._base
+            if _hash_archivo(self.ttl_path) == anterior.version_grafo:
+                return False
             
-            self.embeddings = cache_data['embeddings']
-            self.entity_ids = cache_data['entity_ids']
-            self.entity_texts = cache_data['entity_texts']
-            self.entidades = cache_data['entidades']
+            print(f"\n🔄 {self.ttl_path} cambió, reconstruyendo base de conocimiento...")
+            start = time.time()
+            motor = anterior._motor
+            try:
+                if motor is None:
+                    nueva = BaseConocimiento(self.ttl_path, self.cache_dir)
+                    nueva.datos_mapa()
+                else:
+                    # Solo se recalculan las entidades que cambiaron; el grafo del
+                    # borrador alimenta también los datos del mapa. El motor publica
+                    # al salir del bloque, y solo si la base se construyó entera
+                    with motor.recarga(self.ttl_path):
+                        nueva = BaseConocimiento(self.ttl_path, self.cache_dir, grafo=motor.g)
+                        nueva._motor = motor
+                        nueva.datos_mapa()
+            except Exception as e:
+                self.ultimo_error = e
+                print(f"   ❌ No se pudo recargar, se mantiene la versión anterior: {e}")
+                return False
             
-            print(f"✅ Caché cargado desde: {filepath}")
+            self._base = nueva
+            self.recargas += 1
+            self.ultimo_error = None
+            print(f"   ✅ Base {nueva.version_grafo} publicada en {time.time() - start:.2f}s")
+            if motor is not None and self.al_preparar_motor:
+                try:
+                    self.al_preparar_motor(motor)
+                except Exception as e:
+                    print(f"   ⚠️  al_preparar_motor falló tras la recarga: {e}")
             return True
-        except FileNotFoundError:
-            print(f"⚠️  No se encontró caché en: {filepath}")
-            return False
 
 
 def benchmark(rag: GraphRAG_v2, queries: List[str]):
@@ -813,7 +3984,7 @@ def benchmark(rag: GraphRAG_v2, queries: List[str]):
         
         for query in queries:
             start = time.time()
-            respuesta = rag.responder(query, modo=modo, verbose=False)
+            respuesta = rag.responder(query, modo=modo, verbose=False, usar_cache=False)
             elapsed = time.time() - start
             tiempos.append(elapsed)
             
@@ -822,6 +3993,12 @@ def benchmark(rag: GraphRAG_v2, queries: List[str]):
         avg_time = np.mean(tiempos)
         std_time = np.std(tiempos)
         print(f"\n   📈 Promedio: {avg_time*1000:.1f}ms (±{std_time*1000:.1f}ms)")
+        
+        # Mismas queries en un solo lote (sin caché, para comparar)
+        start = time.time()
+        rag.responder_batch(queries, modo=modo, usar_cache=False)
+        elapsed = time.time() - start
+        print(f"   📦 Lote: {elapsed*1000:.1f}ms total, {elapsed*1000/len(queries):.1f}ms por query")
     
     print("\n" + "=" * 70)
 
@@ -889,9 +4066,11 @@ def main():
             if query.lower() == 'stats':
                 print(f"\n📊 Estadísticas:")
                 print(f"   Entidades: {len(rag.entidades)}")
-                print(f"   Embeddings: {rag.embeddings.shape}")
-                print(f"   Dimensiones: {rag.embeddings.shape[1]}")
-                print(f"   Términos indexados: {len(rag.index_palabras)}\n")
+                if rag.embeddings is not None:
+                    print(f"   Embeddings: {rag.embeddings.shape}")
+                    print(f"   Dimensiones: {rag.embeddings.shape[1]}")
+                print(f"   Modelo semántico: {'listo' if rag.modelo_listo() else 'cargando'}")
+                print(f"   Términos indexados: {len(rag.indice_lexico)}\n")
                 continue
             
             # Responder con modo híbrido y verbose
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paridad de embeddings: ONNX Runtime (fp32 / int8) frente a PyTorch
+Compara los vectores de las entidades del TTL y de consultas de evaluación,
+el top-10 semántico resultante y la latencia de codificar una consulta.
+Sale con código 1 si algún backend queda fuera de tolerancia.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from graphrag_v2 import (GraphRAG_v2, CodificadorONNX, exportar_onnx, ruta_onnx,
+                         _normalizar_filas, _top_k_filas)
+
+CONSULTAS = [
+    "¿Qué es Qoyllur Rit'i?",
+    "¿Dónde está el santuario?",
+    "¿Qué hacen los ukukus?",
+    "¿Cuándo es la bajada del glaciar?",
+    "¿Quién realiza la lomada?",
+    "¿Dónde está el glaciar Colque Punku?",
+    "¿Qué eventos hay el día 2?",
+    "¿Cuál es la función de los ukumaris?",
+]
+
+
+def latencia_ms(modelo, consultas, repeticiones: int = 5) -> float:
+    """Mediana de codificar una consulta aislada (el caso de cada pregunta)"""
+    tiempos = []
+    for _ in range(repeticiones):
+        for consulta in consultas:
+            start = time.perf_counter()
+            modelo.encode([consulta], convert_to_numpy=True)
+            tiempos.append(time.perf_counter() - start)
+    return float(np.median(tiempos) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ttl', nargs='?', default="qoyllurity.ttl")
+    parser.add_argument('--modelo', default="paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument('--cache-dir', default="cache_embeddings_v2")
+    parser.add_argument('--dir-onnx', default=None)
+    parser.add_argument('--cos-fp32', type=float, default=0.9999, help="Coseno mínimo ONNX fp32 vs PyTorch")
+    parser.add_argument('--cos-int8', type=float, default=0.98, help="Coseno mínimo ONNX int8 vs PyTorch")
+    args = parser.parse_args()
+    
+    from sentence_transformers import SentenceTransformer
+    
+    directorio = Path(args.dir_onnx or ruta_onnx(args.cache_dir, args.modelo))
+    if not (directorio / "codificador.json").exists():
+        exportar_onnx(args.modelo, directorio)
+    
+    # Textos de entidades tal como los codifica el motor (sin cargar modelo)
+    rag = GraphRAG_v2(args.ttl, model_name=args.modelo, cache_dir=args.cache_dir, carga_modelo="perezosa")
+    textos = rag.entity_texts
+    
+    print("=" * 80)
+    print(f"🔬 PARIDAD ONNX vs PyTorch ({len(textos)} entidades, {len(CONSULTAS)} consultas)")
+    print("=" * 80)
+    
+    referencia = SentenceTransformer(args.modelo, device='cpu')
+    ent_ref = _normalizar_filas(referencia.encode(textos, batch_size=32, convert_to_numpy=True))
+    con_ref = _normalizar_filas(referencia.encode(CONSULTAS, convert_to_numpy=True))
+    _, top_ref = _top_k_filas(con_ref @ ent_ref.T, 10)
+    print(f"\n   {'torch':10s} latencia consulta p50={latencia_ms(referencia, CONSULTAS):7.2f}ms")
+    
+    correcto = True
+    for nombre, cuantizado, minimo in [('onnx', False, args.cos_fp32), ('onnx-int8', True, args.cos_int8)]:
+        modelo = CodificadorONNX(directorio, cuantizado=cuantizado)
+        ent = _normalizar_filas(modelo.encode(textos, batch_size=32))
+        con = _normalizar_filas(modelo.encode(CONSULTAS))
+        cos = np.concatenate([(ent * ent_ref).sum(axis=1), (con * con_ref).sum(axis=1)])
+        _, top = _top_k_filas(con @ ent.T, 10)
+        solape = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top.tolist(), top_ref.tolist())])
+        ok = cos.min() >= minimo
+        correcto &= ok
+        print(f"   {nombre:10s} latencia consulta p50={latencia_ms(modelo, CONSULTAS):7.2f}ms   "
+              f"coseno min={cos.min():.5f} medio={cos.mean():.5f}   top-10 común={solape:.3f}   "
+              f"{'✅' if ok else '❌'} (mín {minimo})")
+    
+    print("\n" + "=" * 80)
+    sys.exit(0 if correcto else 1)
+
+
+if __name__ == "__main__":
+    main()
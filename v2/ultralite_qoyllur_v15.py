@@ -11,14 +11,68 @@ from collections import defaultdict
 from rdflib import Graph, URIRef, Literal
 from rdflib.namespace import RDFS
 
+# Instantánea binaria del grafo (opcional): sin graphrag_v2 se parsea el TTL
+try:
+    from graphrag_v2 import SnapshotGrafo, cargar_grafo
+except ImportError:
+    SnapshotGrafo = None
+
+_TILDES = str.maketrans('áéíóúüñ', 'aeiouun')
+
+
+def _indice_palabras(grupos):
+    """
+    palabra -> rasgo y (prefijo, rasgo) de cada grupo de palabras clave, con y
+    sin tildes; las que terminan en '*' casan con cualquier palabra que empiece
+    así (evento* -> eventos)
+    """
+    palabras, prefijos = {}, []
+    for rasgo, claves in grupos.items():
+        for clave in sorted(set(claves) | {c.translate(_TILDES) for c in claves}):
+            if clave.endswith('*'):
+                prefijos.append((clave[:-1], rasgo))
+            else:
+                palabras[clave] = rasgo
+    return palabras, tuple(prefijos)
+
+
 class UltraLiteQoyllurV15:
     """Versión mejorada con stemming y plantillas"""
     
-    def __init__(self, ttl_path):
+    # Versión de los índices guardados en la instantánea
+    FORMATO_INDICES = 1
+    
+    # Intenciones: palabras completas de la pregunta (no subcadenas)
+    PALABRAS_INTENCION, PREFIJOS_INTENCION = _indice_palabras({
+        'donde': ('dónde', 'donde', 'lugar', 'ubicación', 'sitio'),
+        'cuando': ('cuándo', 'cuando', 'fecha', 'día', 'hora'),
+        'quien': ('quién', 'quien', 'quiénes', 'quienes', 'participa*'),
+        'que': ('qué', 'que', 'cómo', 'como', 'cuál', 'cual', 'cuáles', 'cuales'),
+        'cuantos': ('cuántos', 'cuantos', 'cuántas', 'cuantas', 'número', 'numero', 'cantidad'),
+        'eventos': ('evento*', 'actividad*', 'hito*'),
+        'danzas': ('danza*', 'baile*'),
+    })
+    INICIOS_INTENCION = tuple(p for p, _ in PREFIJOS_INTENCION)
+    ORDEN_INTENCION = ('donde', 'cuando', 'quien', 'que', 'cuantos')  # prioridad
+    PATRON_DIA_N = re.compile(r'\bd[ií]a\s*\d')
+    PUNTUACION = '¿?¡!.,;:()"«»'
+    
+    # Número de día de un marco temporal (label "Día N: ...", o ID "DiaN_...") y de la pregunta
+    PATRON_DIA_LABEL = re.compile(r'^\s*d[ií]a\s*(\d+)\b', re.IGNORECASE)
+    PATRON_DIA_ID = re.compile(r'^dia_?(\d+)', re.IGNORECASE)
+    PATRON_DIA_PREGUNTA = re.compile(r'\bd[ií]a\s*(\d+)\b')
+    
+    def __init__(self, ttl_path, cache_dir="cache_v15"):
         print("🚀 Cargando Qoyllur Riti - Fase 1.5...")
-        self.g = Graph()
+        self.snapshot = None
+        if SnapshotGrafo is not None and cache_dir:
+            self.snapshot = SnapshotGrafo(ttl_path, Path(cache_dir) / f"snapshot_{Path(ttl_path).stem}")
         try:
-            self.g.parse(ttl_path, format='turtle')
+            if self.snapshot is not None:
+                self.g = cargar_grafo(ttl_path, self.snapshot)
+            else:
+                self.g = Graph()
+                self.g.parse(ttl_path, format='turtle')
             print(f"✅ Grafo: {len(self.g)} tripletas")
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -37,7 +91,10 @@ class UltraLiteQoyllurV15:
             (r'í$', 'i'),    # ukukú → ukuku
         ]
         
-        self._build_index()
+        if not self._cargar_indices_snapshot():
+            self._build_index()
+            self._guardar_indices_snapshot()
+        self._build_indice_temporal()
         print(f"📚 Índice: {len(self.index_palabras)} términos")
         print("✅ Sistema listo.\n")
     
@@ -142,6 +199,63 @@ class UltraLiteQoyllurV15:
                     if obj_id in self.entidades:
                         self.entidades[obj_id]['relaciones_inversas'][prop].append(ent_id)
     
+    def _build_indice_temporal(self):
+        """Marco temporal -> eventos ordenados por tieneOrdenEvento, y día N -> marco"""
+        def orden(ent, prop):
+            try:
+                return int(ent['propiedades'].get(prop, 999))
+            except ValueError:
+                return 999
+        
+        self.eventos_por_marco = {}  # marco -> [nombres para mostrar] en orden
+        self.marco_por_dia = {}      # número de día -> marco
+        for marco_id, ent in self.entidades.items():
+            eventos = [e for e in ent['relaciones'].get('defineMarcoTemporal', []) if e in self.entidades]
+            if not eventos:
+                continue
+            eventos.sort(key=lambda e: (orden(self.entidades[e], 'tieneOrdenEvento'), e))
+            nombres = []
+            for ev_id in eventos:
+                ev_ent = self.entidades[ev_id]
+                ev_name = ev_ent['labels'][0] if ev_ent['labels'] else ev_id
+                if 'tieneOrdenEvento' in ev_ent['propiedades']:
+                    ev_name = f"{ev_name} (orden {ev_ent['propiedades']['tieneOrdenEvento']})"
+                nombres.append(ev_name)
+            self.eventos_por_marco[marco_id] = nombres
+            
+            m = next(filter(None, (self.PATRON_DIA_LABEL.match(l) for l in ent['labels'])), None)
+            m = m or self.PATRON_DIA_ID.match(marco_id)
+            if m:
+                self.marco_por_dia.setdefault(int(m.group(1)), marco_id)
+    
+    def _guardar_indices_snapshot(self):
+        """Guarda entidades e índices en la instantánea"""
+        if self.snapshot is None:
+            return
+        datos = {
+            'entidades': self.entidades,
+            'palabras': self.index_palabras,
+            'propiedades': self.index_propiedades,
+        }
+        try:
+            self.snapshot.guardar_seccion('ultralite_v15', self.FORMATO_INDICES, datos)
+        except OSError as e:
+            print(f"⚠️  No se pudieron guardar los índices: {e}")
+    
+    def _cargar_indices_snapshot(self):
+        """Carga entidades e índices de la instantánea (False si no hay o está obsoleta)"""
+        seccion = self.snapshot.cargar_seccion('ultralite_v15', self.FORMATO_INDICES) if self.snapshot else None
+        if seccion is None:
+            return False
+        datos, _ = seccion
+        for ent in datos['entidades'].values():
+            ent['relaciones'] = defaultdict(list, ent['relaciones'])
+            ent['relaciones_inversas'] = defaultdict(list, ent['relaciones_inversas'])
+        self.entidades = datos['entidades']
+        self.index_palabras = defaultdict(list, datos['palabras'])
+        self.index_propiedades = defaultdict(list, datos['propiedades'])
+        return True
+    
     def buscar_entidades(self, query, top_k=10):
         """Búsqueda por palabras clave con stemming"""
         palabras = self._normalize(query).split()
@@ -170,25 +284,28 @@ class UltraLiteQoyllurV15:
     def identificar_intencion(self, pregunta):
         """Detecta qué tipo de pregunta es"""
         p = pregunta.lower()
-        
-        # Palabras clave para cada tipo
-        if any(w in p for w in ['dónde', 'donde', 'lugar', 'ubicación', 'sitio']):
-            return 'donde'
-        elif any(w in p for w in ['cuándo', 'cuando', 'fecha', 'día', 'hora']):
-            return 'cuando'
-        elif any(w in p for w in ['quién', 'quien', 'quiénes', 'quienes', 'participa']):
-            return 'quien'
-        elif any(w in p for w in ['qué', 'que', 'cómo', 'como', 'cuál', 'cual']):
-            if 'evento' in p or 'actividad' in p or 'hito' in p:
-                return 'que_eventos'
-            elif 'danza' in p or 'baile' in p:
-                return 'que_danzas'
-            else:
-                return 'que'
-        elif 'cuántos' in p or 'cuantos' in p or 'número' in p or 'cantidad' in p:
-            return 'cuantos'
-        else:
-            return 'general'
+        rasgos = set()
+        for palabra in p.split():
+            palabra = palabra.strip(self.PUNTUACION)
+            rasgo = self.PALABRAS_INTENCION.get(palabra)
+            if rasgo is None and palabra.startswith(self.INICIOS_INTENCION):
+                rasgo = next(r for pre, r in self.PREFIJOS_INTENCION if palabra.startswith(pre))
+            if rasgo is not None:
+                rasgos.add(rasgo)
+        
+        # "¿Qué eventos hay el día 2?" tiene prioridad sobre 'cuando'
+        if 'cuando' in rasgos and ('que' in rasgos or 'eventos' in rasgos) and self.PATRON_DIA_N.search(p):
+            return 'que_eventos'
+        
+        for intencion in self.ORDEN_INTENCION:
+            if intencion in rasgos:
+                if intencion == 'que':
+                    if 'eventos' in rasgos:
+                        return 'que_eventos'
+                    elif 'danzas' in rasgos:
+                        return 'que_danzas'
+                return intencion
+        return 'general'
     
     def responder_donde(self, pregunta, entidad_principal):
         """Plantilla para preguntas de ubicación"""
@@ -248,50 +365,16 @@ class UltraLiteQoyllurV15:
     
     def responder_que_eventos(self, pregunta, entidad_principal=None):
         """¿Qué eventos hay en X día?"""
-        # Buscar por "día 2", "dia2", etc.
-        dias = {
-            '1': 'Dia1_SabadoPreparacion',
-            '2': 'Dia2_DomingoPartida',
-            '3': 'Dia3_LunesAscenso',
-            '4': 'NocheLunesMartes_Glaciar',
-            '5': 'Dia4_MartesDescensoYLomada',
-            '6': 'NocheMartesMiercoles_Lomada',
-            '7': 'Dia5_MiercolesAlba'
-        }
+        # "día 2", "dia2"...; si no, la entidad principal si es un marco temporal
+        m = self.PATRON_DIA_PREGUNTA.search(pregunta.lower())
+        marco_id = self.marco_por_dia.get(int(m.group(1))) if m else None
+        marco_id = marco_id or entidad_principal
         
-        dia_num = None
-        p = pregunta.lower()
-        for num, dia_id in dias.items():
-            if f'día {num}' in p or f'dia {num}' in p or f'dia{num}' in p:
-                dia_num = num
-                dia_ent = dia_id
-                break
-        
-        if dia_num:
-            # Buscar eventos que tienen este marco como defineMarcoTemporal
-            eventos = []
-            for ent_id, ent in self.entidades.items():
-                # Es un evento? (tipo EventoRitual)
-                if ent.get('type') == 'EventoRitual':
-                    # Tiene relación defineMarcoTemporal inversa?
-                    for sup_id in ent.get('relaciones_inversas', {}).get('defineMarcoTemporal', []):
-                        if sup_id == dia_ent:
-                            eventos.append(ent_id)
-            
-            if eventos:
-                nombres = []
-                for ev_id in eventos[:10]:
-                    ev_ent = self.entidades.get(ev_id, {})
-                    ev_name = ev_ent['labels'][0] if ev_ent['labels'] else ev_id
-                    orden = ev_ent['propiedades'].get('tieneOrdenEvento', '')
-                    if orden:
-                        ev_name = f"{ev_name} (orden {orden})"
-                    nombres.append(ev_name)
-                
-                dia_nombre = self.entidades[dia_ent]['labels'][0] if dia_ent in self.entidades else f"Día {dia_num}"
-                return f"📅 **Eventos del {dia_nombre}**:\n• " + "\n• ".join(nombres)
-        
-        return None
+        nombres = self.eventos_por_marco.get(marco_id)
+        if not nombres:
+            return None
+        dia_nombre = self.entidades[marco_id]['labels'][0] if self.entidades[marco_id]['labels'] else marco_id
+        return f"📅 **Eventos del {dia_nombre}**:\n• " + "\n• ".join(nombres[:10])
     
     def responder_quien(self, pregunta, entidad_principal):
         """¿Quién realiza X evento?"""